@@ -0,0 +1,87 @@
+"""Benchmark de arranque en frío: tiempo hasta el primer frame.
+
+Cada medición es un proceso nuevo que importa main, arranca la app y se
+cierra al dibujar el primer frame; el informe sale de
+DercoR8App.startup_report. Con --todas se construyen además todas las
+pantallas antes del primer frame, como antes de la carga diferida.
+
+Uso:
+    python benchmarks/bench_arranque.py [repeticiones] [--todas]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARCA = "INFORME_ARRANQUE "
+
+# Sin GPU ni pantalla: ventana offscreen de SDL y backend GL simulado
+# (los procesos medidos heredan el entorno)
+os.environ.setdefault("KIVY_GL_BACKEND", "mock")
+os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+
+def hijo(todas):
+    """Proceso medido: arranca la app y se cierra tras el primer frame"""
+    sys.path.insert(0, RAIZ)
+    import main
+    from kivy.clock import Clock
+
+    class App(main.DercoR8App):
+        def build(self):
+            root = super().build()
+            if todas:
+                for nombre in root.SCREENS:
+                    root.get_screen(nombre)
+            return root
+
+        def on_first_frame(self, *args):
+            super().on_first_frame(*args)
+            self.root.cancel_prewarm()
+            print(MARCA + json.dumps(self.startup_report), flush=True)
+            Clock.schedule_once(lambda dt: self.stop())
+
+    App().run()
+
+
+def medir(todas, directorio):
+    args = [sys.executable, os.path.abspath(__file__), "--hijo"] + (["--todas"] if todas else [])
+    salida = subprocess.run(args, cwd=directorio, capture_output=True, text=True).stdout
+    for linea in salida.splitlines():
+        if linea.startswith(MARCA):
+            return json.loads(linea[len(MARCA):])
+    raise RuntimeError("El proceso no llegó al primer frame")
+
+
+def main_bench():
+    if "--hijo" in sys.argv:
+        hijo("--todas" in sys.argv)
+        return
+
+    posicionales = [a for a in sys.argv[1:] if not a.startswith("--")]
+    repeticiones = int(posicionales[0]) if posicionales else 5
+    todas = "--todas" in sys.argv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # La app usa rutas relativas (data/, assets/)
+        os.symlink(os.path.join(RAIZ, "assets"), os.path.join(tmp, "assets"))
+        # Primera ejecución: crea y siembra la base de datos (no cuenta)
+        medir(todas, tmp)
+        informes = [medir(todas, tmp) for _ in range(repeticiones)]
+
+    print(f"Arranque ({repeticiones} procesos, {'todas las pantallas' if todas else 'solo home'})")
+    for clave, nombre in (("imports_ms", "imports"), ("build_ms", "build"),
+                          ("first_frame_ms", "primer frame"), ("db_ready_ms", "base lista")):
+        valores = [informe[clave] for informe in informes if clave in informe]
+        if valores:
+            print(f"  {nombre:<14} mediana {statistics.median(valores):7.1f} ms  "
+                  f"máx {max(valores):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main_bench()
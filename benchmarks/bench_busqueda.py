@@ -0,0 +1,74 @@
+"""Benchmark de búsqueda de productos (FTS5 + facetas) sobre un catálogo grande.
+
+Uso:
+    python benchmarks/bench_busqueda.py [productos]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Database
+
+PALABRAS = ("sofá mesa lámpara silla cama estantería roble cuero metal vidrio "
+            "moderno clásico industrial nórdico tela mármol pino nogal").split()
+CATEGORIAS = ("Sofá", "Mesa", "Lámpara", "Silla", "Estantería", "Cama")
+
+CONSULTAS = [
+    ("texto", dict(texto="sofa")),
+    ("prefijo", dict(texto="ro")),
+    ("dos palabras", dict(texto="mesa nogal")),
+    ("categoría", dict(categoria="Cama")),
+    ("precio", dict(precio_min=1000, precio_max=2000)),
+    ("texto+facetas", dict(texto="moderno", categoria="Silla", precio_min=500, precio_max=5000)),
+]
+
+
+def sembrar(db, cantidad):
+    rnd = random.Random(8)
+    filas = [
+        (" ".join(rnd.sample(PALABRAS, 2)).capitalize(), rnd.choice(CATEGORIAS),
+         round(rnd.uniform(100, 9000), 2), "assets/default.png",
+         " ".join(rnd.sample(PALABRAS, 8)), rnd.randint(0, 20))
+        for _ in range(cantidad)
+    ]
+    with db.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO productos (nombre, categoria, precio, imagen, descripcion, stock) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            filas
+        )
+
+
+def medir(funcion, repeticiones=20):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        sembrar(db, cantidad)
+        print(f"Productos: {cantidad}  FTS5: {'sí' if db.fts_disponible else 'no (LIKE)'}")
+
+        for nombre, filtros in CONSULTAS:
+            busqueda = medir(lambda: db.search_productos(limite=50, **filtros))
+            facetas_filtros = {k: v for k, v in filtros.items() if k != "categoria"}
+            facetas = medir(lambda: db.get_facetas_categoria(**facetas_filtros))
+            print(f"  {nombre:<16} búsqueda {busqueda:7.2f} ms   facetas {facetas:7.2f} ms")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
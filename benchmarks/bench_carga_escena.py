@@ -0,0 +1,104 @@
+"""Benchmark de carga de escenas AR: pieza a pieza frente a carga por lotes.
+
+Abre ARScreen y reconstruye escenas de 10, 100 y 1000 piezas con
+add_furniture (una llamada por pieza, todo en un frame) y con build_scene
+(repartida en frames), midiendo el tiempo total y el frame más largo.
+
+Uso:
+    python benchmarks/bench_carga_escena.py [piezas...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from kivy.config import Config
+
+# Sin límite de fps para que Clock no duerma entre frames medidos
+Config.set("graphics", "maxfps", "0")
+
+from kivy.base import EventLoop
+from kivy.uix.screenmanager import NoTransition
+
+import main
+
+
+def frame():
+    """Procesa un frame completo (eventos, layout y dibujo)"""
+    inicio = time.perf_counter()
+    EventLoop.idle()
+    return time.perf_counter() - inicio
+
+
+def escena(screen, piezas):
+    rnd = random.Random(15)
+    area = screen.ids.ar_area
+    return [
+        {
+            "type": rnd.choice(tuple(screen.FURNITURE)),
+            "position": (area.x + rnd.uniform(0, area.width), area.y + rnd.uniform(0, area.height)),
+            "rotation": rnd.uniform(-180, 180),
+            "scale": rnd.uniform(0.5, 2)
+        }
+        for _ in range(piezas)
+    ]
+
+
+def pieza_a_pieza(screen, items):
+    screen.clear_scene()
+    frame()
+    inicio = time.perf_counter()
+    for item in items:
+        screen.add_furniture(item["type"], item["position"], item["rotation"], item["scale"])
+    duracion = frame() + (time.perf_counter() - inicio)
+    return duracion, 1, duracion
+
+
+def por_lotes(screen, items):
+    screen.clear_scene()
+    frame()
+    terminado = []
+    inicio = time.perf_counter()
+    screen.build_scene(items, on_complete=terminado.append)
+    frames = [time.perf_counter() - inicio]
+    while not terminado:
+        frames.append(frame())
+    frames[-1] += frame()
+    return time.perf_counter() - inicio, len(frames), max(frames)
+
+
+def main_bench():
+    tamanos = [int(n) for n in sys.argv[1:]] or [10, 100, 1000]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Base de datos temporal; los sprites se leen del repositorio
+        os.chdir(tmp)
+        os.makedirs("data")
+        os.symlink(os.path.join(RAIZ, "assets"), "assets")
+        app = main.DercoR8App()
+        app._run_prepare()
+        app.root.transition = NoTransition()
+        app.root.current = "ar_view"
+        for _ in range(3):
+            frame()
+        screen = app.root.get_screen("ar_view")
+
+        for piezas in tamanos:
+            items = escena(screen, piezas)
+            print(f"{piezas} piezas")
+            for nombre, cargar in (("pieza a pieza", pieza_a_pieza), ("por lotes", por_lotes)):
+                total, frames, frame_max = cargar(screen, items)
+                print(f"  {nombre:<14} total {total * 1000:8.1f} ms  frames {frames:4d}  "
+                      f"frame más largo {frame_max * 1000:7.1f} ms")
+
+        screen.clear_scene()
+        app.stop()
+        frame()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,103 @@
+"""Benchmark del catálogo: tiempo de apertura y de frame al hacer scroll.
+
+Siembra una base temporal con N productos, abre CatalogScreen y desplaza
+el RecycleView de arriba abajo midiendo cada frame.
+
+Uso:
+    python benchmarks/bench_catalogo.py [productos] [frames_scroll]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from kivy.config import Config
+
+# Sin límite de fps para que Clock no duerma entre frames medidos
+Config.set("graphics", "maxfps", "0")
+
+from kivy.base import EventLoop
+from kivy.uix.screenmanager import NoTransition
+
+import main
+
+
+def sembrar_productos(db, cantidad):
+    filas = [
+        (f"Producto {i}", f"Categoría {i % 12}", 100.0 + i % 5000, "assets/default.png",
+         f"Descripción del producto {i} con material y dimensiones de ejemplo", i % 20)
+        for i in range(cantidad)
+    ]
+    with db.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO productos (nombre, categoria, precio, imagen, descripcion, stock) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            filas
+        )
+
+
+def frame():
+    """Procesa un frame completo (eventos, layout y dibujo)"""
+    inicio = time.perf_counter()
+    EventLoop.idle()
+    return time.perf_counter() - inicio
+
+
+def resumen(nombre, tiempos):
+    tiempos = sorted(tiempos)
+    p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+    print(f"{nombre:<22} media {statistics.mean(tiempos) * 1000:7.2f} ms  "
+          f"p95 {p95 * 1000:7.2f} ms  máx {tiempos[-1] * 1000:7.2f} ms")
+
+
+def main_bench():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    frames_scroll = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # La app crea data/dercor8.db relativo al directorio de trabajo
+        os.chdir(tmp)
+        os.makedirs("data")
+        db = main.Database(os.path.join("data", "dercor8.db"))
+        sembrar_productos(db, cantidad)
+        db.close()
+
+        app = main.DercoR8App()
+        app._run_prepare()
+        frame()
+
+        screen = app.root.get_screen("catalog")
+        rv = screen.ids.products_rv
+
+        # Apertura: navegar al catálogo hasta pintar las cards visibles
+        # (la carga llega desde el hilo de la base de datos)
+        app.root.transition = NoTransition()
+        inicio = time.perf_counter()
+        app.root.current = "catalog"
+        frames_apertura = []
+        while not rv.layout_manager.children and time.perf_counter() - inicio < 30:
+            frames_apertura.append(frame())
+        apertura = time.perf_counter() - inicio
+        print(f"Productos: {cantidad + 6}")
+        print(f"Apertura del catálogo  {apertura * 1000:7.2f} ms")
+        print(f"Frame más largo        {max(frames_apertura) * 1000:7.2f} ms")
+        print(f"Cards creadas          {len(rv.layout_manager.children):7d}")
+
+        # Scroll: recorrer toda la lista en frames_scroll pasos
+        tiempos = []
+        for i in range(1, frames_scroll + 1):
+            rv.scroll_y = 1 - i / frames_scroll
+            tiempos.append(frame())
+        resumen("Frame de scroll", tiempos)
+        print(f"Cards tras el scroll   {len(rv.layout_manager.children):7d}")
+
+        app.stop()
+        frame()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,67 @@
+"""Micro-benchmark: conexión por llamada frente al pool persistente.
+
+Uso:
+    python benchmarks/bench_conexiones.py [iteraciones]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Database
+
+
+def get_usuario_por_llamada(db_path, username="Usuario"):
+    """Patrón anterior: abrir y cerrar la conexión en cada consulta"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM usuarios WHERE username = ?", (username,))
+    usuario = cursor.fetchone()
+    conn.close()
+    return usuario
+
+
+def guardar_por_llamada(db_path, user_id):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO proyectos (user_id, nombre, tipo, datos, fecha) VALUES (?, ?, ?, ?, ?)",
+        (user_id, "Bench", "propuesta", "x", "2024-01-01 00:00:00")
+    )
+    conn.commit()
+    conn.close()
+
+
+def medir(nombre, funcion, iteraciones):
+    total = timeit.timeit(funcion, number=iteraciones)
+    print(f"{nombre:<32} {total / iteraciones * 1e6:10.1f} µs/llamada")
+    return total
+
+
+def main():
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        user_id = db.get_usuario()[0]
+
+        print(f"Lecturas ({iteraciones} iteraciones)")
+        antes = medir("  conexión por llamada", lambda: get_usuario_por_llamada(db.db_path), iteraciones)
+        despues = medir("  pool persistente", lambda: db.get_usuario(), iteraciones)
+        print(f"  aceleración: x{antes / despues:.1f}")
+
+        escrituras = max(1, iteraciones // 10)
+        print(f"Escrituras ({escrituras} iteraciones)")
+        antes = medir("  conexión por llamada", lambda: guardar_por_llamada(db.db_path, user_id), escrituras)
+        despues = medir("  pool persistente",
+                        lambda: db.guardar_propuesta(user_id, "Bench", "x"), escrituras)
+        print(f"  aceleración: x{antes / despues:.1f}")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark del formato de escenas AR: JSON anterior frente a SceneCodec.
+
+Uso:
+    python benchmarks/bench_escenas.py [piezas...]
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import SceneCodec
+
+TIPOS = ("sofa", "mesa", "lampara")
+
+
+def escena(piezas):
+    rnd = random.Random(14)
+    return [
+        {
+            "type": rnd.choice(TIPOS),
+            "position": (rnd.uniform(0, 400), rnd.uniform(0, 500)),
+            "rotation": rnd.uniform(-180, 180),
+            "scale": rnd.uniform(0.5, 3)
+        }
+        for _ in range(piezas)
+    ]
+
+
+def medir(funcion, repeticiones=50):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    tamanos = [int(n) for n in sys.argv[1:]] or [10, 100, 1000]
+
+    for piezas in tamanos:
+        items = escena(piezas)
+        texto = json.dumps(items)
+        binario = SceneCodec.encode(items)
+        print(f"{piezas} piezas")
+        print(f"  JSON     {len(texto):8d} bytes  guardar {medir(lambda: json.dumps(items)):7.3f} ms"
+              f"  leer {medir(lambda: json.loads(texto)):7.3f} ms")
+        print(f"  binario  {len(binario):8d} bytes  guardar {medir(lambda: SceneCodec.encode(items)):7.3f} ms"
+              f"  leer {medir(lambda: SceneCodec.decode(binario)):7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark de importación de catálogos (CSV y JSON Lines) por SKU.
+
+Genera un catálogo de proveedor sintético y mide la importación inicial,
+la reimportación sin cambios (no reescribe nada) y una con precios nuevos,
+además del pico de memoria de Python, que no depende del tamaño del
+archivo.
+
+Uso:
+    python benchmarks/bench_importacion.py [filas]
+"""
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import CatalogImport, Database
+
+PALABRAS = ("sofá mesa lámpara silla cama estantería roble cuero metal vidrio "
+            "moderno clásico industrial nórdico tela mármol pino nogal").split()
+CATEGORIAS = ("Sofá", "Mesa", "Lámpara", "Silla", "Estantería", "Cama")
+
+
+def escribir_catalogo(ruta, cantidad, incremento=0.0):
+    rnd = random.Random(8)
+    filas = (
+        {"sku": f"PRV-{i:06d}", "nombre": " ".join(rnd.sample(PALABRAS, 2)).capitalize(),
+         "categoria": rnd.choice(CATEGORIAS), "precio": round(rnd.uniform(100, 9000) + incremento, 2),
+         "descripcion": " ".join(rnd.sample(PALABRAS, 8)), "stock": rnd.randint(0, 20)}
+        for i in range(cantidad)
+    )
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        if ruta.endswith(".csv"):
+            escritor = csv.DictWriter(f, fieldnames=["sku", "nombre", "categoria", "precio",
+                                                     "descripcion", "stock"])
+            escritor.writeheader()
+            escritor.writerows(filas)
+        else:
+            for fila in filas:
+                f.write(json.dumps(fila, ensure_ascii=False) + "\n")
+
+
+def importar(db, ruta, memoria=False):
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    importacion = CatalogImport(db, ruta)
+    importacion.run()
+    duracion = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    assert importacion.estado == "completada", importacion.error
+    return importacion, duracion, pico
+
+
+def main_bench():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"Filas: {cantidad}  bloque: {CatalogImport.CHUNK}")
+
+    for extension in (".csv", ".jsonl"):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, "bench.db"))
+            ruta = os.path.join(tmp, "catalogo" + extension)
+            escribir_catalogo(ruta, cantidad)
+            print(f"{extension[1:]}  ({os.path.getsize(ruta) / 1e6:.1f} MB)")
+
+            for nombre, incremento in (("inicial", None), ("sin cambios", 0.0), ("precios nuevos", 5.0)):
+                if incremento is not None:
+                    # Otro contenido (o fecha): no es una importación a medias
+                    escribir_catalogo(ruta, cantidad, incremento)
+                importacion, duracion, _ = importar(db, ruta)
+                print(f"  {nombre:<15} {duracion * 1000:8.0f} ms  {importacion.filas / duracion:8.0f} filas/s  "
+                      f"nuevos {importacion.insertados:6d}  actualizados {importacion.actualizados:6d}")
+
+            # Pico de memoria de Python (tracemalloc ralentiza, se mide aparte)
+            escribir_catalogo(ruta, cantidad, 10.0)
+            _, _, pico = importar(db, ruta, memoria=True)
+            print(f"  pico de memoria {pico / 1024:8.0f} KB")
+            db.close()
+
+
+if __name__ == "__main__":
+    main_bench()
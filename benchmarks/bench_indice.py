@@ -0,0 +1,103 @@
+"""Escalado del índice espacial (SpatialGrid) frente a recorrer todas las piezas.
+
+Las piezas se reparten con densidad constante (el área crece con N), como
+en una planta más grande con el mismo mobiliario por metro cuadrado.
+
+Uso:
+    python benchmarks/bench_indice.py [piezas...]
+"""
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import SpatialGrid
+
+# Superficie por pieza en px² (una pieza mide entre 50 y 200 px de lado)
+AREA_POR_PIEZA = 150 * 150
+
+
+def cajas(piezas, lado):
+    rnd = random.Random(17)
+    resultado = []
+    for _ in range(piezas):
+        x, y = rnd.uniform(0, lado), rnd.uniform(0, lado)
+        ancho, alto = rnd.uniform(50, 200), rnd.uniform(50, 200)
+        resultado.append((x, y, x + ancho, y + alto))
+    return resultado
+
+
+def cortan(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main():
+    tamanos = [int(n) for n in sys.argv[1:]] or [100, 500, 1000, 2000, 5000]
+    rnd = random.Random(18)
+
+    print("piezas   punto µs (rejilla/lineal)   rango µs (rejilla/lineal)   mover µs   "
+          "solapes ms (rejilla/n²)")
+    for piezas in tamanos:
+        lado = math.sqrt(piezas * AREA_POR_PIEZA)
+        lista = cajas(piezas, lado)
+        indice = SpatialGrid(128)
+        for key, caja in enumerate(lista):
+            indice.insert(key, caja)
+
+        puntos = [(rnd.uniform(0, lado), rnd.uniform(0, lado)) for _ in range(200)]
+        rangos = [(x, y, x + 300, y + 300) for x, y in puntos]
+
+        def puntos_rejilla():
+            for x, y in puntos:
+                indice.query_point(x, y)
+
+        def puntos_lineal():
+            for x, y in puntos:
+                [k for k, c in enumerate(lista) if c[0] <= x <= c[2] and c[1] <= y <= c[3]]
+
+        def rangos_rejilla():
+            for rango in rangos:
+                indice.query_range(*rango)
+
+        def rangos_lineal():
+            for rango in rangos:
+                [k for k, c in enumerate(lista) if cortan(c, rango)]
+
+        def mover():
+            for key in range(0, piezas, max(1, piezas // 200)):
+                x1, y1, x2, y2 = lista[key]
+                indice.update(key, (x1 + 40, y1 + 25, x2 + 40, y2 + 25))
+                indice.update(key, lista[key])
+
+        def pares_lineal():
+            return [(i, j) for i in range(piezas) for j in range(i + 1, piezas)
+                    if cortan(lista[i], lista[j])]
+
+        por_consulta = 1e6 / len(puntos)
+        p_rejilla = medir(puntos_rejilla, 5) * por_consulta
+        p_lineal = medir(puntos_lineal, 3) * por_consulta
+        r_rejilla = medir(rangos_rejilla, 5) * por_consulta
+        r_lineal = medir(rangos_lineal, 3) * por_consulta
+        m_rejilla = medir(mover, 5) * 1e6 / len(range(0, piezas, max(1, piezas // 200))) / 2
+        s_rejilla = medir(indice.overlapping_pairs, 3) * 1000
+        s_lineal = medir(pares_lineal, 1) * 1000
+        assert len(indice.overlapping_pairs()) == len(pares_lineal())
+
+        print(f"{piezas:>6}   {p_rejilla:10.1f} {p_lineal:10.1f}     {r_rejilla:10.1f} {r_lineal:10.1f}"
+              f"     {m_rejilla:8.1f}   {s_rejilla:10.1f} {s_lineal:10.1f}")
+
+if __name__ == "__main__":
+    main()
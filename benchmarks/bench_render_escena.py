@@ -0,0 +1,133 @@
+"""Benchmark de renderizado AR: un Scatter por pieza frente a SceneCanvas.
+
+Para cada tamaño de escena mide la creación de las piezas, el frame
+mientras se arrastra una pieza y el coste de resolver un toque (hit-test).
+
+Uso:
+    python benchmarks/bench_render_escena.py [piezas...]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from kivy.config import Config
+
+# Sin límite de fps para que Clock no duerma entre frames medidos
+Config.set("graphics", "maxfps", "0")
+
+from kivy.base import EventLoop
+from kivy.core.window import Window
+from kivy.input.motionevent import MotionEvent
+from kivy.uix.screenmanager import NoTransition
+
+import main
+
+
+class Toque(MotionEvent):
+    """Toque sintético en coordenadas de ventana"""
+
+    def __init__(self, x, y):
+        super().__init__("bench", id(self), (x, y), is_touch=True)
+        self.scale_for_screen(Window.width, Window.height)
+
+    def depack(self, args):
+        self.sx = args[0] / Window.width
+        self.sy = args[1] / Window.height
+        self.profile = ["pos"]
+        super().depack(args)
+
+
+def frame():
+    """Procesa un frame completo (eventos, layout y dibujo)"""
+    inicio = time.perf_counter()
+    EventLoop.idle()
+    return time.perf_counter() - inicio
+
+
+def escena(area, piezas):
+    rnd = random.Random(16)
+    return [
+        (rnd.choice(("sofa", "mesa", "lampara")),
+         (area.x + rnd.uniform(0, area.width), area.y + rnd.uniform(0, area.height)),
+         rnd.uniform(0, 360), rnd.uniform(0.3, 1))
+        for _ in range(piezas)
+    ]
+
+
+def medir(screen, items, denso):
+    screen.clear_scene()
+    frame()
+    screen.dense_mode = denso
+    capa = screen.ids.ar_canvas if denso else screen.ids.ar_pieces
+
+    inicio = time.perf_counter()
+    for tipo, posicion, rotacion, escala in items:
+        screen.place_piece(tipo, screen.resolve_sprite(tipo), posicion, rotacion, escala,
+                           next(screen.piece_ids))
+    creacion = time.perf_counter() - inicio + frame()
+
+    # Hit-test: toques en puntos al azar del área (con y sin pieza debajo)
+    rnd = random.Random(17)
+    area = screen.ids.ar_area
+    toques = []
+    for _ in range(200):
+        toque = Toque(area.x + rnd.uniform(0, area.width), area.y + rnd.uniform(0, area.height))
+        inicio = time.perf_counter()
+        capa.on_touch_down(toque)
+        toques.append(time.perf_counter() - inicio)
+        for widget in [ref() for ref in toque.grab_list]:
+            if widget is not None:
+                toque.grab_current = widget
+                widget.on_touch_up(toque)
+        toque.grab_current = None
+
+    # Frame mientras se mueve una sola pieza
+    frames = []
+    for i in range(30):
+        if denso:
+            pieza = next(iter(capa.pieces.values()))
+            capa.move_piece(pieza, pieza.x + 1, pieza.y)
+        else:
+            capa.children[0].x += 1
+        frames.append(frame())
+
+    return creacion, statistics.median(toques), statistics.median(frames)
+
+
+def main_bench():
+    tamanos = [int(n) for n in sys.argv[1:]] or [100, 500, 1000]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Base de datos temporal; los sprites se leen del repositorio
+        os.chdir(tmp)
+        os.makedirs("data")
+        os.symlink(os.path.join(RAIZ, "assets"), "assets")
+        app = main.DercoR8App()
+        app._run_prepare()
+        app.root.transition = NoTransition()
+        app.root.current = "ar_view"
+        for _ in range(3):
+            frame()
+        screen = app.root.get_screen("ar_view")
+
+        for piezas in tamanos:
+            items = escena(screen.ids.ar_area, piezas)
+            print(f"{piezas} piezas")
+            for nombre, denso in (("Scatter", False), ("SceneCanvas", True)):
+                creacion, toque, frame_mover = medir(screen, items, denso)
+                print(f"  {nombre:<12} creación {creacion * 1000:8.1f} ms  "
+                      f"toque {toque * 1e6:8.1f} µs  frame moviendo {frame_mover * 1000:6.2f} ms")
+
+        screen.clear_scene()
+        app.stop()
+        frame()
+
+
+if __name__ == "__main__":
+    main_bench()
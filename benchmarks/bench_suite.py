@@ -0,0 +1,366 @@
+"""Suite de benchmarks sin pantalla: base de datos, pantallas y arranque.
+
+Para cada tamaño siembra una base temporal (productos, proyectos y
+escenas AR sintéticos) y, en un proceso nuevo con la ventana offscreen de
+SDL y el backend GL simulado de Kivy (no hace falta GPU), mide:
+
+  - métodos de Database (lecturas y escrituras)
+  - CatalogScreen.load_products hasta tener los datos en el RecycleView
+  - ProfileScreen.load_projects hasta mostrar la primera página
+  - ARScreen.load_scene_data hasta terminar de construir la escena
+  - el arranque en frío (benchmarks/bench_arranque.py)
+
+Los resultados se guardan en JSON para comparar commits, por defecto en
+benchmarks/results/bench-<commit>.json.
+
+Uso:
+    python benchmarks/bench_suite.py [--tamanos pequeno,mediano,grande] [--salida archivo.json]
+    python benchmarks/bench_suite.py --comparar base.json nuevo.json [--umbral 10]
+"""
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARCA = "RESULTADOS_SUITE "
+# Destino por defecto de los informes (ignorado por git)
+RESULTADOS = os.path.join(RAIZ, "benchmarks", "results")
+
+# Sin GPU ni pantalla: ventana offscreen de SDL y backend GL simulado
+os.environ.setdefault("KIVY_GL_BACKEND", "mock")
+os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+# nombre: (productos, proyectos, piezas por escena AR)
+TAMANOS = {
+    "pequeno": (1000, 20, 50),
+    "mediano": (10000, 200, 300),
+    "grande": (50000, 1000, 1000),
+}
+REPETICIONES_DB = 20
+REPETICIONES_PANTALLA = 5
+REPETICIONES_ARRANQUE = 3
+
+PALABRAS = ("sofá mesa lámpara silla cama estantería roble cuero metal vidrio "
+            "moderno clásico industrial nórdico tela mármol pino nogal").split()
+CATEGORIAS = ("Sofá", "Mesa", "Lámpara", "Silla", "Estantería", "Cama")
+MUEBLES = ("sofa", "mesa", "lampara")
+
+
+def estadisticas(tiempos):
+    """Resumen en milisegundos de una lista de tiempos en segundos"""
+    ms = sorted(t * 1000 for t in tiempos)
+    return {
+        "n": len(ms),
+        "median_ms": statistics.median(ms),
+        "p95_ms": ms[max(0, -(-95 * len(ms) // 100) - 1)],
+        "min_ms": ms[0],
+    }
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return estadisticas(tiempos)
+
+
+# Proceso hijo: siembra y mide con la app en marcha
+
+def sembrar(main, db, productos, proyectos, piezas):
+    rnd = random.Random(8)
+    filas = [
+        (" ".join(rnd.sample(PALABRAS, 2)).capitalize(), rnd.choice(CATEGORIAS),
+         round(rnd.uniform(100, 9000), 2), "assets/default.png",
+         " ".join(rnd.sample(PALABRAS, 8)), rnd.randint(0, 20))
+        for _ in range(productos)
+    ]
+    escena = main.SceneCodec.encode([
+        {"type": rnd.choice(MUEBLES), "position": (rnd.uniform(0, 380), rnd.uniform(0, 450)),
+         "rotation": rnd.uniform(0, 360), "scale": rnd.uniform(0.3, 1)}
+        for _ in range(piezas)
+    ])
+    user_id = db.get_usuario_id()
+    with db.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO productos (nombre, categoria, precio, imagen, descripcion, stock) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            filas
+        )
+        conn.executemany(
+            "INSERT INTO proyectos (user_id, nombre, tipo, datos, fecha) VALUES (?, ?, ?, ?, ?)",
+            [
+                (user_id, f"Proyecto {i}", "ar" if i % 2 else "propuesta",
+                 escena if i % 2 else "Propuesta de ejemplo " * 20,
+                 f"2024-01-{1 + i % 28:02d} {i % 24:02d}:00:00")
+                for i in range(proyectos)
+            ]
+        )
+    return escena
+
+
+def frame():
+    from kivy.base import EventLoop
+    EventLoop.idle()
+
+
+def esperar(condicion, limite=60):
+    """Procesa frames hasta que condicion() se cumple; devuelve los segundos"""
+    inicio = time.perf_counter()
+    while not condicion():
+        if time.perf_counter() - inicio > limite:
+            raise RuntimeError("Tiempo de espera agotado")
+        frame()
+    return time.perf_counter() - inicio
+
+
+def cerrar_popups():
+    from kivy.core.window import Window
+    from kivy.uix.popup import Popup
+    for widget in list(Window.children):
+        if isinstance(widget, Popup):
+            widget.dismiss(animation=False)
+
+
+def medir_base_de_datos(db, proyecto_ar):
+    user_id = db.get_usuario_id()
+    escena = db.get_datos_proyecto(proyecto_ar)
+    lecturas = {
+        "db.get_productos": lambda: db.get_productos(),
+        "db.get_version_productos": lambda: db.get_version_productos(),
+        "db.search_productos.texto": lambda: db.search_productos(texto="mesa nogal", limite=50),
+        "db.search_productos.facetas": lambda: db.search_productos(
+            texto="moderno", categoria="Silla", precio_min=500, precio_max=5000, limite=50),
+        "db.get_facetas_categoria": lambda: db.get_facetas_categoria(texto="roble"),
+        "db.get_usuario_id": lambda: db.get_usuario_id(),
+        "db.listar_proyectos": lambda: db.listar_proyectos(user_id),
+        "db.listar_proyectos.ar": lambda: db.listar_proyectos(user_id, "ar"),
+        "db.get_datos_proyecto": lambda: db.get_datos_proyecto(proyecto_ar),
+    }
+    escrituras = {
+        "db.guardar_proyecto_ar": lambda: db.guardar_proyecto_ar(user_id, "Bench", escena),
+        "db.agregar_cambios_escena": lambda: db.agregar_cambios_escena(user_id, b"x" * 64),
+    }
+    resultados = {nombre: medir(f, REPETICIONES_DB) for nombre, f in lecturas.items()}
+    resultados.update({nombre: medir(f, REPETICIONES_DB) for nombre, f in escrituras.items()})
+    return resultados
+
+
+def medir_pantallas(app, escena):
+    from kivy.uix.screenmanager import NoTransition
+    app.root.transition = NoTransition()
+    resultados = {}
+
+    catalogo = app.root.get_screen("catalog")
+    tiempos = []
+    for _ in range(REPETICIONES_PANTALLA):
+        inicio = time.perf_counter()
+        catalogo.load_products()
+        esperar(lambda: not catalogo.loading)
+        frame()
+        tiempos.append(time.perf_counter() - inicio)
+    resultados["screen.catalog.load_products"] = estadisticas(tiempos)
+
+    perfil = app.root.get_screen("profile")
+
+    def cargando():
+        return any(getattr(w, "text", "") == "Cargando proyectos..."
+                   for w in perfil.ids.projects_grid.children)
+
+    tiempos = []
+    for _ in range(REPETICIONES_PANTALLA):
+        inicio = time.perf_counter()
+        perfil.load_projects()
+        esperar(lambda: not cargando())
+        frame()
+        tiempos.append(time.perf_counter() - inicio)
+    resultados["screen.profile.load_projects"] = estadisticas(tiempos)
+
+    ar = app.root.get_screen("ar_view")
+    app.root.current = "ar_view"
+    frame()
+    tiempos = []
+    frames_max = []
+    for _ in range(REPETICIONES_PANTALLA):
+        inicio = time.perf_counter()
+        ar.load_scene_data(escena)
+        esperar(lambda: not ar.loading_scene)
+        tiempos.append(time.perf_counter() - inicio)
+        frames_max.append(ar.last_scene_stats["frame_max_ms"] / 1000)
+        cerrar_popups()
+        frame()
+    resultados["screen.ar.load_scene_data"] = estadisticas(tiempos)
+    resultados["screen.ar.load_scene_data.frame_max"] = estadisticas(frames_max)
+    return resultados
+
+
+def hijo(tamano, directorio):
+    os.chdir(directorio)
+    sys.path.insert(0, RAIZ)
+    from kivy.config import Config
+    # Sin límite de fps para que Clock no duerma entre frames medidos
+    Config.set("graphics", "maxfps", "0")
+    import main
+
+    productos, proyectos, piezas = TAMANOS[tamano]
+    db = main.Database(os.path.join("data", "dercor8.db"))
+    escena = sembrar(main, db, productos, proyectos, piezas)
+    db.close()
+
+    app = main.DercoR8App()
+    app._run_prepare()
+    frame()
+    # Esperar a la inicialización de la base en su hilo
+    app.db_worker.submit(lambda: None).result()
+    frame()
+    app.root.cancel_prewarm()
+
+    with app.db.pool.connection() as conn:
+        proyecto_ar = conn.execute(
+            "SELECT id FROM proyectos WHERE tipo = 'ar' ORDER BY id LIMIT 1").fetchone()[0]
+    resultados = medir_base_de_datos(app.db, proyecto_ar)
+    resultados.update(medir_pantallas(app, escena))
+
+    app.stop()
+    frame()
+    print(MARCA + json.dumps(resultados), flush=True)
+
+
+# Proceso principal
+
+def ejecutar_tamano(tamano):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bench_arranque
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "data"))
+        os.symlink(os.path.join(RAIZ, "assets"), os.path.join(tmp, "assets"))
+        salida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--hijo", tamano, tmp],
+            capture_output=True, text=True
+        )
+        resultados = None
+        for linea in salida.stdout.splitlines():
+            if linea.startswith(MARCA):
+                resultados = json.loads(linea[len(MARCA):])
+        if resultados is None:
+            sys.stderr.write(salida.stderr[-4000:])
+            raise RuntimeError(f"La medición del tamaño {tamano} falló")
+
+        # Arranque con la base ya sembrada
+        informes = [bench_arranque.medir(False, tmp) for _ in range(REPETICIONES_ARRANQUE)]
+        for clave in ("first_frame_ms", "db_ready_ms"):
+            resultados[f"startup.{clave[:-3]}"] = estadisticas(
+                [informe[clave] / 1000 for informe in informes if clave in informe]
+            )
+    return resultados
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def entorno():
+    import sqlite3
+    try:
+        import kivy
+        version_kivy = kivy.__version__
+    except ImportError:
+        version_kivy = None
+    return {
+        "python": platform.python_version(),
+        "kivy": version_kivy,
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "gl": os.environ.get("KIVY_GL_BACKEND"),
+    }
+
+
+def comparar(base_ruta, nuevo_ruta, umbral):
+    with open(base_ruta) as f:
+        base = json.load(f)
+    with open(nuevo_ruta) as f:
+        nuevo = json.load(f)
+    print(f"{base.get('commit')} -> {nuevo.get('commit')}  (umbral {umbral:.0f} %)")
+
+    regresiones = 0
+    for tamano, metricas in nuevo["resultados"].items():
+        anteriores = base["resultados"].get(tamano, {})
+        print(tamano)
+        for nombre, datos in sorted(metricas.items()):
+            if nombre not in anteriores:
+                print(f"  {nombre:<40} {'':>10} {datos['median_ms']:10.2f} ms  (nuevo)")
+                continue
+            antes = anteriores[nombre]["median_ms"]
+            ahora = datos["median_ms"]
+            cambio = (ahora - antes) / antes * 100 if antes else 0.0
+            marca = ""
+            if cambio > umbral:
+                marca = "  REGRESIÓN"
+                regresiones += 1
+            print(f"  {nombre:<40} {antes:10.2f} {ahora:10.2f} ms  {cambio:+6.1f} %{marca}")
+    return 1 if regresiones else 0
+
+
+def argumento(nombre, defecto=None):
+    if nombre in sys.argv:
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return defecto
+
+
+def main_bench():
+    if "--hijo" in sys.argv:
+        hijo(argumento("--hijo"), sys.argv[sys.argv.index("--hijo") + 2])
+        return
+    if "--comparar" in sys.argv:
+        indice = sys.argv.index("--comparar")
+        base, nuevo = sys.argv[indice + 1], sys.argv[indice + 2]
+        sys.exit(comparar(base, nuevo, float(argumento("--umbral", 10))))
+
+    tamanos = argumento("--tamanos", "pequeno,mediano").split(",")
+    for tamano in tamanos:
+        if tamano not in TAMANOS:
+            sys.exit(f"Tamaño desconocido: {tamano} (opciones: {', '.join(TAMANOS)})")
+    commit = commit_actual()
+    salida = argumento("--salida")
+    if salida is None:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        salida = os.path.join(
+            RESULTADOS, f"bench-{commit or datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+    informe = {
+        "version": 1,
+        "commit": commit,
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "entorno": entorno(),
+        "tamanos": {t: dict(zip(("productos", "proyectos", "piezas"), TAMANOS[t])) for t in tamanos},
+        "resultados": {},
+    }
+    for tamano in tamanos:
+        print(f"Midiendo {tamano} {TAMANOS[tamano]}...", flush=True)
+        informe["resultados"][tamano] = resultados = ejecutar_tamano(tamano)
+        for nombre, datos in sorted(resultados.items()):
+            print(f"  {nombre:<40} mediana {datos['median_ms']:9.2f} ms  "
+                  f"p95 {datos['p95_ms']:9.2f} ms")
+
+    with open(salida, "w") as f:
+        json.dump(informe, f, indent=1)
+    print(f"Resultados en {salida}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -63,7 +63,7 @@ log_level = 2
 source.include_patterns = assets/*,data/*
 
 # Excluir archivos grandes
-source.exclude_dirs = tests, bin
+source.exclude_dirs = tests, bin, benchmarks, tools
 
 # Arquitectura
 android.arch = armeabi-v7a
@@ -1,31 +1,194 @@
+import time
+# Referencia del informe de arranque (tiempo hasta el primer frame)
+ARRANQUE = time.perf_counter()
+
 from kivy.app import App
+from kivy.config import Config
 from kivy.lang import Builder
-from kivy.uix.screenmanager import ScreenManager, Screen, SlideTransition, FadeTransition
+from kivy.factory import Factory
+from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.scatter import Scatter
 from kivy.uix.image import Image
-from kivy.uix.floatlayout import FloatLayout
-from kivy.properties import StringProperty, ListProperty
+from kivy.uix.widget import Widget
+from kivy.properties import StringProperty, ListProperty, NumericProperty, BooleanProperty
 from kivy.uix.popup import Popup
 from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.core.window import Window
+from kivy.clock import Clock
+from kivy.graphics import (InstructionGroup, PushMatrix, PopMatrix, Translate, Rotate,
+                           Scale, Rectangle, Color)
+from kivy.graphics.transformation import Matrix
+from kivy.logger import Logger
 import os
+import re
+import csv
+import glob
+import hashlib
+import heapq
+import itertools
 import sqlite3
+import struct
+import threading
+import queue
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial, wraps
 from datetime import datetime
 import json
+import math
 
 # Configuración básica para desarrollo
 Window.size = (400, 700)
 
+# Pool de conexiones
+class ConnectionPool:
+    """Conexiones SQLite persistentes compartidas entre hilos.
+
+    Cada conexión se abre una sola vez y se reutiliza, de modo que las
+    sentencias preparadas quedan en la caché de ``sqlite3``.
+    """
+
+    def __init__(self, db_path, size=2, cached_statements=128, pragmas=()):
+        self.db_path = db_path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.pragmas = pragmas
+        self._libres = queue.LifoQueue()
+        self._todas = []
+        self._lock = threading.Lock()
+        self._cerrado = False
+
+    def _abrir(self):
+        """Abre una conexión nueva en modo autocommit (transacciones explícitas)"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=self.cached_statements
+        )
+        for pragma in self.pragmas:
+            conn.execute(f"PRAGMA {pragma}")
+        return conn
+
+    def _obtener(self):
+        """Toma una conexión libre o abre una nueva si el pool no está lleno"""
+        if self._cerrado:
+            raise sqlite3.ProgrammingError("El pool de conexiones está cerrado")
+        try:
+            conn = self._libres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._cerrado:
+                    raise sqlite3.ProgrammingError("El pool de conexiones está cerrado")
+                if len(self._todas) < self.size:
+                    conn = self._abrir()
+                    self._todas.append(conn)
+                    return conn
+            # Pool lleno: esperar a que otro hilo devuelva su conexión
+            conn = self._libres.get()
+        
+        if conn is None:
+            # Marca de close(): se deja para el siguiente hilo que espere
+            self._libres.put(None)
+            raise sqlite3.ProgrammingError("El pool de conexiones está cerrado")
+        return conn
+
+    def _devolver(self, conn):
+        with self._lock:
+            if not self._cerrado:
+                self._libres.put(conn)
+                return
+            # Prestada durante close(): se cierra al terminar de usarla
+            conn.close()
+            self._todas.remove(conn)
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión para lecturas o sentencias sueltas"""
+        conn = self._obtener()
+        try:
+            yield conn
+        finally:
+            self._devolver(conn)
+
+    @contextmanager
+    def transaction(self, modo="IMMEDIATE"):
+        """Presta una conexión dentro de una transacción (de escritura por defecto).
+        
+        modo="DEFERRED" sirve para leer varias consultas de una misma
+        instantánea sin bloquear a los escritores.
+        """
+        with self.connection() as conn:
+            conn.execute(f"BEGIN {modo}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse.
+        
+        Después de cerrar, pedir una conexión lanza ProgrammingError.
+        """
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            while True:
+                try:
+                    conn = self._libres.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._todas.remove(conn)
+            # Despierta a los hilos que esperan una conexión con el pool lleno
+            self._libres.put(None)
+
+# Fila ligera para listados: todo el proyecto salvo la columna datos
+ProyectoResumen = namedtuple("ProyectoResumen", "id nombre tipo fecha")
+# Punto de control de una importación de catálogo
+Importacion = namedtuple("Importacion", "id posicion filas insertados actualizados errores")
+
 # Base de datos
 class Database:
-    def __init__(self):
-        self.db_path = self.get_db_path()
+    # PRAGMAs aplicados a cada conexión: WAL evita el fsync completo del
+    # journal en cada escritura y deja leer mientras otro hilo escribe
+    PRAGMAS = (
+        "journal_mode = WAL",
+        "synchronous = NORMAL",
+        "cache_size = -4000",
+        "mmap_size = 67108864",
+        "temp_store = MEMORY",
+        "busy_timeout = 5000",
+    )
+    # Columnas de producto que reciben las pantallas (el sku solo lo usa
+    # la importación de catálogos)
+    PRODUCT_COLUMNS = ("id", "nombre", "categoria", "precio", "imagen", "descripcion", "stock")
+    # Valores de los productos importados sin categoría o sin imagen
+    DEFAULT_CATEGORY = "Sin categoría"
+    DEFAULT_IMAGE = "assets/default.png"
+    
+    def __init__(self, db_path=None, initialize=True):
+        self.db_path = db_path or self.get_db_path()
+        self.pool = ConnectionPool(self.db_path, pragmas=self.PRAGMAS)
+        self.fts_disponible = False
+        # initialize=False deja migraciones y datos iniciales para initialize(),
+        # p. ej. en el hilo de consultas (las conexiones se abren al usarse)
+        if initialize:
+            self.initialize()
+    
+    def initialize(self):
         self.init_database()
+        self.fts_disponible = self._existe_tabla("productos_fts")
     
     def get_db_path(self):
         """Obtiene la ruta correcta para la base de datos según la plataforma"""
@@ -44,9 +207,78 @@ class Database:
             return os.path.join('data', 'dercor8.db')
     
     def init_database(self):
-        """Inicializa la base de datos con tablas necesarias"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Inicializa la base de datos: aplica migraciones y datos iniciales"""
+        self.enable_incremental_vacuum()
+        self.migrate()
+        
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Insertar datos de ejemplo si la tabla está vacía
+            cursor.execute("SELECT COUNT(*) FROM productos")
+            if cursor.fetchone()[0] == 0:
+                self.insert_sample_data(cursor)
+            
+            # Insertar usuario por defecto
+            cursor.execute("SELECT COUNT(*) FROM usuarios")
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(
+                    "INSERT INTO usuarios (username, fecha_registro) VALUES (?, ?)",
+                    ("Usuario", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+            
+            # El registro de cambios solo sirve dentro de una sesión
+            cursor.execute("DELETE FROM productos_cambios")
+    
+    def enable_incremental_vacuum(self):
+        """Activa auto_vacuum incremental para poder devolver espacio tras borrados masivos"""
+        with self.pool.connection() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return
+            # En una base existente el cambio solo se aplica reconstruyendo
+            # el archivo con VACUUM (una única vez)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+    
+    def _existe_tabla(self, nombre):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (nombre,)
+            ).fetchone() is not None
+    
+    def get_schema_version(self):
+        """Obtiene la versión del esquema guardada en PRAGMA user_version"""
+        with self.pool.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def migrate(self):
+        """Aplica en orden las migraciones pendientes, cada una en su transacción"""
+        version = self.get_schema_version()
+        migraciones = self.migraciones()
+        
+        for numero, migracion in enumerate(migraciones[version:], start=version + 1):
+            with self.pool.transaction() as conn:
+                migracion(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {numero}")
+    
+    def migraciones(self):
+        """Lista ordenada de migraciones; la versión de cada una es su posición + 1.
+        
+        Nunca se modifica una migración ya publicada: los cambios de esquema
+        se agregan al final de la lista.
+        """
+        return [
+            self._migracion_esquema_inicial,
+            self._migracion_indices_proyectos,
+            self._migracion_cambios_productos,
+            self._migracion_busqueda_productos,
+            self._migracion_autoguardado_escenas,
+            self._migracion_importacion_productos,
+        ]
+    
+    def _migracion_esquema_inicial(self, cursor):
+        """v1: tablas de productos, usuarios y proyectos"""
+        # IF NOT EXISTS: las bases creadas antes de las migraciones ya las tienen
         
         # Tabla de productos
         cursor.execute('''
@@ -81,22 +313,129 @@ class Database:
                 fecha TEXT
             )
         ''')
+    
+    def _migracion_indices_proyectos(self, cursor):
+        """v2: índices para listar proyectos por usuario y tipo ordenados por fecha"""
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_proyectos_usuario_tipo_fecha "
+            "ON proyectos (user_id, tipo, fecha)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_proyectos_usuario_fecha "
+            "ON proyectos (user_id, fecha)"
+        )
+    
+    def _migracion_cambios_productos(self, cursor):
+        """v3: registro de cambios de productos mantenido por triggers"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS productos_cambios (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                producto_id INTEGER NOT NULL
+            )
+        ''')
         
-        # Insertar datos de ejemplo si la tabla está vacía
-        cursor.execute("SELECT COUNT(*) FROM productos")
-        if cursor.fetchone()[0] == 0:
-            self.insert_sample_data(cursor)
+        for evento, fila in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS productos_cambios_{evento.lower()}
+                AFTER {evento} ON productos
+                BEGIN
+                    INSERT INTO productos_cambios (producto_id) VALUES ({fila}.id);
+                END
+            ''')
+    
+    def _migracion_busqueda_productos(self, cursor):
+        """v4: índice de texto completo FTS5 e índices para las facetas de búsqueda"""
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_productos_categoria_precio "
+            "ON productos (categoria, precio)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_productos_precio ON productos (precio)"
+        )
         
-        # Insertar usuario por defecto
-        cursor.execute("SELECT COUNT(*) FROM usuarios")
-        if cursor.fetchone()[0] == 0:
-            cursor.execute(
-                "INSERT INTO usuarios (username, fecha_registro) VALUES (?, ?)",
-                ("Usuario", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-            )
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+                    nombre, categoria, descripcion,
+                    content='productos', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            # SQLite compilado sin FTS5: search_productos usa LIKE
+            return
         
-        conn.commit()
-        conn.close()
+        cursor.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+        
+        # Triggers que mantienen el índice sincronizado con productos
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_fts_insert AFTER INSERT ON productos
+            BEGIN
+                INSERT INTO productos_fts (rowid, nombre, categoria, descripcion)
+                VALUES (new.id, new.nombre, new.categoria, new.descripcion);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_fts_delete AFTER DELETE ON productos
+            BEGIN
+                INSERT INTO productos_fts (productos_fts, rowid, nombre, categoria, descripcion)
+                VALUES ('delete', old.id, old.nombre, old.categoria, old.descripcion);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_fts_update AFTER UPDATE ON productos
+            BEGIN
+                INSERT INTO productos_fts (productos_fts, rowid, nombre, categoria, descripcion)
+                VALUES ('delete', old.id, old.nombre, old.categoria, old.descripcion);
+                INSERT INTO productos_fts (rowid, nombre, categoria, descripcion)
+                VALUES (new.id, new.nombre, new.categoria, new.descripcion);
+            END
+        ''')
+    
+    def _migracion_autoguardado_escenas(self, cursor):
+        """v5: copia de trabajo de la escena AR: instantánea + registro de cambios"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS escena_autoguardado (
+                user_id INTEGER PRIMARY KEY,
+                snapshot BLOB,
+                fecha TEXT,
+                FOREIGN KEY (user_id) REFERENCES usuarios (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS escena_cambios (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                datos BLOB NOT NULL
+            )
+        ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_escena_cambios_usuario ON escena_cambios (user_id, seq)"
+        )
+    
+    def _migracion_importacion_productos(self, cursor):
+        """v6: SKU único de proveedor y puntos de control de las importaciones de catálogo"""
+        cursor.execute("ALTER TABLE productos ADD COLUMN sku TEXT")
+        # Los productos sin SKU (los de ejemplo) no chocan entre sí: NULL no se repite
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_sku ON productos (sku)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS importaciones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ruta TEXT NOT NULL,
+                formato TEXT NOT NULL,
+                tamano INTEGER,
+                modificado REAL,
+                posicion INTEGER DEFAULT 0,
+                filas INTEGER DEFAULT 0,
+                insertados INTEGER DEFAULT 0,
+                actualizados INTEGER DEFAULT 0,
+                errores INTEGER DEFAULT 0,
+                estado TEXT DEFAULT 'en_curso',
+                error TEXT,
+                fecha_inicio TEXT,
+                fecha_fin TEXT
+            )
+        ''')
     
     def insert_sample_data(self, cursor):
         """Inserta datos de ejemplo en la base de datos"""
@@ -123,85 +462,2183 @@ class Database:
     
     def get_productos(self):
         """Obtiene todos los productos"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM productos")
-        productos = cursor.fetchall()
-        conn.close()
-        return productos
+        with self.pool.connection() as conn:
+            return conn.execute(
+                f"SELECT {', '.join(self.PRODUCT_COLUMNS)} FROM productos ORDER BY id"
+            ).fetchall()
+    
+    def get_version_productos(self):
+        """Obtiene el contador de cambios de productos (crece con cada alta, edición o baja)"""
+        with self.pool.connection() as conn:
+            fila = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'productos_cambios'"
+            ).fetchone()
+        return fila[0] if fila else 0
+    
+    def get_cambios_productos(self, desde):
+        """Obtiene los productos modificados después de la versión desde.
+        
+        Devuelve (version, productos, ids_eliminados): las filas actuales de
+        los productos nuevos o editados y los ids de los que ya no existen.
+        """
+        with self.pool.transaction("DEFERRED") as conn:
+            fila = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'productos_cambios'"
+            ).fetchone()
+            version = fila[0] if fila else 0
+            
+            ids = {pid for (pid,) in conn.execute(
+                "SELECT DISTINCT producto_id FROM productos_cambios WHERE seq > ? AND seq <= ?",
+                (desde, version)
+            )}
+            productos = conn.execute(
+                f"SELECT {', '.join(self.PRODUCT_COLUMNS)} FROM productos WHERE id IN "
+                "(SELECT producto_id FROM productos_cambios WHERE seq > ? AND seq <= ?) "
+                "ORDER BY id",
+                (desde, version)
+            ).fetchall()
+        
+        ids_eliminados = ids - {producto[0] for producto in productos}
+        return version, productos, ids_eliminados
+    
+    def compactar_cambios_productos(self, hasta):
+        """Descarta del registro los cambios ya aplicados hasta la versión dada"""
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM productos_cambios WHERE seq <= ?", (hasta,))
+    
+    def iniciar_importacion(self, ruta, formato, tamano, modificado):
+        """Retoma la importación sin terminar del mismo archivo o registra una nueva.
+        
+        El archivo es el mismo si coinciden ruta, tamaño y fecha de
+        modificación; si cambió, la importación anterior se abandona y se
+        empieza desde el principio. Devuelve una Importacion.
+        """
+        with self.pool.transaction() as conn:
+            fila = conn.execute(
+                "SELECT id, posicion, filas, insertados, actualizados, errores FROM importaciones "
+                "WHERE ruta = ? AND formato = ? AND tamano = ? AND modificado = ? "
+                "AND estado = 'en_curso' ORDER BY id DESC LIMIT 1",
+                (ruta, formato, tamano, modificado)
+            ).fetchone()
+            if fila:
+                return Importacion(*fila)
+            
+            conn.execute(
+                "UPDATE importaciones SET estado = 'abandonada' WHERE ruta = ? AND estado = 'en_curso'",
+                (ruta,)
+            )
+            cursor = conn.execute(
+                "INSERT INTO importaciones (ruta, formato, tamano, modificado, fecha_inicio) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (ruta, formato, tamano, modificado, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            return Importacion(cursor.lastrowid, 0, 0, 0, 0, 0)
+    
+    def importar_productos(self, importacion_id, productos, posicion, leidas, errores):
+        """Inserta o actualiza por SKU un bloque de productos y guarda el punto de control.
+        
+        productos son tuplas (sku, nombre, categoria, precio, imagen,
+        descripcion, stock). None en categoria, imagen, descripcion o stock
+        es un dato que el archivo no trae: un producto nuevo recibe el valor
+        por defecto y uno existente conserva el suyo.
+        
+        Bloque y punto de control van en la misma transacción: tras una
+        interrupción la importación sigue justo después del último bloque
+        confirmado. Las filas idénticas a las guardadas no se reescriben
+        (ni tocan el índice FTS ni el registro de cambios).
+        Devuelve (insertados, actualizados).
+        """
+        with self.pool.transaction() as conn:
+            ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM productos").fetchone()[0]
+            # excluded ya trae los valores por defecto: el UPDATE usa los
+            # parámetros, y COALESCE deja la columna guardada si vienen a NULL
+            cambiados = conn.executemany('''
+                INSERT INTO productos (sku, nombre, categoria, precio, imagen, descripcion, stock)
+                VALUES (?1, ?2, COALESCE(?3, ?8), ?4, COALESCE(?5, ?9), COALESCE(?6, ''),
+                        COALESCE(?7, 1))
+                ON CONFLICT (sku) DO UPDATE SET
+                    nombre = ?2, categoria = COALESCE(?3, categoria), precio = ?4,
+                    imagen = COALESCE(?5, imagen), descripcion = COALESCE(?6, descripcion),
+                    stock = COALESCE(?7, stock)
+                WHERE (nombre, categoria, precio, imagen, descripcion, stock) IS NOT
+                      (?2, COALESCE(?3, categoria), ?4, COALESCE(?5, imagen),
+                       COALESCE(?6, descripcion), COALESCE(?7, stock))
+            ''', [producto + (self.DEFAULT_CATEGORY, self.DEFAULT_IMAGE)
+                  for producto in productos]).rowcount
+            # Los ids nuevos son mayores que el último (AUTOINCREMENT)
+            insertados = conn.execute(
+                "SELECT COUNT(*) FROM productos WHERE id > ?", (ultimo_id,)
+            ).fetchone()[0]
+            actualizados = max(0, cambiados) - insertados
+            conn.execute(
+                "UPDATE importaciones SET posicion = ?, filas = filas + ?, "
+                "insertados = insertados + ?, actualizados = actualizados + ?, "
+                "errores = errores + ? WHERE id = ?",
+                (posicion, leidas, insertados, actualizados, errores, importacion_id)
+            )
+        return insertados, actualizados
+    
+    def terminar_importacion(self, importacion_id, estado, error=None):
+        """Marca la importación como completada o fallida (ya no se retoma)"""
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "UPDATE importaciones SET estado = ?, error = ?, fecha_fin = ? WHERE id = ?",
+                (estado, error, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), importacion_id)
+            )
+    
+    def get_importacion_pendiente(self):
+        """Ruta y filas leídas de la última importación sin terminar, o None"""
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT ruta, filas FROM importaciones WHERE estado = 'en_curso' "
+                "ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+    
+    def search_productos(self, texto="", categoria=None, precio_min=None, precio_max=None,
+                         limite=200, despues_de=None):
+        """Busca productos por texto (nombre, categoría y descripción) con facetas.
+        
+        El texto se compara por prefijo de palabra e ignora acentos. Los
+        resultados siguen el orden del catálogo (id), así la consulta se
+        detiene al llegar al límite en vez de puntuar todas las coincidencias.
+        
+        despues_de es el cursor (id del último producto) devuelto por la
+        página anterior. Devuelve (productos, cursor_siguiente);
+        cursor_siguiente es None en la última página.
+        """
+        desde, condiciones, params = self._filtros_busqueda(texto, precio_min, precio_max)
+        orden = "p.id"
+        if desde != "productos p":
+            orden = "productos_fts.rowid"
+        
+        if categoria:
+            condiciones.append("p.categoria = ?")
+            params.append(categoria)
+        
+        # Paginación por cursor sobre el mismo orden: la página siguiente
+        # entra por la clave en vez de saltar filas con OFFSET
+        if despues_de is not None:
+            condiciones.append(f"{orden} > ?")
+            params.append(despues_de)
+        
+        where = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+        # Se pide una fila de más para saber si existe otra página
+        params.append(limite + 1)
+        
+        with self.pool.connection() as conn:
+            productos = conn.execute(
+                f"SELECT {', '.join('p.' + c for c in self.PRODUCT_COLUMNS)} "
+                f"FROM {desde}{where} ORDER BY {orden} LIMIT ?", params
+            ).fetchall()
+        
+        if len(productos) > limite:
+            productos = productos[:limite]
+            return productos, productos[-1][0]
+        return productos, None
+    
+    def get_facetas_categoria(self, texto="", precio_min=None, precio_max=None):
+        """Cuenta los productos de cada categoría que cumplen la búsqueda"""
+        desde, condiciones, params = self._filtros_busqueda(texto, precio_min, precio_max)
+        where = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+        
+        with self.pool.connection() as conn:
+            return conn.execute(
+                f"SELECT p.categoria, COUNT(*) FROM {desde}{where} "
+                "GROUP BY p.categoria ORDER BY p.categoria",
+                params
+            ).fetchall()
+    
+    def _filtros_busqueda(self, texto, precio_min, precio_max):
+        """Arma el FROM y las condiciones comunes de búsqueda y facetas"""
+        desde = "productos p"
+        condiciones = []
+        params = []
+        palabras = re.findall(r"\w+", texto or "")
+        
+        if palabras and self.fts_disponible:
+            # Cada palabra como prefijo entre comillas: sin operadores FTS
+            desde = "productos_fts JOIN productos p ON p.id = productos_fts.rowid"
+            condiciones.append("productos_fts MATCH ?")
+            params.append(" ".join(f'"{palabra}"*' for palabra in palabras))
+        else:
+            for palabra in palabras:
+                condiciones.append("(p.nombre LIKE ? OR p.categoria LIKE ? OR p.descripcion LIKE ?)")
+                params.extend([f"%{palabra}%"] * 3)
+        
+        if precio_min is not None:
+            condiciones.append("p.precio >= ?")
+            params.append(precio_min)
+        if precio_max is not None:
+            condiciones.append("p.precio <= ?")
+            params.append(precio_max)
+        
+        return desde, condiciones, params
     
     def get_usuario(self, username="Usuario"):
         """Obtiene un usuario por nombre"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM usuarios WHERE username = ?", (username,))
-        usuario = cursor.fetchone()
-        conn.close()
-        return usuario
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT * FROM usuarios WHERE username = ?", (username,)
+            ).fetchone()
+    
+    def get_usuario_id(self, username="Usuario"):
+        """Obtiene el id de un usuario por nombre (None si no existe)"""
+        usuario = self.get_usuario(username)
+        return usuario[0] if usuario else None
     
     def update_usuario(self, old_username, new_username):
         """Actualiza el nombre de usuario"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE usuarios SET username = ? WHERE username = ?", 
-                      (new_username, old_username))
-        conn.commit()
-        conn.close()
+        with self.pool.transaction() as conn:
+            cursor = conn.execute("UPDATE usuarios SET username = ? WHERE username = ?", 
+                                  (new_username, old_username))
         return cursor.rowcount > 0
     
     def guardar_propuesta(self, user_id, estilo, contenido):
         """Guarda una propuesta de diseño"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO proyectos (user_id, nombre, tipo, datos, fecha) VALUES (?, ?, ?, ?, ?)",
-            (user_id, f"Propuesta {estilo}", "propuesta", contenido, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        )
-        conn.commit()
-        conn.close()
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO proyectos (user_id, nombre, tipo, datos, fecha) VALUES (?, ?, ?, ?, ?)",
+                (user_id, f"Propuesta {estilo}", "propuesta", contenido, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
     
     def guardar_proyecto_ar(self, user_id, nombre, datos):
-        """Guarda un proyecto AR"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO proyectos (user_id, nombre, tipo, datos, fecha) VALUES (?, ?, ?, ?, ?)",
-            (user_id, nombre, "ar", datos, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        """Guarda un proyecto AR (datos: escena codificada con SceneCodec)"""
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO proyectos (user_id, nombre, tipo, datos, fecha) VALUES (?, ?, ?, ?, ?)",
+                (user_id, nombre, "ar", datos, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+    
+    def agregar_cambios_escena(self, user_id, datos):
+        """Agrega un lote de operaciones al registro de autoguardado"""
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO escena_cambios (user_id, datos) VALUES (?, ?)", (user_id, datos)
+            )
+    
+    def guardar_instantanea_escena(self, user_id, snapshot):
+        """Reemplaza la instantánea de autoguardado y vacía su registro de cambios"""
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO escena_autoguardado (user_id, snapshot, fecha) VALUES (?, ?, ?)",
+                (user_id, snapshot, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            conn.execute("DELETE FROM escena_cambios WHERE user_id = ?", (user_id,))
+    
+    def get_autoguardado_escena(self, user_id):
+        """(instantánea o None, lotes de operaciones posteriores en orden)"""
+        with self.pool.transaction("DEFERRED") as conn:
+            fila = conn.execute(
+                "SELECT snapshot FROM escena_autoguardado WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            lotes = [
+                datos for (datos,) in conn.execute(
+                    "SELECT datos FROM escena_cambios WHERE user_id = ? ORDER BY seq", (user_id,)
+                )
+            ]
+        return (fila[0] if fila else None), lotes
+    
+    def get_proyectos_pagina(self, user_id, tipo=None, limite=10, despues_de=None):
+        """Obtiene una página de proyectos de un usuario, del más reciente al más antiguo.
+        
+        despues_de es el cursor (fecha, id) devuelto por la página anterior.
+        Devuelve (proyectos, cursor_siguiente); cursor_siguiente es None en
+        la última página.
+        """
+        return self._pagina_proyectos(
+            "id, user_id, nombre, tipo, datos, fecha", None,
+            user_id, tipo, limite, despues_de
+        )
+    
+    def listar_proyectos(self, user_id, tipo=None, limite=10, despues_de=None):
+        """Como get_proyectos_pagina pero sin leer la columna datos.
+        
+        Devuelve filas ProyectoResumen; el contenido se obtiene con
+        get_datos_proyecto solo cuando se abre el proyecto.
+        """
+        return self._pagina_proyectos(
+            "id, nombre, tipo, fecha", lambda cursor, fila: ProyectoResumen(*fila),
+            user_id, tipo, limite, despues_de
         )
-        conn.commit()
-        conn.close()
     
-    def get_proyectos_usuario(self, user_id, tipo=None):
-        """Obtiene los proyectos de un usuario"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_datos_proyecto(self, proyecto_id):
+        """Obtiene el contenido (columna datos) de un proyecto"""
+        with self.pool.connection() as conn:
+            fila = conn.execute(
+                "SELECT datos FROM proyectos WHERE id = ?", (proyecto_id,)
+            ).fetchone()
+        return fila[0] if fila else None
+    
+    def _pagina_proyectos(self, columnas, row_factory, user_id, tipo, limite, despues_de):
+        """Consulta paginada común; id y fecha deben ser la primera y última columna"""
+        sql, params = self._consulta_pagina(columnas, user_id, tipo, limite, despues_de)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory
+            proyectos = cursor.execute(sql, params).fetchall()
+        
+        if len(proyectos) > limite:
+            proyectos = proyectos[:limite]
+            ultimo = proyectos[-1]
+            return proyectos, (ultimo[-1], ultimo[0])
+        return proyectos, None
+    
+    @staticmethod
+    def _consulta_pagina(columnas, user_id, tipo, limite, despues_de):
+        """SQL y parámetros de una página de proyectos (limite + 1 filas)"""
+        condiciones = ["user_id = ?"]
+        params = [user_id]
+        
         if tipo:
-            cursor.execute(
-                "SELECT * FROM proyectos WHERE user_id = ? AND tipo = ? ORDER BY fecha DESC",
-                (user_id, tipo)
+            condiciones.append("tipo = ?")
+            params.append(tipo)
+        
+        # Paginación por cursor: continúa justo después de la última fila
+        # vista en lugar de saltar filas con OFFSET
+        if despues_de:
+            fecha, proyecto_id = despues_de
+            # Comparación de fila: SQLite la usa para entrar en el índice
+            # (user_id[, tipo], fecha) justo en el cursor; la forma con OR
+            # recorre el índice desde el principio como OFFSET
+            condiciones.append("(fecha, id) < (?, ?)")
+            params.extend((fecha, proyecto_id))
+        
+        # Se pide una fila de más para saber si existe otra página
+        params.append(limite + 1)
+        
+        sql = (f"SELECT {columnas} FROM proyectos WHERE " + " AND ".join(condiciones) +
+               " ORDER BY fecha DESC, id DESC LIMIT ?")
+        return sql, params
+    
+    def eliminar_proyectos_usuario(self, user_id, tipo=None, desde=None, hasta=None):
+        """Elimina en una sola transacción los proyectos de un usuario.
+        
+        Filtros opcionales: tipo y rango de fechas desde <= fecha < hasta
+        (cadenas "YYYY-MM-DD[ HH:MM:SS]"). Devuelve el número de proyectos
+        eliminados.
+        """
+        condiciones = ["user_id = ?"]
+        params = [user_id]
+        
+        if tipo:
+            condiciones.append("tipo = ?")
+            params.append(tipo)
+        if desde:
+            condiciones.append("fecha >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append("fecha < ?")
+            params.append(hasta)
+        
+        with self.pool.transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM proyectos WHERE " + " AND ".join(condiciones), params
             )
-        else:
-            cursor.execute(
-                "SELECT * FROM proyectos WHERE user_id = ? ORDER BY fecha DESC",
-                (user_id,)
+        eliminados = cursor.rowcount
+        
+        if eliminados:
+            self.incremental_vacuum()
+        return eliminados
+    
+    def incremental_vacuum(self):
+        """Devuelve al sistema las páginas libres de la base de datos"""
+        with self.pool.connection() as conn:
+            # executescript ejecuta el PRAGMA hasta el final; con execute
+            # sqlite3 solo liberaría una página por llamada
+            conn.executescript("PRAGMA incremental_vacuum")
+    
+    def close(self):
+        """Cierra las conexiones persistentes de la base de datos"""
+        self.pool.close()
+
+# Ejecutor de consultas en segundo plano
+class DBWorker:
+    """Ejecuta las llamadas a la base de datos fuera del hilo principal de Kivy.
+    
+    Un único hilo mantiene el orden de las operaciones (guardar y luego
+    listar ve lo guardado). Los callbacks se invocan en el hilo principal
+    mediante Clock.schedule_once, así pueden tocar widgets.
+    """
+    
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dercor8-db")
+    
+    def submit(self, funcion, *args, on_result=None, on_error=None, **kwargs):
+        """Encola funcion(*args, **kwargs) y devuelve su Future"""
+        future = self.executor.submit(funcion, *args, **kwargs)
+        if on_result or on_error:
+            future.add_done_callback(
+                lambda f: Clock.schedule_once(lambda dt: self._deliver(f, on_result, on_error))
             )
-        proyectos = cursor.fetchall()
-        conn.close()
-        return proyectos
-    
-    def eliminar_proyecto(self, proyecto_id):
-        """Elimina un proyecto"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM proyectos WHERE id = ?", (proyecto_id,))
-        conn.commit()
-        conn.close()
-        return cursor.rowcount > 0
+        return future
+    
+    def _deliver(self, future, on_result, on_error):
+        if future.cancelled():
+            return
+        
+        error = future.exception()
+        if error is None:
+            if on_result:
+                on_result(future.result())
+        elif on_error:
+            on_error(error)
+        else:
+            Logger.error(f"DercoR8: error en la base de datos: {error!r}")
+    
+    def shutdown(self):
+        """Descarta las tareas pendientes y espera a la que esté en curso"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+# Importación de catálogos de proveedor
+class CatalogImport:
+    """Importa un catálogo CSV o JSON Lines a productos en un hilo propio.
+    
+    El archivo se lee en streaming, CHUNK filas cada vez (la memoria no
+    depende del tamaño del archivo), y cada bloque se inserta o actualiza
+    por SKU con Database.importar_productos, que guarda en la misma
+    transacción el byte del archivo donde termina el bloque. Importar de
+    nuevo un archivo a medias (mismo tamaño y fecha) continúa desde ahí.
+    
+    on_progress(importacion) y on_complete(importacion) llegan en el hilo
+    principal. cancel() se detiene al terminar el bloque en curso y deja
+    la importación pendiente para retomarla.
+    """
+    
+    # Filas por transacción: el coste lo ponen los triggers (FTS y registro
+    # de cambios) de cada fila, bloques más grandes apenas ganan
+    CHUNK = 1000
+    FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+    # Nombres de columna aceptados (sin distinguir mayúsculas)
+    ALIASES = {
+        "sku": "sku", "codigo": "sku", "código": "sku",
+        "nombre": "nombre", "name": "nombre",
+        "categoria": "categoria", "categoría": "categoria", "category": "categoria",
+        "precio": "precio", "price": "precio",
+        "imagen": "imagen", "image": "imagen",
+        "descripcion": "descripcion", "descripción": "descripcion", "description": "descripcion",
+        "stock": "stock",
+    }
+    # Filas descartadas que se detallan en el log
+    LOGGED_ERRORS = 10
+    
+    def __init__(self, db, ruta, on_progress=None, on_complete=None):
+        self.db = db
+        self.ruta = ruta
+        self.formato = self.FORMATS.get(os.path.splitext(ruta)[1].lower())
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.importacion_id = None
+        self.total_bytes = 0
+        self.posicion = 0
+        self.filas = self.insertados = self.actualizados = self.errores = 0
+        # pendiente -> en_curso -> completada | cancelada | fallida
+        self.estado = "pendiente"
+        self.error = None
+        self._cancelada = threading.Event()
+        self._hilo = None
+    
+    @property
+    def progress(self):
+        """Fracción del archivo ya importada"""
+        return self.posicion / self.total_bytes if self.total_bytes else 0.0
+    
+    @property
+    def running(self):
+        return self._hilo is not None and self._hilo.is_alive()
+    
+    def start(self):
+        self._hilo = threading.Thread(target=self.run, name="dercor8-import", daemon=True)
+        self._hilo.start()
+    
+    def cancel(self):
+        self._cancelada.set()
+    
+    def join(self, timeout=None):
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+    
+    def run(self):
+        """Importa el archivo completo (start() lo llama en el hilo de importación)"""
+        try:
+            if self.formato is None:
+                raise ValueError(f"Formato no soportado: {os.path.basename(self.ruta)}")
+            info = os.stat(self.ruta)
+            self.total_bytes = info.st_size
+            importacion = self.db.iniciar_importacion(self.ruta, self.formato,
+                                                      info.st_size, info.st_mtime)
+            (self.importacion_id, self.posicion, self.filas, self.insertados,
+             self.actualizados, self.errores) = importacion
+            self.estado = "en_curso"
+            
+            for productos, posicion, leidas, errores in self.bloques(self.posicion):
+                insertados, actualizados = self.db.importar_productos(
+                    self.importacion_id, productos, posicion, leidas, errores)
+                self.posicion = posicion
+                self.filas += leidas
+                self.insertados += insertados
+                self.actualizados += actualizados
+                self.errores += errores
+                self._notificar(self.on_progress)
+                if self._cancelada.is_set():
+                    self.estado = "cancelada"
+                    break
+            else:
+                self.posicion = self.total_bytes
+                self.db.terminar_importacion(self.importacion_id, "completada")
+                self.estado = "completada"
+        except (OSError, ValueError, sqlite3.Error) as error:
+            Logger.error(f"DercoR8: falló la importación de {self.ruta}: {error!r}")
+            self.estado = "fallida"
+            self.error = error
+            if self.importacion_id is not None:
+                try:
+                    self.db.terminar_importacion(self.importacion_id, "fallida", repr(error))
+                except sqlite3.Error:
+                    pass
+        self._notificar(self.on_complete)
+    
+    def bloques(self, posicion):
+        """Genera (productos, posición final, filas leídas, filas descartadas) por bloque"""
+        with open(self.ruta, "rb") as archivo:
+            if self.formato == "csv":
+                registros = self._registros_csv(archivo, posicion)
+            else:
+                registros = self._registros_jsonl(archivo, posicion)
+            
+            productos = []
+            leidas = errores = 0
+            for registro, fin in registros:
+                leidas += 1
+                try:
+                    productos.append(self.normalizar(registro))
+                except (TypeError, ValueError, OverflowError) as error:
+                    errores += 1
+                    if self.errores + errores <= self.LOGGED_ERRORS:
+                        Logger.warning(f"DercoR8: fila {self.filas + leidas} descartada: {error}")
+                if leidas == self.CHUNK:
+                    yield productos, fin, leidas, errores
+                    productos = []
+                    leidas = errores = 0
+            if leidas:
+                yield productos, fin, leidas, errores
+    
+    def _registros_csv(self, archivo, posicion):
+        """(fila, byte donde termina) de cada registro del CSV a partir de posicion"""
+        cabecera = archivo.readline().decode("utf-8-sig", errors="replace")
+        # Separador: el más frecuente en la cabecera (las hojas de cálculo
+        # en español suelen exportar con punto y coma)
+        separador = max(",;\t|", key=cabecera.count)
+        columnas = next(csv.reader([cabecera], delimiter=separador), [])
+        if not {"sku", "nombre"} <= {self.ALIASES.get(c.strip().lower()) for c in columnas}:
+            raise ValueError("El CSV necesita las columnas sku y nombre")
+        leido = max(posicion, archivo.tell())
+        archivo.seek(leido)
+        
+        # csv.reader pide solo las líneas que necesita cada registro (también
+        # las de campos con saltos de línea), así el byte tras cada registro
+        # es exacto y sirve de punto de control
+        def lineas():
+            nonlocal leido
+            for linea in iter(archivo.readline, b""):
+                leido += len(linea)
+                yield linea.decode("utf-8", errors="replace")
+        
+        for fila in csv.reader(lineas(), delimiter=separador):
+            if fila:
+                yield dict(zip(columnas, fila)), leido
+    
+    @staticmethod
+    def _registros_jsonl(archivo, posicion):
+        """(objeto, byte donde termina) de cada línea JSON a partir de posicion"""
+        archivo.seek(posicion)
+        leido = posicion
+        for linea in iter(archivo.readline, b""):
+            leido += len(linea)
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield json.loads(linea.decode("utf-8-sig", errors="replace")), leido
+            except ValueError:
+                # normalizar() la cuenta como fila descartada
+                yield None, leido
+    
+    def normalizar(self, registro):
+        """Registro del archivo -> (sku, nombre, categoria, precio, imagen, descripcion, stock).
+        
+        Las columnas opcionales que faltan o vienen vacías quedan en None:
+        al actualizar un SKU se conserva lo guardado (importar_productos).
+        """
+        if not isinstance(registro, dict):
+            raise ValueError("no es un objeto con columnas")
+        valores = {self.ALIASES.get(str(clave).strip().lower()): valor
+                   for clave, valor in registro.items()}
+        
+        sku = str(valores.get("sku") or "").strip()
+        nombre = str(valores.get("nombre") or "").strip()
+        if not sku or not nombre:
+            raise ValueError("faltan sku o nombre")
+        
+        precio = self.numero(valores.get("precio"))
+        if precio is None or not math.isfinite(precio) or precio < 0:
+            raise ValueError(f"precio no válido: {valores.get('precio')!r}")
+        stock = self.numero(valores.get("stock"))
+        
+        return (
+            sku,
+            nombre,
+            str(valores.get("categoria") or "").strip() or None,
+            precio,
+            str(valores.get("imagen") or "").strip() or None,
+            str(valores.get("descripcion") or "").strip() or None,
+            None if stock is None else int(stock)
+        )
+    
+    @staticmethod
+    def numero(valor):
+        """Número de un campo del archivo ("$4,500.00", "4500,5", 12...) o None si está vacío"""
+        if valor is None or isinstance(valor, (int, float)):
+            return valor
+        texto = str(valor).strip().replace("$", "").replace(" ", "")
+        if not texto:
+            return None
+        if texto.rfind(",") > texto.rfind("."):
+            entero, _, decimales = texto.rpartition(",")
+            # Coma decimal ("4500,50", "1.234,50"); una coma seguida de tres
+            # cifras sin punto delante es de miles ("4,500")
+            if "." in entero or len(decimales) != 3:
+                texto = f"{entero.replace('.', '')}.{decimales}"
+        return float(texto.replace(",", ""))
+    
+    def _notificar(self, callback):
+        if callback:
+            Clock.schedule_once(lambda dt: callback(self))
+
+# Perfilado de las rutas calientes
+def profiled(label):
+    """Marca un método para que Profiler lo mida mientras esté activo.
+    
+    Solo etiqueta la función: con el perfilado apagado se ejecuta el
+    método original, sin envoltorio.
+    """
+    def marcar(funcion):
+        funcion.profile_label = label
+        return funcion
+    return marcar
+
+class Profiler:
+    """Tiempos de ejecución en búferes circulares, uno por etiqueta.
+    
+    register() anota las clases a medir: con prefix, todos sus métodos
+    públicos (p. ej. "db.get_productos"); sin él, los marcados con
+    @profiled. enable() sustituye esos métodos en la clase por versiones
+    medidas y disable() devuelve los originales, así que apagado no cuesta
+    nada. record() anota tiempos medidos a mano (cargas repartidas en
+    varios frames). Las muestras pueden llegar desde cualquier hilo.
+    
+    Los listeners reciben (etiqueta, ms) de cada muestra, en el hilo que
+    la midió (FrameMonitor los usa para atribuir los frames largos).
+    """
+    
+    # Muestras guardadas por etiqueta (las más antiguas se descartan)
+    CAPACITY = 512
+    
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.enabled = False
+        self.samples = {}
+        self.listeners = []
+        self._clases = []
+        self._originales = []
+    
+    def register(self, cls, prefix=None):
+        self._clases.append((cls, prefix))
+        if self.enabled:
+            self._instrumentar(cls, prefix)
+    
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        for cls, prefix in self._clases:
+            self._instrumentar(cls, prefix)
+    
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for cls, nombre, original in reversed(self._originales):
+            setattr(cls, nombre, original)
+        self._originales = []
+    
+    def record(self, label, ms):
+        if self.enabled:
+            self._muestras(label).append(ms)
+            for listener in self.listeners:
+                listener(label, ms)
+    
+    def clear(self):
+        self.samples = {}
+        # Los envoltorios guardan su búfer: se vuelven a crear
+        if self.enabled:
+            self.disable()
+            self.enable()
+    
+    def summary(self):
+        """{etiqueta: {n, media, p50, p95, p99, máx}} en milisegundos"""
+        resumen = {}
+        for label, muestras in sorted(self.samples.items()):
+            valores = sorted(muestras)
+            if not valores:
+                continue
+            resumen[label] = {
+                "n": len(valores),
+                "mean": sum(valores) / len(valores),
+                "p50": self.percentile(valores, 50),
+                "p95": self.percentile(valores, 95),
+                "p99": self.percentile(valores, 99),
+                "max": valores[-1]
+            }
+        return resumen
+    
+    @staticmethod
+    def percentile(ordenados, p):
+        """Percentil por rango más cercano de una lista ya ordenada"""
+        return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+    
+    def export(self, path, extra=None):
+        """Escribe resumen y muestras en JSON; extra se agrega tal cual"""
+        datos = {
+            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "capacidad": self.capacity,
+            "resumen": self.summary(),
+            "muestras": {label: list(muestras) for label, muestras in self.samples.items()}
+        }
+        if extra:
+            datos.update(extra)
+        with open(path, "w") as f:
+            json.dump(datos, f, indent=1)
+        return path
+    
+    def _muestras(self, label):
+        muestras = self.samples.get(label)
+        if muestras is None:
+            muestras = self.samples[label] = deque(maxlen=self.capacity)
+        return muestras
+    
+    def _instrumentar(self, cls, prefix):
+        for nombre, funcion in list(vars(cls).items()):
+            if (not callable(funcion) or isinstance(funcion, type)
+                    or isinstance(funcion, (staticmethod, classmethod))):
+                continue
+            if prefix:
+                if nombre.startswith("_"):
+                    continue
+                label = f"{prefix}.{nombre}"
+            else:
+                label = getattr(funcion, "profile_label", None)
+                if label is None:
+                    continue
+            self._originales.append((cls, nombre, funcion))
+            setattr(cls, nombre, self._medir(label, funcion))
+    
+    def _medir(self, label, funcion):
+        muestras = self._muestras(label)
+        listeners = self.listeners
+        reloj = time.perf_counter
+        
+        @wraps(funcion)
+        def medida(*args, **kwargs):
+            inicio = reloj()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                ms = (reloj() - inicio) * 1000
+                muestras.append(ms)
+                for listener in listeners:
+                    listener(label, ms)
+        return medida
+
+# Monitor de frames
+class FrameMonitor:
+    """Duración de cada frame medida con el Clock, con atribución de los frames largos.
+    
+    Un callback en cada tick del Clock anota el tiempo desde el tick
+    anterior. Los frames que pasan de budget_ms * SLACK quedan en
+    long_frames con sus causas: los métodos que el Profiler midió en el
+    hilo principal durante ese frame (los más costosos primero) y la
+    transición de pantalla en curso. Por eso enable() enciende también el
+    Profiler si estaba apagado. Desactivado no queda nada en el Clock.
+    """
+    
+    # Frames guardados (unos 10 s a 60 fps) y frames largos guardados
+    CAPACITY = 600
+    LONG_CAPACITY = 50
+    # Margen sobre el presupuesto para el jitter del Clock: a partir de
+    # 1.5 frames se perdió al menos un vsync
+    SLACK = 1.5
+    # Causas guardadas por frame largo
+    MAX_CAUSES = 3
+    
+    def __init__(self, profiler, budget_ms=None, capacity=CAPACITY):
+        self.profiler = profiler
+        if budget_ms is None:
+            budget_ms = 1000 / (Config.getint("graphics", "maxfps") or 60)
+        self.budget_ms = budget_ms
+        self.enabled = False
+        self.frames = deque(maxlen=capacity)
+        self.long_frames = deque(maxlen=self.LONG_CAPACITY)
+        # causa principal -> [frames largos, ms totales, ms máximo]
+        self.causes = {}
+        self._trabajo = []
+        self._manager = None
+        self._pantalla = None
+        self._transicion = None
+        self._evento = None
+        self._descartar = True
+        # El Profiler lo encendió enable(): disable() lo vuelve a apagar
+        self._perfil_propio = False
+        self._hilo = threading.get_ident()
+    
+    @property
+    def threshold_ms(self):
+        return self.budget_ms * self.SLACK
+    
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._descartar = True
+        self.profiler.listeners.append(self.note)
+        if not self.profiler.enabled:
+            self.profiler.enable()
+            self._perfil_propio = True
+        self._evento = Clock.schedule_interval(self._tick, 0)
+    
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._evento.cancel()
+        self._evento = None
+        self.profiler.listeners.remove(self.note)
+        if self._perfil_propio:
+            self._perfil_propio = False
+            self.profiler.disable()
+        self._trabajo = []
+        self._transicion = None
+    
+    def release_profiler(self):
+        """El usuario encendió o apagó el Profiler a mano: disable() ya no lo toca"""
+        self._perfil_propio = False
+    
+    def watch(self, manager):
+        """Atribuye a la transición los frames mientras manager cambia de pantalla"""
+        self._manager = manager
+        self._pantalla = manager.current
+        manager.bind(current=self._on_current)
+    
+    def note(self, label, ms):
+        """Listener del Profiler: trabajo hecho en el frame en curso"""
+        if threading.get_ident() == self._hilo:
+            self._trabajo.append((label, ms))
+    
+    def skip_frame(self):
+        """El próximo tick no cuenta (p. ej. al volver de segundo plano)"""
+        self._descartar = True
+    
+    def clear(self):
+        self.frames.clear()
+        self.long_frames.clear()
+        self.causes = {}
+    
+    def summary(self):
+        """{frames, budget_ms, fps, mean, p50, p95, p99, max, long, long_pct, causes}"""
+        valores = sorted(self.frames)
+        resumen = {"frames": len(valores), "budget_ms": self.budget_ms}
+        if not valores:
+            return resumen
+        media = sum(valores) / len(valores)
+        largos = sum(1 for ms in valores if ms > self.threshold_ms)
+        resumen.update({
+            "fps": 1000 / media if media else 0.0,
+            "mean": media,
+            "p50": Profiler.percentile(valores, 50),
+            "p95": Profiler.percentile(valores, 95),
+            "p99": Profiler.percentile(valores, 99),
+            "max": valores[-1],
+            "long": largos,
+            "long_pct": largos * 100 / len(valores),
+            "causes": {
+                label: {"n": n, "total_ms": total, "max_ms": maximo}
+                for label, (n, total, maximo) in sorted(
+                    self.causes.items(), key=lambda item: item[1][1], reverse=True)
+            }
+        })
+        return resumen
+    
+    def _on_current(self, manager, nombre):
+        if self.enabled:
+            self._transicion = f"transición {self._pantalla}→{nombre}"
+        self._pantalla = nombre
+    
+    def _tick(self, dt):
+        trabajo, self._trabajo = self._trabajo, []
+        transicion = self._transicion
+        if transicion and not self._manager.transition.is_active:
+            self._transicion = None
+        if self._descartar:
+            # El primer tick tras activar o volver de pausa mide la espera, no un frame
+            self._descartar = False
+            return
+        
+        ms = dt * 1000
+        self.frames.append(ms)
+        if ms <= self.threshold_ms:
+            return
+        causas = sorted(trabajo, key=lambda causa: causa[1], reverse=True)[:self.MAX_CAUSES]
+        if transicion:
+            causas.append((transicion, None))
+        if not causas:
+            causas.append(("sin atribuir", None))
+        self.long_frames.append({
+            "ms": ms,
+            "hora": datetime.now().strftime("%H:%M:%S"),
+            "causas": causas
+        })
+        principal = self.causes.setdefault(causas[0][0], [0, 0.0, 0.0])
+        principal[0] += 1
+        principal[1] += ms
+        principal[2] = max(principal[2], ms)
+
+# Caché de miniaturas
+class ThumbnailCache:
+    """Versiones reducidas de las imágenes, generadas al primer uso y guardadas en disco.
+    
+    Los tamaños se piden en píxeles de pantalla (Window ya está en píxeles
+    físicos, así las pantallas densas obtienen variantes mayores) y se
+    redondean a múltiplos de BUCKET para compartir variantes parecidas. La
+    clave incluye el mtime del original: si cambia, la miniatura se regenera.
+    """
+    
+    BUCKET = 64
+    DEFAULT_IMAGE = "assets/default.png"
+    
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._rutas = {}
+    
+    def get(self, source, width, height):
+        """Ruta de la miniatura de source para un área de width x height píxeles"""
+        ruta = self.lookup(source, width, height)
+        if ruta is not None:
+            return ruta
+        
+        source, mtime, clave, prefijo, destino = self._destino(source, width, height)
+        ruta = self._generate(source, destino, prefijo, clave[1], clave[2])
+        self._rutas[clave] = (mtime, ruta)
+        return ruta
+    
+    def lookup(self, source, width, height):
+        """Como get(), pero sin generar: None si la miniatura aún no existe"""
+        datos = self._destino(source, width, height)
+        if datos is None:
+            return ""
+        source, mtime, clave, prefijo, destino = datos
+        ruta = self._rutas.get(clave)
+        if ruta and ruta[0] == mtime:
+            return ruta[1]
+        if os.path.exists(destino):
+            self._rutas[clave] = (mtime, destino)
+            return destino
+        return None
+    
+    def _destino(self, source, width, height):
+        if not source or not os.path.exists(source):
+            source = self.DEFAULT_IMAGE
+        try:
+            mtime = os.stat(source).st_mtime_ns
+        except OSError:
+            return None
+        
+        clave = (source, self._bucket(width), self._bucket(height))
+        prefijo = os.path.join(
+            self.cache_dir,
+            hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:16] + f"_{clave[1]}x{clave[2]}"
+        )
+        return source, mtime, clave, prefijo, f"{prefijo}_{mtime}.png"
+    
+    def _bucket(self, valor):
+        return max(self.BUCKET, -(-int(valor) // self.BUCKET) * self.BUCKET)
+    
+    def _generate(self, source, destino, prefijo, ancho, alto):
+        """Decodifica el original una sola vez y lo reduce con un Fbo (hilo principal)"""
+        from kivy.core.image import Image as CoreImage
+        from kivy.graphics import Fbo, Rectangle, ClearColor, ClearBuffers
+        
+        try:
+            original = CoreImage(source, nocache=True)
+            escala = min(ancho / original.width, alto / original.height)
+            if escala >= 1:
+                # Ya es pequeña: no vale la pena otra copia
+                return source
+            
+            tamano = (max(1, int(original.width * escala)), max(1, int(original.height * escala)))
+            fbo = Fbo(size=tamano)
+            with fbo:
+                ClearColor(0, 0, 0, 0)
+                ClearBuffers()
+                Rectangle(texture=original.texture, size=tamano)
+            fbo.draw()
+            fbo.texture.save(destino)
+        except Exception as error:
+            Logger.warning(f"DercoR8: no se pudo generar la miniatura de {source}: {error!r}")
+            return source
+        
+        # Borrar variantes de versiones anteriores del original
+        for viejo in glob.glob(f"{glob.escape(prefijo)}_*.png"):
+            if viejo != destino:
+                os.remove(viejo)
+        return destino
+
+# Caché de texturas
+class TextureCache:
+    """Texturas decodificadas compartidas por todas las pantallas.
+    
+    Cada fuente se decodifica y sube a GPU una sola vez; los widgets la piden
+    con acquire() y la devuelven con release(). Cuando el total supera el
+    presupuesto se descartan las texturas sin referencias, de la usada hace
+    más tiempo a la más reciente. Las regiones de un atlas (atlas://) no
+    ocupan memoria propia: retienen la entrada del atlas completo.
+    """
+    
+    def __init__(self, budget_bytes=48 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        # fuente -> [textura, bytes, referencias, entrada padre]
+        self._entradas = OrderedDict()
+        self.bytes_usados = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def acquire(self, source):
+        """Textura de source con una referencia más (None si no se puede cargar)"""
+        if not source:
+            return None
+        entrada = self._entradas.get(source)
+        if entrada is not None:
+            self.hits += 1
+            self._entradas.move_to_end(source)
+        else:
+            self.misses += 1
+            entrada = self._cargar(source)
+            if entrada is None:
+                return None
+        entrada[2] += 1
+        self.trim()
+        return entrada[0]
+    
+    def release(self, source):
+        """Devuelve una referencia; la textura queda en caché hasta que haga falta sitio"""
+        entrada = self._entradas.get(source)
+        if entrada is not None and entrada[2] > 0:
+            entrada[2] -= 1
+            self.trim()
+    
+    def cached(self, source):
+        return source in self._entradas
+    
+    def put(self, source, texture):
+        """Registra una textura ya creada (p. ej. por AsyncImageLoader) sin referencias"""
+        if source in self._entradas:
+            self._entradas.move_to_end(source)
+            return
+        self._registrar(source, texture, self._tamano(texture))
+        self.trim()
+    
+    def trim(self):
+        """Descarta texturas sin referencias (LRU) hasta quedar dentro del presupuesto"""
+        while self.bytes_usados > self.budget_bytes:
+            libre = next((fuente for fuente, entrada in self._entradas.items()
+                          if entrada[2] == 0), None)
+            if libre is None:
+                # Todo lo que queda está en pantalla
+                return
+            self._descartar(libre)
+    
+    def clear(self):
+        """Descarta todas las texturas sin referencias"""
+        for fuente in list(self._entradas):
+            entrada = self._entradas.get(fuente)
+            if entrada is not None and entrada[2] == 0:
+                self._descartar(fuente)
+    
+    def stats(self):
+        return {
+            "entradas": len(self._entradas),
+            "bytes": self.bytes_usados,
+            "presupuesto": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+    
+    def _descartar(self, fuente):
+        textura, tamano, _, padre = self._entradas.pop(fuente)
+        self.bytes_usados -= tamano
+        self.evictions += 1
+        if padre is not None:
+            self.release(padre)
+    
+    def _registrar(self, fuente, textura, tamano, padre=None):
+        entrada = [textura, tamano, 0, padre]
+        self._entradas[fuente] = entrada
+        self.bytes_usados += tamano
+        return entrada
+    
+    @staticmethod
+    def _tamano(textura):
+        """Bytes aproximados de una textura en GPU"""
+        bytes_pixel = 3 if textura.colorfmt in ("rgb", "bgr") else 4
+        return textura.width * textura.height * bytes_pixel
+    
+    def _cargar(self, source):
+        if source.startswith("atlas://"):
+            return self._cargar_region(source)
+        from kivy.core.image import Image as CoreImage
+        try:
+            # nocache: esta clase sustituye a la caché interna de Kivy
+            textura = CoreImage(source, nocache=True).texture
+        except Exception as error:
+            Logger.warning(f"DercoR8: no se pudo cargar la imagen {source}: {error!r}")
+            return None
+        return self._registrar(source, textura, self._tamano(textura))
+    
+    def _cargar_region(self, source):
+        ruta, _, nombre = source[len("atlas://"):].rpartition("/")
+        clave_atlas = ruta + ".atlas"
+        entrada_atlas = self._entradas.get(clave_atlas)
+        if entrada_atlas is None:
+            entrada_atlas = self._cargar_atlas(clave_atlas)
+            if entrada_atlas is None:
+                return None
+        else:
+            self._entradas.move_to_end(clave_atlas)
+        
+        region = entrada_atlas[0].get(nombre)
+        if region is None:
+            return None
+        entrada_atlas[2] += 1
+        return self._registrar(source, region, 0, padre=clave_atlas)
+    
+    def _cargar_atlas(self, clave_atlas):
+        """Carga las páginas de un atlas (mismo formato que kivy.atlas.Atlas)"""
+        from kivy.core.image import Image as CoreImage
+        try:
+            with open(clave_atlas) as f:
+                paginas = json.load(f)
+            regiones = {}
+            tamano = 0
+            for pagina, sprites in paginas.items():
+                textura = CoreImage(os.path.join(os.path.dirname(clave_atlas), pagina),
+                                    nocache=True).texture
+                tamano += self._tamano(textura)
+                for nombre, coords in sprites.items():
+                    regiones[nombre] = textura.get_region(*coords)
+        except Exception as error:
+            Logger.warning(f"DercoR8: no se pudo cargar el atlas {clave_atlas}: {error!r}")
+            return None
+        return self._registrar(clave_atlas, regiones, tamano)
+
+# Carga de imágenes en segundo plano
+class ImageTicket:
+    """Interés de un widget (o de la precarga) en una imagen"""
+    __slots__ = ("clave", "callback", "prioridad")
+    
+    def __init__(self, clave, callback, prioridad):
+        self.clave = clave
+        self.callback = callback
+        self.prioridad = prioridad
+
+class _ImageRequest:
+    __slots__ = ("source", "width", "height", "ruta", "estado", "prioridad", "tickets")
+    
+    def __init__(self, source, width, height, ruta):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.ruta = ruta
+        # "miniatura" -> hilo principal, "decodificar" -> hilos, "cargando" -> en curso
+        self.estado = "miniatura" if ruta is None else "decodificar"
+        # Prioridad con la que está en su cola (None: no encolado)
+        self.prioridad = None
+        self.tickets = []
+
+class AsyncImageLoader:
+    """Carga de imágenes por prioridad (menor número = antes) con pocos hilos.
+    
+    Los hilos solo decodifican el archivo; la textura se crea en el hilo
+    principal y queda en la TextureCache. Las miniaturas que aún no existen
+    en disco también se generan en el hilo principal (usan un Fbo), una por
+    frame. Varios tickets sobre la misma imagen comparten una sola carga, y
+    al cancelar el último la petición se descarta.
+    """
+    
+    WORKERS = 2
+    
+    def __init__(self, textures, thumbnails, workers=WORKERS):
+        self.textures = textures
+        self.thumbnails = thumbnails
+        self._cond = threading.Condition()
+        self._pedidos = {}
+        # Colas (prioridad, orden, clave); las entradas obsoletas se saltan al sacarlas
+        self._cola = []
+        self._cola_miniaturas = []
+        self._orden = itertools.count()
+        # Archivos que no se pudieron decodificar: no se reintentan
+        self._fallidas = set()
+        self._activo = True
+        self._miniatura_trigger = Clock.create_trigger(self._generar_miniatura)
+        self._hilos = [
+            threading.Thread(target=self._trabajar, name=f"imagenes-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+    
+    def load(self, source, width, height, callback=None, priority=0):
+        """Pide la imagen; callback(ruta) llega en el hilo principal.
+        
+        Si la textura ya está en caché se llama a callback en el acto y se
+        devuelve None; si no, devuelve un ImageTicket para cancel()/set_priority().
+        """
+        clave = (source, width, height)
+        pedido = self._pedidos.get(clave)
+        if pedido is None:
+            ruta = self.thumbnails.lookup(source, width, height)
+            if ruta in self._fallidas:
+                ruta = ""
+            if ruta is not None and (not ruta or self.textures.cached(ruta)):
+                if callback:
+                    callback(ruta)
+                return None
+            pedido = _ImageRequest(source, width, height, ruta)
+        
+        ticket = ImageTicket(clave, callback, priority)
+        with self._cond:
+            self._pedidos[clave] = pedido
+            pedido.tickets.append(ticket)
+            self._encolar(pedido)
+        return ticket
+    
+    def cancel(self, ticket):
+        if ticket is None:
+            return
+        with self._cond:
+            pedido = self._pedidos.get(ticket.clave)
+            if pedido is None or ticket not in pedido.tickets:
+                return
+            pedido.tickets.remove(ticket)
+            if not pedido.tickets:
+                del self._pedidos[ticket.clave]
+            else:
+                self._encolar(pedido)
+    
+    def set_priority(self, ticket, priority):
+        if ticket is None or ticket.prioridad == priority:
+            return
+        with self._cond:
+            ticket.prioridad = priority
+            pedido = self._pedidos.get(ticket.clave)
+            if pedido is not None:
+                self._encolar(pedido)
+    
+    def shutdown(self):
+        with self._cond:
+            self._activo = False
+            self._pedidos.clear()
+            self._cond.notify_all()
+    
+    def _encolar(self, pedido):
+        """Recalcula la prioridad del pedido y lo vuelve a poner en su cola (con el lock)"""
+        prioridad = min(ticket.prioridad for ticket in pedido.tickets)
+        if prioridad == pedido.prioridad:
+            return
+        pedido.prioridad = prioridad
+        entrada = (prioridad, next(self._orden), (pedido.source, pedido.width, pedido.height))
+        if pedido.estado == "miniatura":
+            heapq.heappush(self._cola_miniaturas, entrada)
+            self._miniatura_trigger()
+        elif pedido.estado == "decodificar":
+            heapq.heappush(self._cola, entrada)
+            self._cond.notify()
+    
+    def _siguiente(self, cola, estado):
+        """Saca el pedido vigente de mayor prioridad de cola (con el lock)"""
+        while cola:
+            prioridad, _, clave = heapq.heappop(cola)
+            pedido = self._pedidos.get(clave)
+            if pedido is not None and pedido.estado == estado and pedido.prioridad == prioridad:
+                return clave, pedido
+        return None, None
+    
+    def _generar_miniatura(self, dt):
+        with self._cond:
+            clave, pedido = self._siguiente(self._cola_miniaturas, "miniatura")
+            if pedido is None:
+                return
+            pedido.estado = "cargando"
+        
+        ruta = self.thumbnails.get(pedido.source, pedido.width, pedido.height)
+        
+        with self._cond:
+            pedido.ruta = ruta
+            if self._pedidos.get(clave) is pedido:
+                if ruta and not self.textures.cached(ruta):
+                    pedido.estado = "decodificar"
+                    pedido.prioridad = None
+                    self._encolar(pedido)
+                    pedido = None
+                else:
+                    del self._pedidos[clave]
+            else:
+                pedido = None
+            if self._cola_miniaturas:
+                self._miniatura_trigger()
+        if pedido is not None:
+            self._entregar(pedido)
+    
+    def _trabajar(self):
+        from kivy.core.image import ImageLoader as CoreImageLoader
+        
+        while True:
+            with self._cond:
+                clave, pedido = self._siguiente(self._cola, "decodificar")
+                while pedido is None:
+                    if not self._activo:
+                        return
+                    self._cond.wait()
+                    clave, pedido = self._siguiente(self._cola, "decodificar")
+                pedido.estado = "cargando"
+            
+            try:
+                imagen = CoreImageLoader.load(pedido.ruta, keep_data=True, nocache=True)
+            except Exception as error:
+                Logger.warning(f"DercoR8: no se pudo cargar la imagen {pedido.ruta}: {error!r}")
+                imagen = None
+            Clock.schedule_once(partial(self._subir, clave, pedido, imagen))
+    
+    def _subir(self, clave, pedido, imagen, dt):
+        """Crea la textura en el hilo principal y avisa a los tickets que sigan vivos"""
+        with self._cond:
+            if self._pedidos.get(clave) is not pedido:
+                # Cancelado mientras se decodificaba
+                return
+            del self._pedidos[clave]
+        if imagen is None:
+            self._fallidas.add(pedido.ruta)
+            pedido.ruta = ""
+        else:
+            self.textures.put(pedido.ruta, imagen.texture)
+        self._entregar(pedido)
+    
+    def _entregar(self, pedido):
+        for ticket in pedido.tickets:
+            if ticket.callback:
+                ticket.callback(pedido.ruta)
+
+# Modelo de la escena AR
+class SceneModel:
+    """Estado de la escena AR en columnas, una fila por pieza.
+    
+    Índice de tipo (B) en una tabla de nombres, id (I), orden de apilado
+    (Q) y transformación: centro, rotación y escala (d). Son unos 45 bytes
+    por pieza frente a los cientos de un dict. Quitar una pieza mueve la
+    última fila a su hueco; el orden de dibujo lo da la columna z.
+    
+    Es la fuente única de la escena: ARScreen la actualiza con cada cambio
+    de las piezas y guardar, autoguardar y deshacer leen de aquí.
+    """
+    __slots__ = ("tipos", "_indice_tipo", "ids", "type_idx", "z", "xs", "ys",
+                 "rotations", "scales", "_filas", "_z")
+    
+    def __init__(self):
+        self.tipos = []
+        self._indice_tipo = {}
+        self._filas = {}
+        self._z = 0
+        self.clear()
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __contains__(self, piece_id):
+        return piece_id in self._filas
+    
+    def clear(self):
+        self.ids = array("I")
+        self.type_idx = array("B")
+        self.z = array("Q")
+        self.xs = array("d")
+        self.ys = array("d")
+        self.rotations = array("d")
+        self.scales = array("d")
+        self._filas = {}
+    
+    def add(self, piece_id, furniture_type, x, y, rotation=0, scale=1, index=None):
+        """Agrega la pieza encima de todas, o en la posición index del orden de dibujo"""
+        if piece_id in self._filas:
+            raise ValueError(f"La pieza {piece_id} ya está en la escena")
+        indice = self._indice_tipo.get(furniture_type)
+        if indice is None:
+            if len(self.tipos) > 255:
+                raise ValueError("Demasiados tipos de mueble en la escena")
+            indice = self._indice_tipo[furniture_type] = len(self.tipos)
+            self.tipos.append(furniture_type)
+        
+        self._filas[piece_id] = len(self.ids)
+        self.ids.append(piece_id)
+        self.type_idx.append(indice)
+        self.z.append(self._siguiente_z())
+        self.xs.append(x)
+        self.ys.append(y)
+        self.rotations.append(rotation)
+        self.scales.append(scale)
+        if index is not None and index < len(self.ids) - 1:
+            # Debajo de otras (deshacer un borrado): se renumera el apilado
+            orden = self._orden()
+            orden.insert(index, orden.pop())
+            for z, fila in enumerate(orden, 1):
+                self.z[fila] = z
+            self._z = len(orden)
+    
+    def index(self, piece_id):
+        """Posición de la pieza en el orden de dibujo (0 es la de más abajo), o None"""
+        fila = self._filas.get(piece_id)
+        if fila is None:
+            return None
+        z = self.z[fila]
+        return sum(1 for otra in self.z if otra < z)
+    
+    def remove(self, piece_id):
+        """Quita la pieza y devuelve su tupla (id, tipo, x, y, rot, escala), o None"""
+        fila = self._filas.pop(piece_id, None)
+        if fila is None:
+            return None
+        pieza = self._tupla(fila)
+        ultima = len(self.ids) - 1
+        for columna in self._columnas():
+            if fila != ultima:
+                columna[fila] = columna[ultima]
+            columna.pop()
+        if fila != ultima:
+            self._filas[self.ids[fila]] = fila
+        return pieza
+    
+    def move(self, piece_id, x, y, rotation, scale):
+        fila = self._filas.get(piece_id)
+        if fila is None:
+            return False
+        self.xs[fila] = x
+        self.ys[fila] = y
+        self.rotations[fila] = rotation
+        self.scales[fila] = scale
+        return True
+    
+    def bring_to_front(self, piece_id):
+        fila = self._filas.get(piece_id)
+        if fila is not None:
+            self.z[fila] = self._siguiente_z()
+    
+    def get(self, piece_id):
+        """(id, tipo, x, y, rotación, escala) de la pieza, o None"""
+        fila = self._filas.get(piece_id)
+        return None if fila is None else self._tupla(fila)
+    
+    def transform(self, piece_id):
+        """(x, y, rotación, escala) de la pieza, o None"""
+        fila = self._filas.get(piece_id)
+        if fila is None:
+            return None
+        return (self.xs[fila], self.ys[fila], self.rotations[fila], self.scales[fila])
+    
+    def pieces(self):
+        """Tuplas de todas las piezas en orden de dibujo"""
+        return [self._tupla(fila) for fila in self._orden()]
+    
+    def items(self):
+        """Piezas en orden de dibujo con el formato de SceneCodec.encode"""
+        return [
+            {
+                "id": self.ids[fila],
+                "type": self.tipos[self.type_idx[fila]],
+                "position": (self.xs[fila], self.ys[fila]),
+                "rotation": self.rotations[fila],
+                "scale": self.scales[fila]
+            }
+            for fila in self._orden()
+        ]
+    
+    def _orden(self):
+        return sorted(range(len(self.ids)), key=self.z.__getitem__)
+    
+    def _siguiente_z(self):
+        self._z += 1
+        return self._z
+    
+    def _tupla(self, fila):
+        return (self.ids[fila], self.tipos[self.type_idx[fila]], self.xs[fila], self.ys[fila],
+                self.rotations[fila], self.scales[fila])
+    
+    def _columnas(self):
+        return (self.ids, self.type_idx, self.z, self.xs, self.ys, self.rotations, self.scales)
+
+# Formato de las escenas AR
+class SceneCodec:
+    """Serialización compacta de escenas AR (columna proyectos.datos).
+    
+    Formato binario, little-endian:
+      cabecera  MAGIC, versión (B), nº de tipos (B), flags (H), nº de piezas (I)
+      tipos     por cada tipo: longitud (B) + nombre UTF-8
+      piezas    índice de tipo (B) de todas las piezas; si flags tiene FLAG_IDS,
+                una columna uint32 con el id de cada pieza; después cuatro
+                columnas float64: x, y, rotación, escala
+    
+    x, y es el centro de la pieza relativo a origin (la esquina del área AR),
+    así la escena no depende de la posición del área en la ventana. Las filas
+    antiguas en JSON (posición absoluta) se siguen leyendo con decode().
+    
+    Los lotes de operaciones del autoguardado (encode_ops) empiezan por
+    OPS_MAGIC y la versión, seguidos de cada operación con su código. Desde
+    la v2 el orden de apilado va explícito: "add" lleva la posición en el
+    orden de dibujo (int32, -1 es encima de todas), "front" sube una pieza y
+    "move" no cambia el orden. En los lotes v1 mover traía la pieza al frente.
+    """
+    
+    MAGIC = b"DR8E"
+    VERSION = 2
+    HEADER = struct.Struct("<4sBBHI")
+    # v2: columna opcional de ids de pieza
+    FLAG_IDS = 1
+    
+    OPS_MAGIC = b"DR8O"
+    OPS_VERSION = 2
+    OP_ADD, OP_MOVE, OP_REMOVE, OP_CLEAR, OP_FRONT = 1, 2, 3, 4, 5
+    OP_CODES = {"add": OP_ADD, "move": OP_MOVE, "remove": OP_REMOVE, "clear": OP_CLEAR,
+                "front": OP_FRONT}
+    OP_NAMES = {codigo: nombre for nombre, codigo in OP_CODES.items()}
+    TRANSFORM = struct.Struct("<4d")
+    
+    @classmethod
+    def encode(cls, items, origin=(0, 0)):
+        """items: dicts con type, position, rotation, scale y opcionalmente id (orden de dibujo)"""
+        tipos = []
+        indices_tipo = {}
+        indices = []
+        for item in items:
+            tipo = item["type"]
+            if tipo not in indices_tipo:
+                indices_tipo[tipo] = len(tipos)
+                tipos.append(tipo)
+            indices.append(indices_tipo[tipo])
+        if len(tipos) > 255:
+            raise ValueError("Demasiados tipos de mueble en la escena")
+        
+        n = len(items)
+        flags = cls.FLAG_IDS if items and all("id" in item for item in items) else 0
+        partes = [cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(tipos), flags, n)]
+        for tipo in tipos:
+            nombre = tipo.encode("utf-8")
+            partes.append(struct.pack("<B", len(nombre)) + nombre)
+        partes.append(struct.pack(f"<{n}B", *indices))
+        if flags & cls.FLAG_IDS:
+            partes.append(struct.pack(f"<{n}I", *[item["id"] for item in items]))
+        partes.append(struct.pack(
+            f"<{4 * n}d",
+            *[item["position"][0] - origin[0] for item in items],
+            *[item["position"][1] - origin[1] for item in items],
+            *[item["rotation"] for item in items],
+            *[item["scale"] for item in items]
+        ))
+        return b"".join(partes)
+    
+    @classmethod
+    def decode(cls, data, origin=(0, 0)):
+        """Piezas de una escena binaria o JSON antigua; ValueError si no es válida"""
+        if isinstance(data, str):
+            return cls._decode_json(data)
+        data = bytes(data)
+        if not data.startswith(cls.MAGIC):
+            return cls._decode_json(data.decode("utf-8"))
+        
+        try:
+            _, version, n_tipos, flags, n = cls.HEADER.unpack_from(data)
+            if version > cls.VERSION:
+                raise ValueError(f"Versión de escena no soportada: {version}")
+            
+            offset = cls.HEADER.size
+            tipos = []
+            for _ in range(n_tipos):
+                longitud = data[offset]
+                tipos.append(data[offset + 1:offset + 1 + longitud].decode("utf-8"))
+                offset += 1 + longitud
+            indices = struct.unpack_from(f"<{n}B", data, offset)
+            offset += n
+            ids = None
+            if flags & cls.FLAG_IDS:
+                ids = struct.unpack_from(f"<{n}I", data, offset)
+                offset += 4 * n
+            valores = struct.unpack_from(f"<{4 * n}d", data, offset)
+        except (struct.error, IndexError) as error:
+            raise ValueError(f"Escena corrupta: {error}") from error
+        
+        ox, oy = origin
+        items = [
+            {
+                "type": tipos[indices[i]],
+                "position": (valores[i] + ox, valores[n + i] + oy),
+                "rotation": valores[2 * n + i],
+                "scale": valores[3 * n + i]
+            }
+            for i in range(n)
+        ]
+        if ids is not None:
+            for item, piece_id in zip(items, ids):
+                item["id"] = piece_id
+        return items
+    
+    @staticmethod
+    def _decode_json(texto):
+        """Escenas guardadas antes del formato binario"""
+        return [
+            {
+                "type": item["type"],
+                "position": tuple(item["position"]),
+                "rotation": item.get("rotation", 0),
+                "scale": item.get("scale", 1)
+            }
+            for item in json.loads(texto)
+        ]
+    
+    @classmethod
+    def encode_ops(cls, ops, origin=(0, 0)):
+        """Lote de operaciones de autoguardado.
+        
+        ops: ("add", id, tipo, x, y, rotación, escala[, posición]), ("move",
+        id, x, y, rotación, escala), ("front", id), ("remove", id) o ("clear",).
+        Sin posición (o None) la pieza se agrega encima de todas.
+        """
+        ox, oy = origin
+        partes = [cls.OPS_MAGIC, struct.pack("<B", cls.OPS_VERSION)]
+        for op in ops:
+            codigo = cls.OP_CODES[op[0]]
+            partes.append(struct.pack("<B", codigo))
+            if codigo == cls.OP_CLEAR:
+                continue
+            partes.append(struct.pack("<I", op[1]))
+            if codigo == cls.OP_ADD:
+                nombre = op[2].encode("utf-8")
+                partes.append(struct.pack("<B", len(nombre)) + nombre)
+                partes.append(cls.TRANSFORM.pack(op[3] - ox, op[4] - oy, op[5], op[6]))
+                posicion = op[7] if len(op) > 7 else None
+                partes.append(struct.pack("<i", -1 if posicion is None else posicion))
+            elif codigo == cls.OP_MOVE:
+                partes.append(cls.TRANSFORM.pack(op[2] - ox, op[3] - oy, op[4], op[5]))
+        return b"".join(partes)
+    
+    @classmethod
+    def decode_ops(cls, data, origin=(0, 0)):
+        data = bytes(data)
+        if not data.startswith(cls.OPS_MAGIC):
+            raise ValueError("Lote de operaciones no válido")
+        version = data[len(cls.OPS_MAGIC)]
+        if version > cls.OPS_VERSION:
+            raise ValueError(f"Versión de operaciones no soportada: {version}")
+        
+        ox, oy = origin
+        ops = []
+        offset = len(cls.OPS_MAGIC) + 1
+        try:
+            while offset < len(data):
+                codigo = data[offset]
+                offset += 1
+                if codigo == cls.OP_CLEAR:
+                    ops.append(("clear",))
+                    continue
+                (piece_id,) = struct.unpack_from("<I", data, offset)
+                offset += 4
+                if codigo == cls.OP_ADD:
+                    longitud = data[offset]
+                    tipo = data[offset + 1:offset + 1 + longitud].decode("utf-8")
+                    offset += 1 + longitud
+                    x, y, rotacion, escala = cls.TRANSFORM.unpack_from(data, offset)
+                    offset += cls.TRANSFORM.size
+                    posicion = None
+                    if version >= 2:
+                        (posicion,) = struct.unpack_from("<i", data, offset)
+                        offset += 4
+                    ops.append(("add", piece_id, tipo, x + ox, y + oy, rotacion, escala,
+                                None if posicion < 0 else posicion))
+                elif codigo == cls.OP_MOVE:
+                    x, y, rotacion, escala = cls.TRANSFORM.unpack_from(data, offset)
+                    offset += cls.TRANSFORM.size
+                    ops.append(("move", piece_id, x + ox, y + oy, rotacion, escala))
+                    if version < 2:
+                        ops.append(("front", piece_id))
+                elif codigo == cls.OP_FRONT:
+                    ops.append(("front", piece_id))
+                elif codigo == cls.OP_REMOVE:
+                    ops.append(("remove", piece_id))
+                else:
+                    raise ValueError(f"Operación desconocida: {codigo}")
+        except (struct.error, IndexError) as error:
+            raise ValueError(f"Lote de operaciones corrupto: {error}") from error
+        return ops
+    
+    @staticmethod
+    def apply_ops(items, ops):
+        """Aplica ops sobre items (lista con ids, orden de dibujo) y devuelve la lista nueva"""
+        escena = {item["id"]: item for item in items}
+        for op in ops:
+            if op[0] == "add":
+                item = {"id": op[1], "type": op[2], "position": (op[3], op[4]),
+                        "rotation": op[5], "scale": op[6]}
+                escena.pop(op[1], None)
+                posicion = op[7] if len(op) > 7 else None
+                if posicion is None or posicion >= len(escena):
+                    escena[op[1]] = item
+                else:
+                    # Debajo de otras, como SceneModel.add con index
+                    orden = list(escena.items())
+                    orden.insert(posicion, (op[1], item))
+                    escena = dict(orden)
+            elif op[0] == "move":
+                item = escena.get(op[1])
+                if item is not None:
+                    item.update(position=(op[2], op[3]), rotation=op[4], scale=op[5])
+            elif op[0] == "front":
+                # Tocar una pieza la trae al frente (begin_gesture)
+                item = escena.pop(op[1], None)
+                if item is not None:
+                    escena[op[1]] = item
+            elif op[0] == "remove":
+                escena.pop(op[1], None)
+            else:
+                escena.clear()
+        return list(escena.values())
+
+class SceneAutosave:
+    """Autoguardado de la escena AR como registro de operaciones.
+    
+    Cada cambio (agregar, mover, quitar, limpiar) se anota en memoria y se
+    escribe en un lote DELAY segundos después del primero: el coste de cada
+    escritura depende de lo que cambió, no del tamaño de la escena, y un
+    cierre inesperado pierde como mucho ese intervalo. Los movimientos de una
+    pieza dentro de un lote se funden en uno y su transformación se lee al
+    escribir. Tras COMPACT_EVERY operaciones el registro se sustituye por una
+    instantánea de la escena completa.
+    
+    capture() devuelve las piezas con id, transform_of(id) su (x, y,
+    rotación, escala) o None y origin() la esquina del área AR.
+    """
+    
+    DELAY = 1.5
+    COMPACT_EVERY = 256
+    
+    def __init__(self, capture, transform_of, origin):
+        self.capture = capture
+        self.transform_of = transform_of
+        self.origin = origin
+        self.pendientes = []
+        # id de pieza -> posición de su movimiento en pendientes
+        self._movimientos = {}
+        # Operaciones escritas desde la última instantánea
+        self.registradas = 0
+        # (future, escritura) enviadas al hilo de la base de datos sin confirmar
+        self._enviadas = []
+        self._flush_trigger = Clock.create_trigger(self.flush, self.DELAY)
+    
+    def record(self, op):
+        """Anota ("add", id, tipo, x, y, rot, escala, posición), ("move", id), ("front", id),
+        ("remove", id) o ("clear",)"""
+        tipo = op[0]
+        if tipo == "clear":
+            # Limpiar deja sin efecto todo lo anterior del lote
+            self.pendientes = []
+            self._movimientos = {}
+        elif tipo in ("move", "remove"):
+            anterior = self._movimientos.pop(op[1], None)
+            if anterior is not None:
+                self.pendientes[anterior] = None
+            if tipo == "move":
+                self._movimientos[op[1]] = len(self.pendientes)
+        self.pendientes.append(op)
+        self._flush_trigger()
+    
+    def flush(self, *args):
+        """Envía las operaciones pendientes al hilo de la base de datos"""
+        self._flush_trigger.cancel()
+        if not self.pendientes and self.registradas < self.COMPACT_EVERY:
+            return
+        if self._esperar_usuario():
+            return
+        if self.registradas + len(self.pendientes) >= self.COMPACT_EVERY:
+            self.compact()
+            return
+        
+        ops = self._resolver()
+        if ops:
+            self.registradas += len(ops)
+            self._enviar(self._escritura(
+                Database.agregar_cambios_escena, SceneCodec.encode_ops(ops, self.origin())
+            ))
+    
+    def compact(self):
+        """Sustituye el registro por una instantánea de la escena actual"""
+        self._flush_trigger.cancel()
+        self.pendientes = []
+        self._movimientos = {}
+        if self._esperar_usuario():
+            # Se escribe en el siguiente flush, ya con el usuario leído
+            self.registradas = self.COMPACT_EVERY
+            return
+        self.registradas = 0
+        self._enviar(self._escritura(
+            Database.guardar_instantanea_escena, SceneCodec.encode(self.capture(), self.origin())
+        ))
+    
+    def flush_now(self, db):
+        """Escribe en este hilo lo pendiente; para el cierre, con el hilo de consultas ya parado"""
+        self._flush_trigger.cancel()
+        for future, escritura in self._enviadas:
+            if future.cancelled():
+                escritura(db)
+        self._enviadas = []
+        
+        ops = self._resolver()
+        if ops:
+            self._escritura(
+                Database.agregar_cambios_escena, SceneCodec.encode_ops(ops, self.origin())
+            )(db)
+    
+    def restore(self, on_result):
+        """Lee la instantánea y aplica el registro; on_result recibe las piezas o None.
+        
+        Se llama con app.user_loaded: antes, username aún no es el guardado.
+        """
+        app = App.get_running_app()
+        username = app.username
+        origin = tuple(self.origin())
+        
+        def leer(db):
+            user_id = db.get_usuario_id(username)
+            if not user_id:
+                return None
+            snapshot, lotes = db.get_autoguardado_escena(user_id)
+            if snapshot is None and not lotes:
+                return None
+            items = SceneCodec.decode(snapshot, origin) if snapshot is not None else []
+            for lote in lotes:
+                items = SceneCodec.apply_ops(items, SceneCodec.decode_ops(lote, origin))
+            return items
+        
+        app.db_worker.submit(leer, app.db, on_result=on_result, on_error=self.on_error)
+    
+    def _resolver(self):
+        """Operaciones pendientes listas para codificar (vacía la cola)"""
+        ops = []
+        for op in self.pendientes:
+            if op is None:
+                continue
+            if op[0] == "move":
+                transformacion = self.transform_of(op[1])
+                if transformacion is None:
+                    continue
+                op = ("move", op[1], *transformacion)
+            ops.append(op)
+        self.pendientes = []
+        self._movimientos = {}
+        return ops
+    
+    def _esperar_usuario(self):
+        """Antes de on_db_ready las escrituras irían al usuario por defecto: se aplazan"""
+        if App.get_running_app().user_loaded:
+            return False
+        self._flush_trigger()
+        return True
+    
+    @staticmethod
+    def _escritura(metodo, datos):
+        username = App.get_running_app().username
+        
+        def escribir(db):
+            user_id = db.get_usuario_id(username)
+            if user_id:
+                metodo(db, user_id, datos)
+        return escribir
+    
+    def _enviar(self, escritura):
+        app = App.get_running_app()
+        future = app.db_worker.submit(escritura, app.db, on_error=self.on_error)
+        self._enviadas = [e for e in self._enviadas if not e[0].done()]
+        self._enviadas.append((future, escritura))
+    
+    def on_error(self, error):
+        # El autoguardado no interrumpe al usuario; el guardado explícito sí avisa
+        Logger.warning(f"DercoR8: autoguardado de la escena fallido: {error!r}")
+
+# Historial de deshacer/rehacer de la escena AR
+class SceneCommand:
+    """Operación reversible sobre la escena AR.
+    
+    Las piezas se guardan como tuplas (id, tipo, x, y, rotación, escala);
+    undo y redo tocan solo las piezas afectadas a través de ARScreen.
+    """
+    __slots__ = ()
+    
+    # Estimación del coste en memoria de una pieza y de un comando
+    PIECE_BYTES = 160
+    BYTES = 120
+    
+    def undo(self, screen):
+        ...
+    
+    def redo(self, screen):
+        ...
+    
+    def size(self):
+        return self.BYTES + self.PIECE_BYTES
+
+class AddPieceCommand(SceneCommand):
+    __slots__ = ("pieza",)
+    
+    def __init__(self, pieza):
+        self.pieza = pieza
+    
+    def undo(self, screen):
+        screen.delete_piece(self.pieza[0])
+    
+    def redo(self, screen):
+        screen.insert_piece(*self.pieza)
+
+class RemovePieceCommand(AddPieceCommand):
+    """Borrado de una pieza; index es su posición en el orden de dibujo"""
+    __slots__ = ("index",)
+    
+    def __init__(self, pieza, index=None):
+        super().__init__(pieza)
+        self.index = index
+    
+    def undo(self, screen):
+        # Vuelve a su sitio en el apilado, no encima de todas
+        screen.insert_piece(*self.pieza, index=self.index)
+    
+    def redo(self, screen):
+        AddPieceCommand.undo(self, screen)
+
+class MovePieceCommand(SceneCommand):
+    __slots__ = ("piece_id", "antes", "despues")
+    
+    def __init__(self, piece_id, antes, despues):
+        self.piece_id = piece_id
+        self.antes = antes
+        self.despues = despues
+    
+    def undo(self, screen):
+        screen.set_piece_transform(self.piece_id, *self.antes)
+    
+    def redo(self, screen):
+        screen.set_piece_transform(self.piece_id, *self.despues)
+
+class ClearSceneCommand(SceneCommand):
+    __slots__ = ("piezas",)
+    
+    def __init__(self, piezas):
+        self.piezas = piezas
+    
+    def undo(self, screen):
+        screen.restore_pieces(self.piezas)
+    
+    def redo(self, screen):
+        screen.reset_scene()
+    
+    def size(self):
+        return self.BYTES + self.PIECE_BYTES * len(self.piezas)
+
+class CommandHistory:
+    """Pilas de deshacer y rehacer limitadas en número de comandos y en memoria.
+    
+    Al pasar de max_depth comandos o de max_bytes (estimados con
+    SceneCommand.size) se descartan los más antiguos. on_change() avisa
+    cuando cambia lo que se puede deshacer o rehacer.
+    """
+    
+    def __init__(self, max_depth=100, max_bytes=1024 * 1024, on_change=None):
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.on_change = on_change
+        self.deshacer = deque()
+        self.rehacer = []
+        self.bytes = 0
+    
+    @property
+    def can_undo(self):
+        return bool(self.deshacer)
+    
+    @property
+    def can_redo(self):
+        return bool(self.rehacer)
+    
+    def push(self, comando):
+        """Anota un comando ya ejecutado; invalida lo que se podía rehacer"""
+        self.bytes -= sum(c.size() for c in self.rehacer)
+        self.rehacer = []
+        self.deshacer.append(comando)
+        self.bytes += comando.size()
+        while self.deshacer and (len(self.deshacer) > self.max_depth
+                                 or self.bytes > self.max_bytes):
+            self.bytes -= self.deshacer.popleft().size()
+        self._avisar()
+    
+    def undo(self, destino):
+        if not self.deshacer:
+            return None
+        comando = self.deshacer.pop()
+        comando.undo(destino)
+        self.rehacer.append(comando)
+        self._avisar()
+        return comando
+    
+    def redo(self, destino):
+        if not self.rehacer:
+            return None
+        comando = self.rehacer.pop()
+        comando.redo(destino)
+        self.deshacer.append(comando)
+        self._avisar()
+        return comando
+    
+    def clear(self):
+        self.deshacer.clear()
+        self.rehacer = []
+        self.bytes = 0
+        self._avisar()
+    
+    def _avisar(self):
+        if self.on_change:
+            self.on_change()
+
+# Índice espacial de la escena AR
+class SpatialGrid:
+    """Rejilla uniforme sobre las cajas (x1, y1, x2, y2) de las piezas.
+    
+    Cada pieza se registra en las celdas que toca su caja; una consulta
+    por punto solo mira una celda y una por rango las celdas que cubre, en
+    lugar de recorrer todas las piezas. Las claves pueden ser cualquier
+    objeto hashable (ids o los propios widgets).
+    """
+    
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self._celdas = {}
+        self._cajas = {}
+    
+    def __len__(self):
+        return len(self._cajas)
+    
+    def insert(self, key, bbox):
+        self._cajas[key] = bbox
+        for celda in self._rango_celdas(bbox):
+            self._celdas.setdefault(celda, set()).add(key)
+    
+    def remove(self, key):
+        bbox = self._cajas.pop(key, None)
+        if bbox is None:
+            return
+        for celda in self._rango_celdas(bbox):
+            claves = self._celdas.get(celda)
+            if claves is not None:
+                claves.discard(key)
+                if not claves:
+                    del self._celdas[celda]
+    
+    def update(self, key, bbox):
+        anterior = self._cajas.get(key)
+        if anterior is not None and self._rango(anterior) == self._rango(bbox):
+            # Sigue en las mismas celdas: solo cambia la caja
+            self._cajas[key] = bbox
+            return
+        self.remove(key)
+        self.insert(key, bbox)
+    
+    def clear(self):
+        self._celdas.clear()
+        self._cajas.clear()
+    
+    def query_point(self, x, y):
+        """Claves cuya caja contiene el punto"""
+        cajas = self._cajas
+        return [
+            key for key in self.candidates(x, y)
+            if (caja := cajas[key])[0] <= x <= caja[2] and caja[1] <= y <= caja[3]
+        ]
+    
+    def candidates(self, x, y):
+        """Claves registradas en la celda del punto, sin comprobar sus cajas"""
+        return self._celdas.get((int(x // self.cell_size), int(y // self.cell_size)), ())
+    
+    def query_range(self, x1, y1, x2, y2):
+        """Claves cuya caja corta el rectángulo (x1, y1, x2, y2)"""
+        rango = (x1, y1, x2, y2)
+        cx1, cy1, cx2, cy2 = self._rango(rango)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self._cajas):
+            # Rango enorme: sale más barato mirar cada caja una vez
+            claves = self._cajas
+        else:
+            claves = set()
+            for celda in self._rango_celdas(rango):
+                claves.update(self._celdas.get(celda, ()))
+        return [key for key in claves if self._cortan(self._cajas[key], rango)]
+    
+    def overlapping_pairs(self):
+        """Todos los pares de claves con cajas que se cortan (cada par una vez)"""
+        pares = set()
+        for claves in self._celdas.values():
+            if len(claves) < 2:
+                continue
+            claves = list(claves)
+            for i, a in enumerate(claves):
+                caja_a = self._cajas[a]
+                for b in claves[i + 1:]:
+                    if self._cortan(caja_a, self._cajas[b]):
+                        pares.add((a, b) if id(a) < id(b) else (b, a))
+        return pares
+    
+    def bbox(self, key):
+        return self._cajas.get(key)
+    
+    @staticmethod
+    def _cortan(a, b):
+        return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+    
+    def _rango(self, bbox):
+        c = self.cell_size
+        return (int(bbox[0] // c), int(bbox[1] // c), int(bbox[2] // c), int(bbox[3] // c))
+    
+    def _rango_celdas(self, bbox):
+        cx1, cy1, cx2, cy2 = self._rango(bbox)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                yield (cx, cy)
 
 # Definición de las pantallas
+# Reglas comunes y pantalla de inicio: lo único que se carga al arrancar
 KV = '''
 #:import SlideTransition kivy.uix.screenmanager.SlideTransition
 #:import FadeTransition kivy.uix.screenmanager.FadeTransition
+#:import Window kivy.core.window.Window
 
 <NavButton@Button>:
     size_hint_y: None
@@ -242,6 +2679,7 @@ KV = '''
 
         Header:
             text: "DercoR8"
+            on_touch_down: if self.collide_point(*args[1].pos) and args[1].is_triple_tap: app.root.current = "debug"
         
         Label:
             text: "Diseña tu espacio soñado"
@@ -251,8 +2689,8 @@ KV = '''
             height: 40
             halign: 'center'
         
-        Image:
-            source: "assets/logo.png" if os.path.exists("assets/logo.png") else ""
+        CachedImage:
+            cached_source: root.logo_source
             size_hint_y: 0.4
             allow_stretch: True
             keep_ratio: True
@@ -282,6 +2720,15 @@ KV = '''
                 app.root.transition = FadeTransition()
                 app.root.current = "profile"
 
+LazyScreenManager:
+    id: screen_manager
+    HomeScreen:
+        name: "home"
+'''
+
+# Reglas de las demás pantallas: LazyScreenManager las carga al construir
+# cada pantalla por primera vez
+CATALOG_KV = '''
 <CatalogScreen>:
     BoxLayout:
         orientation: "vertical"
@@ -296,26 +2743,170 @@ KV = '''
 
         BoxLayout:
             size_hint_y: None
-            height: 70
-            NavButton:
-                text: "← Volver"
-                width: 100
-                size_hint_x: None
-                on_release:
-                    app.root.transition = SlideTransition(direction="right")
-                    app.root.current = "home"
-            Header:
-                text: "Catálogo"
+            height: 70
+            NavButton:
+                text: "← Volver"
+                width: 100
+                size_hint_x: None
+                on_release:
+                    app.root.transition = SlideTransition(direction="right")
+                    app.root.current = "home"
+            Header:
+                text: "Catálogo"
+            NavButton:
+                text: "Importar"
+                width: 100
+                size_hint_x: None
+                disabled: root.importing
+                on_release: root.open_import()
+        
+        BoxLayout:
+            size_hint_y: None
+            height: 30 if root.importing else 0
+            opacity: 1 if root.importing else 0
+            disabled: not root.importing
+            spacing: 10
+            ProgressBar:
+                max: 1
+                value: root.import_progress
+            Label:
+                text: root.import_status
+                color: 0.7,0.7,0.7,1
+                font_size: 12
+                size_hint_x: None
+                width: 110
+            NavButton:
+                text: "Detener"
+                size_hint_x: None
+                width: 80
+                on_release: root.cancel_import()
+        
+        TextInput:
+            id: search_input
+            hint_text: "Buscar muebles..."
+            multiline: False
+            size_hint_y: None
+            height: 45
+            background_color: 0.2,0.2,0.2,1
+            foreground_color: 1,1,1,1
+            padding: [10, 10]
+            on_text: root.trigger_search()
+        
+        BoxLayout:
+            size_hint_y: None
+            height: 40
+            spacing: 10
+            Spinner:
+                id: category_spinner
+                text: root.ALL_CATEGORIES
+                values: root.category_values
+                on_text: root.select_category(self.text)
+            Spinner:
+                id: price_spinner
+                text: "Cualquier precio"
+                values: list(root.PRICE_RANGES)
+                on_text: root.trigger_search()
+        
+        Label:
+            text: "Cargando catálogo..."
+            color: 0.7,0.7,0.7,1
+            font_size: 14
+            size_hint_y: None
+            height: 30 if root.loading else 0
+            opacity: 1 if root.loading else 0
+        
+        RecycleView:
+            id: products_rv
+            viewclass: "ProductCard"
+            RecycleBoxLayout:
+                orientation: "vertical"
+                default_size: None, 200
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
+                padding: 10
+                spacing: 15
+        
+        BoxLayout:
+            size_hint_y: None
+            height: 40 if root.results_status else 0
+            opacity: 1 if root.results_status else 0
+            spacing: 10
+            Label:
+                text: root.results_status
+                color: 0.7,0.7,0.7,1
+                font_size: 12
+            NavButton:
+                text: "Cargando..." if root.loading_more else "Ver más"
+                size_hint_x: None
+                width: 110
+                opacity: 1 if root.has_more else 0
+                disabled: not root.has_more or root.loading_more
+                on_release: root.load_more_results()
+
+<ProductCard>:
+    orientation: "horizontal"
+    spacing: 10
+    padding: 10
+    canvas.before:
+        Color:
+            rgba: 0.2, 0.25, 0.3, 1
+        RoundedRectangle:
+            pos: self.pos
+            size: self.size
+            radius: [10]
+    
+    CachedImage:
+        cached_source: root.imagen_textura
+        # Sin textura solo se ve el placeholder
+        color: (1, 1, 1, 1) if self.texture else (0, 0, 0, 0)
+        size_hint_x: None
+        width: 110
+        allow_stretch: True
+        keep_ratio: True
+        canvas.before:
+            Color:
+                rgba: (0.3, 0.35, 0.4, 1) if not self.texture else (0, 0, 0, 0)
+            RoundedRectangle:
+                pos: self.pos
+                size: self.size
+                radius: [6]
+    
+    BoxLayout:
+        orientation: "vertical"
+        spacing: 5
+        
+        Label:
+            text: root.nombre
+            color: 1,1,1,1
+            font_size: 18
+            bold: True
+            size_hint_y: None
+            height: 30
         
-        ScrollView:
-            GridLayout:
-                id: products_grid
-                cols: 1
-                size_hint_y: None
-                height: self.minimum_height
-                padding: 10
-                spacing: 15
+        Label:
+            text: root.precio
+            color: 0.9,0.9,0.2,1
+            font_size: 16
+            size_hint_y: None
+            height: 25
+        
+        Label:
+            text: root.stock
+            color: root.stock_color
+            font_size: 14
+            size_hint_y: None
+            height: 20
+        
+        Label:
+            text: root.descripcion
+            color: 0.8,0.8,0.8,1
+            font_size: 12
+            size_hint_y: None
+            height: 40
+'''
 
+ASSISTANT_KV = '''
 <AssistantScreen>:
     proposal_text: ""
     BoxLayout:
@@ -373,12 +2964,14 @@ KV = '''
             height: 50
             spacing: 10
             NavButton:
-                text: "Guardar Propuesta"
+                text: "Guardando..." if root.busy else "Guardar Propuesta"
                 background_color: 0.3, 0.7, 0.5, 1
+                disabled: root.busy
                 on_release: root.save_proposal()
             NavButton:
                 text: "Ver Historial"
                 background_color: 0.5, 0.3, 0.7, 1
+                disabled: root.busy
                 on_release: root.view_history()
         
         ScrollView:
@@ -397,9 +2990,10 @@ KV = '''
                     valign: "top"
                     size_hint_y: None
                     height: self.texture_size[1] + 20
+'''
 
+AR_KV = '''
 <ARScreen>:
-    current_scene: []
     BoxLayout:
         orientation: "vertical"
         spacing: 10
@@ -435,26 +3029,50 @@ KV = '''
                     size: self.size
             
             Label:
-                text: "Área de Realidad Aumentada\\nAgrega muebles con los botones"
+                text: "Área de Realidad Aumentada\\nAgrega muebles con los botones\\nDoble toque para quitar una pieza"
                 color: 0.7,0.7,0.7,1
                 font_size: 18
                 halign: 'center'
                 valign: 'middle'
                 text_size: self.size
                 pos_hint: {'center_x': 0.5, 'center_y': 0.5}
+            
+            # Capa de las piezas: un Widget simple, agregar o mover una
+            # pieza no provoca pasadas de layout del área
+            PieceLayer:
+                id: ar_pieces
+                pos_hint: {'x': 0, 'y': 0}
+            
+            # Escenas densas: todas las piezas en un solo canvas
+            SceneCanvas:
+                id: ar_canvas
+                pos_hint: {'x': 0, 'y': 0}
+                on_piece_transform: root.on_canvas_piece_transform(args[1])
         
         BoxLayout:
             size_hint_y: None
             height: 50
             spacing: 10
             NavButton:
-                text: "Guardar Escena"
+                text: "Guardando..." if root.busy and not root.loading_scene else "Guardar Escena"
                 background_color: 0.3, 0.7, 0.5, 1
+                disabled: root.busy
                 on_release: root.save_scene()
             NavButton:
-                text: "Cargar Escena"
+                text: "Cargando..." if root.loading_scene else "Cargar Escena"
                 background_color: 0.5, 0.3, 0.7, 1
+                disabled: root.busy
                 on_release: root.load_scenes()
+            NavButton:
+                text: "Deshacer"
+                size_hint_x: 0.6
+                disabled: root.busy or not root.can_undo
+                on_release: root.undo()
+            NavButton:
+                text: "Rehacer"
+                size_hint_x: 0.6
+                disabled: root.busy or not root.can_redo
+                on_release: root.redo()
         
         BoxLayout:
             size_hint_y: None
@@ -473,7 +3091,9 @@ KV = '''
                 text: "Limpiar"
                 background_color: 0.8, 0.2, 0.2, 1
                 on_release: root.clear_scene()
+'''
 
+PROFILE_KV = '''
 <ProfileScreen>:
     BoxLayout:
         orientation: "vertical"
@@ -541,97 +3161,1019 @@ KV = '''
             NavButton:
                 text: "Guardar Cambios"
                 background_color: 0.3, 0.7, 0.5, 1
+                disabled: root.busy
                 on_release: root.save_profile()
             NavButton:
-                text: "Eliminar Proyectos"
+                text: "Eliminando..." if root.busy else "Eliminar Proyectos"
                 background_color: 0.8, 0.3, 0.3, 1
+                disabled: root.busy
                 on_release: root.delete_projects()
+'''
 
-ScreenManager:
-    id: screen_manager
-    HomeScreen:
-        name: "home"
-    CatalogScreen:
-        name: "catalog"
-    AssistantScreen:
-        name: "assistant"
-    ARScreen:
-        name: "ar_view"
-    ProfileScreen:
-        name: "profile"
+DEBUG_KV = '''
+<DebugScreen>:
+    BoxLayout:
+        orientation: "vertical"
+        padding: 10
+        spacing: 10
+        canvas.before:
+            Color:
+                rgba: 0.1, 0.15, 0.2, 1
+            Rectangle:
+                pos: self.pos
+                size: self.size
+
+        BoxLayout:
+            size_hint_y: None
+            height: 70
+            NavButton:
+                text: "← Volver"
+                width: 100
+                size_hint_x: None
+                on_release:
+                    app.root.transition = FadeTransition()
+                    app.root.current = "home"
+            Header:
+                text: "Rendimiento"
+        
+        BoxLayout:
+            size_hint_y: None
+            height: 40
+            spacing: 10
+            NavButton:
+                text: "Desactivar" if root.profiling else "Activar"
+                background_color: (0.8, 0.3, 0.3, 1) if root.profiling else (0.3, 0.7, 0.5, 1)
+                on_release: root.toggle_profiling()
+            NavButton:
+                text: "Actualizar"
+                on_release: root.refresh()
+            NavButton:
+                text: "Limpiar"
+                on_release: root.clear_samples()
+            NavButton:
+                text: "Exportar"
+                on_release: root.export_report()
+        
+        BoxLayout:
+            size_hint_y: None
+            height: 40
+            spacing: 10
+            NavButton:
+                text: "Frames: sí" if root.monitoring else "Frames: no"
+                background_color: (0.8, 0.3, 0.3, 1) if root.monitoring else (0.3, 0.7, 0.5, 1)
+                on_release: root.toggle_monitor()
+            NavButton:
+                text: "Ocultar overlay" if root.overlay else "Mostrar overlay"
+                on_release: root.toggle_overlay()
+        
+        ScrollView:
+            Label:
+                text: root.report
+                font_name: "RobotoMono-Regular"
+                font_size: 11
+                color: 0.9, 0.9, 0.9, 1
+                size_hint_y: None
+                height: self.texture_size[1]
+                text_size: self.width, None
+                halign: "left"
+                valign: "top"
 '''
 
 # Clases de pantallas
+def show_db_error(error):
+    """Informa al usuario de un fallo en una operación de la base de datos"""
+    Logger.error(f"DercoR8: error en la base de datos: {error!r}")
+    popup = Popup(
+        title="Error",
+        content=Label(text="No se pudo completar la operación"),
+        size_hint=(0.6, 0.4)
+    )
+    popup.open()
+
+class FrameOverlay(Label):
+    """Resumen del FrameMonitor dibujado sobre todas las pantallas (no captura toques)"""
+    
+    # Segundos entre actualizaciones y frames que entran en la media
+    INTERVAL = 0.5
+    RECENT = 60
+    
+    def __init__(self, monitor, **kwargs):
+        kwargs.setdefault("font_name", "RobotoMono-Regular")
+        kwargs.setdefault("font_size", 11)
+        super().__init__(size_hint=(None, None), padding=(6, 4), **kwargs)
+        self.monitor = monitor
+        self._evento = None
+        with self.canvas.before:
+            Color(0, 0, 0, 0.6)
+            self._fondo = Rectangle()
+        self.bind(texture_size=self._colocar)
+        Window.bind(size=self._colocar)
+    
+    def show(self):
+        Window.add_widget(self)
+        self._evento = Clock.schedule_interval(self.refresh, self.INTERVAL)
+        self.refresh()
+    
+    def hide(self):
+        if self._evento is not None:
+            self._evento.cancel()
+            self._evento = None
+        Window.unbind(size=self._colocar)
+        Window.remove_widget(self)
+    
+    def refresh(self, *args):
+        recientes = list(self.monitor.frames)[-self.RECENT:]
+        if recientes:
+            media = sum(recientes) / len(recientes)
+            lineas = [f"{1000 / media:4.0f} fps  máx {max(recientes):5.1f} ms  "
+                      f"largos {len(self.monitor.long_frames)}"]
+        else:
+            lineas = ["midiendo frames..."]
+        if self.monitor.long_frames:
+            ultimo = self.monitor.long_frames[-1]
+            lineas.append(f"último {ultimo['ms']:.0f} ms {ultimo['causas'][0][0]}")
+        self.text = "\n".join(lineas)
+    
+    def _colocar(self, *args):
+        self.size = self.texture_size
+        self.pos = (4, Window.height - self.height - 4)
+        self._fondo.pos = self.pos
+        self._fondo.size = self.size
+
+class CachedImage(Image):
+    """Image que toma su textura de la caché compartida de la app"""
+    cached_source = StringProperty("")
+    _adquirida = ""
+    
+    def on_cached_source(self, instance, value):
+        textures = App.get_running_app().textures
+        if self._adquirida:
+            textures.release(self._adquirida)
+        self._adquirida = value
+        self.texture = textures.acquire(value)
+    
+    def release_texture(self):
+        """Devuelve la textura a la caché (al quitar el widget de pantalla)"""
+        self.cached_source = ""
+
+class PieceLayer(Widget):
+    """Capa de las piezas Scatter con un índice espacial de sus cajas.
+    
+    Los toques solo se pasan a las piezas cuya caja contiene el punto, de
+    la de más arriba a la de más abajo, en lugar de recorrer todos los
+    hijos. El índice se actualiza al cambiar la transformación de cada pieza.
+    """
+    
+    CELL_SIZE = 64
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Claves del índice: uid de cada pieza (hashear el widget es más lento)
+        self.index = SpatialGrid(self.CELL_SIZE)
+        self._piezas = {}
+        # Orden de apilado: crece cada vez que una pieza se (re)agrega encima
+        self._z = {}
+        self._orden = itertools.count()
+    
+    def add_widget(self, widget, index=0, canvas=None):
+        super().add_widget(widget, index, canvas)
+        if index:
+            # Insertada debajo de otras: se renumera el apilado desde abajo
+            self._orden = itertools.count()
+            for hijo in reversed(self.children):
+                self._z[hijo.uid] = next(self._orden)
+        else:
+            self._z[widget.uid] = next(self._orden)
+        if self._piezas.get(widget.uid) is widget:
+            return
+        self._piezas[widget.uid] = widget
+        widget.fbind("transform", self._on_piece_transform)
+        self.index.insert(widget.uid, self._caja(widget))
+    
+    def bring_to_front(self, widget):
+        """Sube la pieza sin sacarla del índice (sustituye a auto_bring_to_front)"""
+        if self.children and self.children[0] is widget:
+            return
+        super().remove_widget(widget)
+        self.add_widget(widget)
+    
+    def remove_widget(self, widget, *args, **kwargs):
+        super().remove_widget(widget, *args, **kwargs)
+        if self._piezas.pop(widget.uid, None) is not None:
+            del self._z[widget.uid]
+            widget.funbind("transform", self._on_piece_transform)
+            self.index.remove(widget.uid)
+    
+    def _on_piece_transform(self, widget, transform):
+        self.index.update(widget.uid, self._caja(widget))
+    
+    @staticmethod
+    def _caja(widget):
+        (x, y), (ancho, alto) = widget.bbox
+        return (x, y, x + ancho, y + alto)
+    
+    def pieces_at(self, x, y):
+        """Piezas cuya caja contiene el punto, de la de más arriba a la de más abajo.
+        
+        Es un generador: el despacho de toques para en la primera que lo
+        acepta sin comprobar las cajas de las que quedan debajo.
+        """
+        indice = self.index
+        for clave in sorted(indice.candidates(x, y), key=self._z.__getitem__, reverse=True):
+            caja = indice.bbox(clave)
+            if caja[0] <= x <= caja[2] and caja[1] <= y <= caja[3]:
+                yield self._piezas[clave]
+    
+    def _despachar(self, evento, touch):
+        if self.disabled and self.collide_point(*touch.pos):
+            return True
+        for pieza in self.pieces_at(*touch.pos):
+            if pieza.dispatch(evento, touch):
+                if evento == "on_touch_down" and pieza.parent is self:
+                    self.bring_to_front(pieza)
+                return True
+        return False
+    
+    def on_touch_down(self, touch):
+        return self._despachar("on_touch_down", touch)
+    
+    def on_touch_move(self, touch):
+        # Los toques capturados por una pieza le llegan directamente (grab)
+        return self._despachar("on_touch_move", touch)
+    
+    def on_touch_up(self, touch):
+        return self._despachar("on_touch_up", touch)
+
+class CanvasPiece:
+    """Pieza dibujada por SceneCanvas: transformación e instrucciones propias"""
+    __slots__ = ("id", "type", "source", "width", "height", "x", "y", "rotation", "scale",
+                 "z", "group", "translate", "rotate", "zoom", "cos", "sin")
+    
+    def bbox(self):
+        """Caja alineada a los ejes de la pieza rotada y escalada (actualiza cos/sin)"""
+        angulo = math.radians(self.rotation)
+        self.cos, self.sin = math.cos(angulo), math.sin(angulo)
+        ancho = self.width * self.scale / 2
+        alto = self.height * self.scale / 2
+        c, s = abs(self.cos), abs(self.sin)
+        ex, ey = ancho * c + alto * s, ancho * s + alto * c
+        return (self.x - ex, self.y - ey, self.x + ex, self.y + ey)
+    
+    def contains(self, x, y):
+        """Prueba exacta: el punto en coordenadas de la pieza cae dentro del rectángulo"""
+        dx, dy = x - self.x, y - self.y
+        lx = dx * self.cos + dy * self.sin
+        ly = dy * self.cos - dx * self.sin
+        return (abs(lx) <= self.width * self.scale / 2
+                and abs(ly) <= self.height * self.scale / 2)
+
+class SceneCanvas(Widget):
+    """Renderizador de escenas densas: todas las piezas en el canvas de un solo widget.
+    
+    Cada pieza son unas pocas instrucciones (Translate/Rotate/Scale y un
+    Rectangle con la textura compartida) en lugar de un Scatter con su
+    Image. Los toques se resuelven con un SpatialGrid y solo se modifica
+    la pieza seleccionada: un dedo la arrastra, dos la giran y escalan.
+    on_piece_transform(pieza) avisa de cada cambio hecho con los dedos.
+    """
+    
+    __events__ = ("on_piece_transform",)
+    
+    SCALE_MIN = 0.2
+    SCALE_MAX = 8
+    # Lado de celda del índice, del orden del tamaño de una pieza pequeña
+    CELL_SIZE = 64
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.pieces = {}
+        self.index = SpatialGrid(self.CELL_SIZE)
+        self.selected = None
+        self._ids = itertools.count()
+        self._z = itertools.count()
+        self._toques = []
+    
+    def add_piece(self, furniture_type, source, size, position, rotation=0, scale=1,
+                  piece_id=None, index=None):
+        """Agrega la pieza encima de todas, o en la posición index del orden de dibujo"""
+        pieza = CanvasPiece()
+        pieza.id = next(self._ids) if piece_id is None else piece_id
+        pieza.type = furniture_type
+        pieza.source = source
+        pieza.width, pieza.height = size
+        pieza.x, pieza.y = position
+        pieza.rotation = rotation
+        pieza.scale = scale
+        
+        textura = App.get_running_app().textures.acquire(source)
+        pieza.translate = Translate(pieza.x, pieza.y)
+        pieza.rotate = Rotate(angle=rotation, axis=(0, 0, 1))
+        pieza.zoom = Scale(scale)
+        pieza.group = InstructionGroup()
+        for instruccion in (PushMatrix(), pieza.translate, pieza.rotate, pieza.zoom,
+                            Rectangle(texture=textura, pos=(-pieza.width / 2, -pieza.height / 2),
+                                      size=size),
+                            PopMatrix()):
+            pieza.group.add(instruccion)
+        
+        orden = sorted(self.pieces.values(), key=lambda otra: otra.z)
+        if index is not None and index < len(orden):
+            # Debajo de otras (deshacer un borrado): se renumera el apilado
+            self.canvas.insert(self.canvas.indexof(orden[index].group), pieza.group)
+            orden.insert(index, pieza)
+            self._z = itertools.count()
+            for otra in orden:
+                otra.z = next(self._z)
+        else:
+            pieza.z = next(self._z)
+            self.canvas.add(pieza.group)
+        
+        self.pieces[pieza.id] = pieza
+        self.index.insert(pieza.id, pieza.bbox())
+        return pieza
+    
+    def remove_piece(self, pieza):
+        if self.pieces.pop(pieza.id, None) is None:
+            return
+        self.canvas.remove(pieza.group)
+        self.index.remove(pieza.id)
+        App.get_running_app().textures.release(pieza.source)
+        if pieza is self.selected:
+            self.selected = None
+            self._toques = []
+    
+    def clear(self):
+        textures = App.get_running_app().textures
+        for pieza in self.pieces.values():
+            textures.release(pieza.source)
+        self.canvas.clear()
+        self.pieces = {}
+        self.index.clear()
+        self.selected = None
+        self._toques = []
+    
+    def piece_at(self, x, y):
+        """Pieza visible más arriba en el punto (None si no hay)"""
+        candidatas = [self.pieces[key] for key in self.index.query_point(x, y)]
+        candidatas.sort(key=lambda pieza: pieza.z, reverse=True)
+        for pieza in candidatas:
+            if pieza.contains(x, y):
+                return pieza
+        return None
+    
+    def bring_to_front(self, pieza):
+        pieza.z = next(self._z)
+        self.canvas.remove(pieza.group)
+        self.canvas.add(pieza.group)
+    
+    def move_piece(self, pieza, x, y, rotation=None, scale=None):
+        pieza.x, pieza.y = x, y
+        pieza.translate.xy = (x, y)
+        if rotation is not None:
+            pieza.rotation = rotation % 360
+            pieza.rotate.angle = pieza.rotation
+        if scale is not None:
+            pieza.scale = scale
+            pieza.zoom.xyz = (scale, scale, scale)
+        self.index.update(pieza.id, pieza.bbox())
+    
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos):
+            return False
+        pieza = self.piece_at(*touch.pos)
+        if pieza is None:
+            return False
+        if pieza is not self.selected:
+            # Un toque sobre otra pieza empieza una selección nueva
+            self.selected = pieza
+            self._toques = []
+        if not self._toques:
+            # Cada gesto sube la pieza, igual que PieceLayer
+            self.bring_to_front(pieza)
+        if len(self._toques) < 2:
+            touch.grab(self)
+            self._toques.append(touch)
+        return True
+    
+    def on_touch_move(self, touch):
+        if touch.grab_current is not self:
+            return False
+        pieza = self.selected
+        if pieza is None or touch not in self._toques:
+            return True
+        
+        if len(self._toques) == 1:
+            self.move_piece(pieza, pieza.x + touch.dx, pieza.y + touch.dy)
+            self.dispatch("on_piece_transform", pieza)
+            return True
+        
+        # Dos dedos: giro y escala alrededor del otro toque, como Scatter
+        ancla = self._toques[0] if self._toques[1] is touch else self._toques[1]
+        ax, ay = ancla.pos
+        antes = (touch.px - ax, touch.py - ay)
+        ahora = (touch.x - ax, touch.y - ay)
+        largo_antes = math.hypot(*antes)
+        largo_ahora = math.hypot(*ahora)
+        if not largo_antes or not largo_ahora:
+            return True
+        
+        escala = min(self.SCALE_MAX, max(self.SCALE_MIN, pieza.scale * largo_ahora / largo_antes))
+        factor = escala / pieza.scale
+        giro = math.atan2(ahora[1], ahora[0]) - math.atan2(antes[1], antes[0])
+        c, s = math.cos(giro), math.sin(giro)
+        dx, dy = pieza.x - ax, pieza.y - ay
+        self.move_piece(
+            pieza,
+            ax + (dx * c - dy * s) * factor,
+            ay + (dx * s + dy * c) * factor,
+            rotation=pieza.rotation + math.degrees(giro),
+            scale=escala
+        )
+        self.dispatch("on_piece_transform", pieza)
+        return True
+    
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return False
+        touch.ungrab(self)
+        if touch in self._toques:
+            self._toques.remove(touch)
+        return True
+    
+    def on_piece_transform(self, pieza):
+        pass
+
+class LazyScreenManager(ScreenManager):
+    """ScreenManager que construye cada pantalla la primera vez que se necesita.
+    
+    Al arrancar solo existe home. get_screen (y con él el cambio de
+    current) carga las reglas KV de la pantalla y la crea bajo demanda;
+    prewarm() construye las que faltan de una en una, un frame cada una,
+    cuando la app está ociosa.
+    """
+    
+    # nombre -> (clase, reglas KV)
+    SCREENS = {
+        "catalog": ("CatalogScreen", CATALOG_KV),
+        "assistant": ("AssistantScreen", ASSISTANT_KV),
+        "ar_view": ("ARScreen", AR_KV),
+        "profile": ("ProfileScreen", PROFILE_KV),
+        # Oculta: triple toque sobre el título de la pantalla de inicio
+        "debug": ("DebugScreen", DEBUG_KV),
+    }
+    # Orden de precarga: las pantallas más usadas primero
+    PREWARM_ORDER = ("catalog", "ar_view", "assistant", "profile")
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Milisegundos que costó construir cada pantalla
+        self.build_times = {}
+        self._prewarm_event = None
+    
+    def get_screen(self, name):
+        if name in self.SCREENS and not self.has_screen(name):
+            self.build_screen(name)
+        return super().get_screen(name)
+    
+    def built_screen(self, name):
+        """La pantalla si ya está construida, sin construirla"""
+        return super().get_screen(name) if self.has_screen(name) else None
+    
+    @profiled("screens.build_screen")
+    def build_screen(self, name):
+        inicio = time.perf_counter()
+        clase, reglas = self.SCREENS[name]
+        Builder.load_string(reglas, filename=f"dercor8-{name}.kv")
+        screen = Factory.get(clase)(name=name)
+        self.add_widget(screen)
+        self.build_times[name] = (time.perf_counter() - inicio) * 1000
+        Logger.info(f"DercoR8: pantalla {name} construida en {self.build_times[name]:.1f} ms")
+        return screen
+    
+    def prewarm(self, *args):
+        """Construye la siguiente pantalla pendiente y se reprograma para el frame siguiente"""
+        self._prewarm_event = None
+        for name in self.PREWARM_ORDER:
+            if not self.has_screen(name):
+                self.build_screen(name)
+                self._prewarm_event = Clock.schedule_once(self.prewarm)
+                return
+    
+    def cancel_prewarm(self):
+        if self._prewarm_event is not None:
+            self._prewarm_event.cancel()
+            self._prewarm_event = None
+
 class HomeScreen(Screen):
-    pass
+    # Miniatura del logo si ya está en disco; si no, el original mientras se genera
+    logo_source = StringProperty("")
+    
+    LOGO = "assets/logo.png"
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        ruta = App.get_running_app().thumbnails.lookup(self.LOGO, *self.logo_size())
+        self.logo_source = ruta if ruta is not None else self.LOGO
+    
+    @staticmethod
+    def logo_size():
+        return Window.width, Window.height * 0.4
+    
+    def request_logo(self):
+        """Pide la miniatura del logo al cargador (el Fbo y el PNG no frenan el arranque)"""
+        if self.logo_source == self.LOGO:
+            App.get_running_app().image_loader.load(self.LOGO, *self.logo_size(),
+                                                    callback=self.on_logo_loaded)
+    
+    def on_logo_loaded(self, ruta):
+        if ruta:
+            self.logo_source = ruta
+
+class ProductCard(RecycleDataViewBehavior, BoxLayout):
+    """Card reutilizable del catálogo: RecycleView solo crea las visibles"""
+    producto_id = NumericProperty(0)
+    imagen = StringProperty("")
+    # Miniatura ya cargada; vacía mientras se muestra el placeholder
+    imagen_textura = StringProperty("")
+    nombre = StringProperty("")
+    precio = StringProperty("")
+    stock = StringProperty("")
+    stock_color = ListProperty([0.7, 0.7, 0.7, 1])
+    descripcion = StringProperty("")
+    
+    IMAGE_SIZE = (110, 180)
+    index = -1
+    image_ticket = None
+    
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        anterior = self.imagen
+        super().refresh_view_attrs(rv, index, data)
+        if self.imagen != anterior or not (self.imagen_textura or self.image_ticket):
+            self.request_image()
+    
+    def on_parent(self, instance, parent):
+        # RecycleView quita del layout las cards que salen de pantalla
+        if parent is None:
+            self.cancel_image()
+        elif not self.imagen_textura and self.image_ticket is None:
+            self.request_image()
+    
+    def request_image(self):
+        self.cancel_image()
+        self.imagen_textura = ""
+        self.image_ticket = App.get_running_app().image_loader.load(
+            self.imagen, *self.IMAGE_SIZE, callback=self.on_image_loaded
+        )
+    
+    def cancel_image(self):
+        if self.image_ticket is not None:
+            App.get_running_app().image_loader.cancel(self.image_ticket)
+            self.image_ticket = None
+    
+    def on_image_loaded(self, ruta):
+        self.image_ticket = None
+        self.imagen_textura = ruta
 
 class CatalogScreen(Screen):
+    # Versión del registro de cambios con la que se cargó el catálogo
+    products_version = None
+    category_values = ListProperty([])
+    loading = BooleanProperty(False)
+    # Resultados filtrados: "200 de 1,234 productos" y si quedan páginas
+    results_status = StringProperty("")
+    has_more = BooleanProperty(False)
+    loading_more = BooleanProperty(False)
+    importing = BooleanProperty(False)
+    import_progress = NumericProperty(0)
+    import_status = StringProperty("")
+    
+    ALL_CATEGORIES = "Todas las categorías"
+    PRICE_RANGES = {
+        "Cualquier precio": (None, None),
+        "Hasta $2,000": (None, 2000),
+        "$2,000 - $5,000": (2000, 5000),
+        "Más de $5,000": (5000, None)
+    }
+    FACET_COUNT = re.compile(r" \(\d+\)$")
+    # Productos por página de resultados filtrados
+    SEARCH_PAGE = 200
+    # Búsquedas recientes cuyas facetas se conservan
+    FACET_CACHE = 32
+    # Cards por delante del scroll cuyas imágenes se precargan
+    PREFETCH = 8
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.products_data = []
+        self.products_index = {}
+        self.filtering = False
+        self.syncing = False
+        self.search_token = 0
+        # Filtros y cursor de la última búsqueda, para pedir la página siguiente
+        self.search_filters = None
+        self.search_cursor = None
+        self.search_total = 0
+        # (versión, texto, precio_min, precio_max) -> facetas. La categoría no
+        # cambia las facetas: elegirla o paginar no las vuelve a contar
+        self.facet_cache = OrderedDict()
+        # Búsqueda con rebote: se ejecuta cuando el usuario deja de escribir
+        self.search_trigger = Clock.create_trigger(self.apply_search, 0.3)
+        # Imágenes precargadas por delante del scroll: fuente -> ticket
+        self.prefetch_tickets = {}
+        self.last_scroll_y = 1.0
+        self.prefetch_trigger = Clock.create_trigger(self.prefetch_images)
+        # Las reglas de la clase ya están aplicadas (la pantalla puede
+        # crearse suelta, fuera del árbol KV, y on_kv_post llegaría antes)
+        rv = self.ids.products_rv
+        rv.bind(scroll_y=self.prefetch_trigger, data=self.prefetch_trigger)
+    
+    @profiled("catalog.on_enter")
     def on_enter(self):
-        self.load_products()
+        self.refresh_products()
+    
+    def on_leave(self):
+        self.cancel_prefetch()
+    
+    @profiled("catalog.prefetch_images")
+    def prefetch_images(self, *args):
+        """Precarga las imágenes de las siguientes cards en la dirección del scroll.
+        
+        Las visibles ya las piden las propias cards (prioridad 0); aquí la
+        prioridad crece con la distancia a la pantalla y lo que queda fuera
+        de la ventana de precarga se cancela.
+        """
+        rv = self.ids.products_rv
+        visibles = [card.index for card in rv.layout_manager.children
+                    if isinstance(card, ProductCard) and card.index >= 0]
+        if not visibles or not rv.data:
+            self.cancel_prefetch()
+            return
+        
+        # scroll_y baja al avanzar hacia el final de la lista
+        if rv.scroll_y <= self.last_scroll_y:
+            indices = range(max(visibles) + 1, min(len(rv.data), max(visibles) + 1 + self.PREFETCH))
+        else:
+            indices = range(min(visibles) - 1, max(-1, min(visibles) - 1 - self.PREFETCH), -1)
+        self.last_scroll_y = rv.scroll_y
+        
+        loader = App.get_running_app().image_loader
+        anteriores = self.prefetch_tickets
+        self.prefetch_tickets = {}
+        for distancia, i in enumerate(indices, 1):
+            imagen = rv.data[i]["imagen"]
+            if imagen in self.prefetch_tickets:
+                continue
+            ticket = anteriores.pop(imagen, None)
+            if ticket is not None:
+                loader.set_priority(ticket, distancia)
+            else:
+                ticket = loader.load(imagen, *ProductCard.IMAGE_SIZE, priority=distancia)
+            if ticket is not None:
+                self.prefetch_tickets[imagen] = ticket
+        for ticket in anteriores.values():
+            loader.cancel(ticket)
     
+    def cancel_prefetch(self):
+        loader = App.get_running_app().image_loader
+        for ticket in self.prefetch_tickets.values():
+            loader.cancel(ticket)
+        self.prefetch_tickets = {}
+    
+    @profiled("catalog.load_products")
     def load_products(self):
         app = App.get_running_app()
-        productos = app.db.get_productos()
+        self.loading = True
+        self.syncing = True
+        app.db_worker.submit(self.fetch_catalog, app.db,
+                             on_result=self.on_catalog_loaded, on_error=self.on_sync_error)
+    
+    @classmethod
+    def fetch_catalog(cls, db):
+        """Hilo de la base de datos: lee el catálogo completo y arma los datos de las cards"""
+        # La versión se lee antes que los productos: un cambio intermedio
+        # se vuelve a aplicar en el siguiente refresco sin perderse
+        version = db.get_version_productos()
+        productos = db.get_productos()
+        db.compactar_cambios_productos(version)
+        return version, [cls.product_to_data(p) for p in productos]
+    
+    @profiled("catalog.on_catalog_loaded")
+    def on_catalog_loaded(self, resultado):
+        version, data = resultado
         
-        grid = self.ids.products_grid
-        grid.clear_widgets()
+        # Solo se generan los datos; los widgets los recicla el RecycleView
+        self.products_data = data
+        self.products_index = {d["producto_id"]: i for i, d in enumerate(data)}
+        self.products_version = version
+        self.loading = False
+        self.syncing = False
         
-        for producto in productos:
-            prod_id, nombre, categoria, precio, imagen, descripcion, stock = producto
-            
-            # Crear un card para cada producto
-            card = BoxLayout(
-                orientation='vertical',
-                size_hint_y=None,
-                height=200,
-                spacing=5,
-                padding=10
-            )
-            
-            # Fondo del card
-            with card.canvas.before:
-                from kivy.graphics import Color, RoundedRectangle
-                Color(0.2, 0.25, 0.3, 1)
-                RoundedRectangle(pos=card.pos, size=card.size, radius=[10])
-            
-            # Información del producto
-            card.add_widget(Label(
-                text=nombre,
-                color=(1,1,1,1),
-                font_size=18,
-                bold=True,
-                size_hint_y=None,
-                height=30
-            ))
-            
-            card.add_widget(Label(
-                text=f"Precio: ${precio:,.2f}",
-                color=(0.9,0.9,0.2,1),
-                font_size=16,
-                size_hint_y=None,
-                height=25
-            ))
-            
-            card.add_widget(Label(
-                text=f"Stock: {stock} unidades",
-                color=(0.7,0.7,0.7,1) if stock > 0 else (1,0.3,0.3,1),
-                font_size=14,
-                size_hint_y=None,
-                height=20
-            ))
-            
-            card.add_widget(Label(
-                text=descripcion[:50] + "..." if len(descripcion) > 50 else descripcion,
-                color=(0.8,0.8,0.8,1),
-                font_size=12,
+        if not self.filtering:
+            self.ids.products_rv.data = self.products_data
+        self.apply_search()
+    
+    def on_sync_error(self, error):
+        self.loading = False
+        self.syncing = False
+        Logger.error(f"DercoR8: no se pudo cargar el catálogo: {error!r}")
+    
+    def open_import(self):
+        """Selector del catálogo de proveedor a importar (CSV o JSON Lines)"""
+        app = App.get_running_app()
+        app.db_worker.submit(app.db.get_importacion_pendiente,
+                             on_result=self.show_import_chooser, on_error=show_db_error)
+    
+    def show_import_chooser(self, pendiente):
+        # El selector de archivos solo se carga al importar
+        from kivy.uix.filechooser import FileChooserListView
+        from kivy.utils import platform
+        
+        if platform == 'android':
+            from android.storage import primary_external_storage_path
+            inicio = primary_external_storage_path()
+        else:
+            inicio = os.path.expanduser("~")
+        
+        content = BoxLayout(orientation='vertical', spacing=10, padding=10)
+        chooser = FileChooserListView(path=inicio, filters=["*.csv", "*.jsonl", "*.ndjson"])
+        if pendiente and os.path.exists(pendiente[0]):
+            # Elegir el mismo archivo continúa donde se quedó
+            ruta, filas = pendiente
+            chooser.path = os.path.dirname(ruta)
+            chooser.selection = [ruta]
+            content.add_widget(Label(
+                text=f"Importación pendiente: {os.path.basename(ruta)} ({filas:,} filas leídas)",
                 size_hint_y=None,
-                height=40
+                height=40,
+                text_size=(Window.width * 0.8, None),
+                halign="center"
             ))
-            
-            grid.add_widget(card)
+        content.add_widget(chooser)
+        
+        popup = Popup(
+            title="Importar Catálogo",
+            content=content,
+            size_hint=(0.95, 0.9)
+        )
+        
+        def importar(instance):
+            if chooser.selection:
+                popup.dismiss()
+                self.start_import(chooser.selection[0])
+        
+        botones = BoxLayout(size_hint_y=None, height=50, spacing=10)
+        btn_importar = Button(text="Importar", background_color=(0.3, 0.7, 0.5, 1))
+        btn_importar.bind(on_release=importar)
+        btn_cancelar = Button(text="Cancelar", background_color=(0.8, 0.3, 0.3, 1))
+        btn_cancelar.bind(on_release=popup.dismiss)
+        botones.add_widget(btn_importar)
+        botones.add_widget(btn_cancelar)
+        content.add_widget(botones)
+        popup.open()
+    
+    def start_import(self, ruta):
+        app = App.get_running_app()
+        if app.catalog_import is not None and app.catalog_import.running:
+            return
+        
+        self.importing = True
+        self.import_progress = 0
+        self.import_status = "Preparando..."
+        app.catalog_import = CatalogImport(app.db, ruta,
+                                           on_progress=self.update_import_progress,
+                                           on_complete=self.on_import_finished)
+        app.catalog_import.start()
+    
+    def cancel_import(self):
+        app = App.get_running_app()
+        if app.catalog_import is not None:
+            app.catalog_import.cancel()
+            self.import_status = "Deteniendo..."
+    
+    def update_import_progress(self, importacion):
+        self.import_progress = importacion.progress
+        self.import_status = f"{importacion.filas:,} filas"
+    
+    def on_import_finished(self, importacion):
+        App.get_running_app().catalog_import = None
+        self.importing = False
+        
+        if importacion.estado == "fallida":
+            titulo = "Error"
+            mensaje = f"No se pudo importar el catálogo\n{importacion.error}"
+        else:
+            titulo = "Importación Completada"
+            mensaje = (f"{importacion.insertados:,} productos nuevos\n"
+                       f"{importacion.actualizados:,} actualizados\n"
+                       f"{importacion.errores:,} filas descartadas")
+            if importacion.estado == "cancelada":
+                titulo = "Importación Detenida"
+                mensaje += "\n\nElige el mismo archivo para continuar"
+        popup = Popup(
+            title=titulo,
+            content=Label(text=mensaje, text_size=(Window.width * 0.8, None), halign="center"),
+            size_hint=(0.9, 0.5)
+        )
+        popup.open()
+        
+        # Los productos importados llegan por el registro de cambios
+        self.refresh_products()
+    
+    def refresh_products(self):
+        """Aplica solo los productos agregados, editados o eliminados desde la última visita"""
+        if self.syncing:
+            return
+        if self.products_version is None:
+            self.load_products()
+            return
+        
+        app = App.get_running_app()
+        self.syncing = True
+        app.db_worker.submit(self.fetch_changes, app.db, self.products_version,
+                             on_result=self.apply_changes, on_error=self.on_sync_error)
+    
+    @classmethod
+    def fetch_changes(cls, db, desde):
+        """Hilo de la base de datos: cambios posteriores a la versión desde (None si no hay)"""
+        if db.get_version_productos() == desde:
+            return None
+        
+        version, productos, ids_eliminados = db.get_cambios_productos(desde)
+        db.compactar_cambios_productos(version)
+        return version, [cls.product_to_data(p) for p in productos], ids_eliminados
+    
+    @profiled("catalog.apply_changes")
+    def apply_changes(self, cambios):
+        self.syncing = False
+        if cambios is None:
+            return
+        
+        version, nuevos, ids_eliminados = cambios
+        data = self.products_data
+        # Sin filtros el RecycleView muestra el catálogo completo y se
+        # actualiza fila a fila junto con el modelo
+        vista = None if self.filtering else self.ids.products_rv.data
+        
+        # Con muchos cambios es más barato recargar todo
+        if len(nuevos) + len(ids_eliminados) > max(100, len(data) // 2):
+            self.load_products()
+            return
+        
+        for nuevo in nuevos:
+            posicion = self.products_index.get(nuevo["producto_id"])
+            if posicion is None:
+                self.products_index[nuevo["producto_id"]] = len(data)
+                data.append(nuevo)
+                if vista is not None:
+                    vista.append(nuevo)
+            else:
+                data[posicion] = nuevo
+                if vista is not None:
+                    vista[posicion] = nuevo
+        
+        if ids_eliminados:
+            for posicion in sorted((self.products_index[pid] for pid in ids_eliminados
+                                    if pid in self.products_index), reverse=True):
+                del data[posicion]
+                if vista is not None:
+                    del vista[posicion]
+            self.products_index = {d["producto_id"]: i for i, d in enumerate(data)}
+        
+        self.products_version = version
+        
+        # Las facetas (y los resultados filtrados) dependen de los cambios
+        self.apply_search()
+    
+    def trigger_search(self):
+        self.search_trigger()
+    
+    def select_category(self, texto):
+        # Los valores llevan el conteo de la faceta: "Sofá (12)" -> "Sofá"
+        categoria = self.FACET_COUNT.sub("", texto)
+        spinner = self.ids.category_spinner
+        if spinner.text != categoria:
+            spinner.text = categoria
+            return
+        self.trigger_search()
+    
+    def current_filters(self):
+        """Devuelve (texto, categoria, precio_min, precio_max) de los controles de búsqueda"""
+        texto = self.ids.search_input.text.strip()
+        categoria = self.ids.category_spinner.text
+        if categoria == self.ALL_CATEGORIES:
+            categoria = None
+        precio_min, precio_max = self.PRICE_RANGES.get(self.ids.price_spinner.text, (None, None))
+        return texto, categoria, precio_min, precio_max
+    
+    def apply_search(self, *args):
+        app = App.get_running_app()
+        filtros = self.current_filters()
+        texto, categoria, precio_min, precio_max = filtros
+        clave = (self.products_version, texto, precio_min, precio_max)
+        # Cada búsqueda lleva un número: si llega una respuesta vieja se descarta
+        self.search_token += 1
+        self.search_filters = filtros
+        self.search_cursor = None
+        self.loading_more = False
+        app.db_worker.submit(self.fetch_search, app.db, *filtros, self.facet_cache.get(clave),
+                             on_result=partial(self.on_search_result, self.search_token, clave))
+    
+    @classmethod
+    def fetch_search(cls, db, texto, categoria, precio_min, precio_max, facetas=None):
+        """Hilo de la base de datos: facetas (si no están en caché) y, con filtros, la primera página"""
+        if facetas is None:
+            facetas = db.get_facetas_categoria(texto, precio_min, precio_max)
+        
+        if not (texto or categoria or precio_min is not None or precio_max is not None):
+            return facetas, None, None
+        
+        productos, cursor = db.search_productos(texto, categoria, precio_min, precio_max,
+                                                limite=cls.SEARCH_PAGE)
+        return facetas, [cls.product_to_data(p) for p in productos], cursor
+    
+    @profiled("catalog.on_search_result")
+    def on_search_result(self, token, clave, resultado):
+        if token != self.search_token:
+            return
+        
+        facetas, data, self.search_cursor = resultado
+        self.facet_cache[clave] = facetas
+        self.facet_cache.move_to_end(clave)
+        if len(self.facet_cache) > self.FACET_CACHE:
+            self.facet_cache.popitem(last=False)
+        
+        self.category_values = [self.ALL_CATEGORIES] + [
+            f"{cat} ({total})" for cat, total in facetas if cat
+        ]
+        
+        if data is not None:
+            self.ids.products_rv.data = data
+            # El total sale de las facetas, que ya cuentan todas las coincidencias
+            categoria = self.search_filters[1]
+            self.search_total = sum(total for cat, total in facetas
+                                    if categoria is None or cat == categoria)
+        elif self.filtering:
+            # Se quitaron los filtros: volver al catálogo completo
+            self.ids.products_rv.data = self.products_data
+        self.filtering = data is not None
+        self.update_results_status()
+    
+    def load_more_results(self):
+        """Pide la página siguiente de los resultados filtrados"""
+        if not self.filtering or self.search_cursor is None or self.loading_more:
+            return
+        
+        app = App.get_running_app()
+        self.loading_more = True
+        app.db_worker.submit(self.fetch_more_results, app.db, self.search_filters,
+                             self.search_cursor,
+                             on_result=partial(self.on_more_results, self.search_token))
+    
+    @classmethod
+    def fetch_more_results(cls, db, filtros, cursor):
+        """Hilo de la base de datos: la página de resultados que sigue al cursor"""
+        productos, cursor = db.search_productos(*filtros, limite=cls.SEARCH_PAGE,
+                                                despues_de=cursor)
+        return [cls.product_to_data(p) for p in productos], cursor
+    
+    def on_more_results(self, token, resultado):
+        # Una búsqueda nueva deja sin efecto la página pedida para la anterior
+        if token != self.search_token:
+            return
+        
+        data, self.search_cursor = resultado
+        self.loading_more = False
+        self.ids.products_rv.data.extend(data)
+        self.update_results_status()
+    
+    def update_results_status(self):
+        self.has_more = self.filtering and self.search_cursor is not None
+        if self.filtering:
+            self.results_status = (f"{len(self.ids.products_rv.data):,} de "
+                                   f"{self.search_total:,} productos")
+        else:
+            self.results_status = ""
+    
+    @staticmethod
+    def product_to_data(producto):
+        """Convierte una fila de productos en los datos de un ProductCard"""
+        prod_id, nombre, categoria, precio, imagen, descripcion, stock = producto
+        descripcion = descripcion or ""
+        
+        return {
+            "producto_id": prod_id,
+            "imagen": imagen or "",
+            "nombre": nombre,
+            "precio": f"Precio: ${precio:,.2f}",
+            "stock": f"Stock: {stock} unidades",
+            "stock_color": (0.7,0.7,0.7,1) if stock > 0 else (1,0.3,0.3,1),
+            "descripcion": descripcion[:50] + "..." if len(descripcion) > 50 else descripcion
+        }
 
 class AssistantScreen(Screen):
     proposal_text = StringProperty("")
+    busy = BooleanProperty(False)
     current_style = ""
     
     def generate_proposal(self, style):
@@ -666,16 +4208,28 @@ class AssistantScreen(Screen):
         self.proposal_text = f"Propuesta para estilo {style}:\n\n{proposals.get(style, 'Estilo no disponible')}"
     
     def save_proposal(self):
-        if not self.current_style:
+        if not self.current_style or self.busy:
             return
         
         app = App.get_running_app()
-        usuario = app.db.get_usuario(app.username)
+        username = app.username
+        estilo = self.current_style
+        contenido = self.proposal_text
         
-        if usuario:
-            user_id = usuario[0]
-            app.db.guardar_propuesta(user_id, self.current_style, self.proposal_text)
-            
+        def guardar(db):
+            user_id = db.get_usuario_id(username)
+            if user_id:
+                db.guardar_propuesta(user_id, estilo, contenido)
+            return user_id
+        
+        self.busy = True
+        app.db_worker.submit(guardar, app.db,
+                             on_result=self.on_proposal_saved, on_error=self.on_db_error)
+    
+    def on_proposal_saved(self, user_id):
+        self.busy = False
+        
+        if user_id:
             popup = Popup(
                 title="Propuesta Guardada",
                 content=Label(text="La propuesta se ha guardado en tus proyectos"),
@@ -684,86 +4238,363 @@ class AssistantScreen(Screen):
             popup.open()
     
     def view_history(self):
+        if self.busy:
+            return
+        
         app = App.get_running_app()
-        usuario = app.db.get_usuario(app.username)
+        username = app.username
         
-        if usuario:
-            user_id = usuario[0]
-            proyectos = app.db.get_proyectos_usuario(user_id, "propuesta")
+        def listar(db):
+            user_id = db.get_usuario_id(username)
+            if not user_id:
+                return None
+            proyectos, _ = db.get_proyectos_pagina(user_id, "propuesta", limite=5)
+            return proyectos
+        
+        self.busy = True
+        app.db_worker.submit(listar, app.db,
+                             on_result=self.show_history, on_error=self.on_db_error)
+    
+    @profiled("assistant.show_history")
+    def show_history(self, proyectos):
+        self.busy = False
+        
+        if proyectos is None:
+            return
+        
+        if proyectos:
+            content = BoxLayout(orientation='vertical', spacing=10, padding=10)
+            scroll = ScrollView(size_hint=(1, 0.9))
+            grid = GridLayout(cols=1, size_hint_y=None, spacing=10)
+            grid.bind(minimum_height=grid.setter('height'))
             
-            if proyectos:
-                content = BoxLayout(orientation='vertical', spacing=10, padding=10)
-                scroll = ScrollView(size_hint=(1, 0.9))
-                grid = GridLayout(cols=1, size_hint_y=None, spacing=10)
-                grid.bind(minimum_height=grid.setter('height'))
+            for proyecto in proyectos:  # Últimas 5 propuestas
+                proj_id, user_id, nombre, tipo, datos, fecha = proyecto
                 
-                for proyecto in proyectos[:5]:  # Últimas 5 propuestas
-                    proj_id, user_id, nombre, tipo, datos, fecha = proyecto
-                    
-                    prop_box = BoxLayout(
-                        orientation='vertical',
-                        size_hint_y=None,
-                        height=100,
-                        spacing=5
-                    )
-                    
-                    prop_box.add_widget(Label(
-                        text=f"{nombre} - {fecha[:10]}",
-                        color=(1,1,1,1),
-                        font_size=16,
-                        bold=True,
-                        size_hint_y=None,
-                        height=30
-                    ))
-                    
-                    prop_box.add_widget(Label(
-                        text=datos[:80] + "..." if len(datos) > 80 else datos,
-                        color=(0.8,0.8,0.8,1),
-                        font_size=12,
-                        size_hint_y=None,
-                        height=60
-                    ))
-                    
-                    grid.add_widget(prop_box)
+                prop_box = BoxLayout(
+                    orientation='vertical',
+                    size_hint_y=None,
+                    height=100,
+                    spacing=5
+                )
                 
-                scroll.add_widget(grid)
-                content.add_widget(scroll)
+                prop_box.add_widget(Label(
+                    text=f"{nombre} - {fecha[:10]}",
+                    color=(1,1,1,1),
+                    font_size=16,
+                    bold=True,
+                    size_hint_y=None,
+                    height=30
+                ))
                 
-                popup = Popup(
-                    title="Historial de Propuestas",
-                    content=content,
-                    size_hint=(0.9, 0.8)
-                )
-                popup.open()
-            else:
-                popup = Popup(
-                    title="Sin Historial",
-                    content=Label(text="No hay propuestas guardadas"),
-                    size_hint=(0.6, 0.4)
-                )
-                popup.open()
+                prop_box.add_widget(Label(
+                    text=datos[:80] + "..." if len(datos) > 80 else datos,
+                    color=(0.8,0.8,0.8,1),
+                    font_size=12,
+                    size_hint_y=None,
+                    height=60
+                ))
+                
+                grid.add_widget(prop_box)
+            
+            scroll.add_widget(grid)
+            content.add_widget(scroll)
+            
+            popup = Popup(
+                title="Historial de Propuestas",
+                content=content,
+                size_hint=(0.9, 0.8)
+            )
+            popup.open()
+        else:
+            popup = Popup(
+                title="Sin Historial",
+                content=Label(text="No hay propuestas guardadas"),
+                size_hint=(0.6, 0.4)
+            )
+            popup.open()
+    
+    def on_db_error(self, error):
+        self.busy = False
+        show_db_error(error)
 
 class ARScreen(Screen):
-    current_scene = []
+    busy = BooleanProperty(False)
+    loading_scene = BooleanProperty(False)
+    can_undo = BooleanProperty(False)
+    can_redo = BooleanProperty(False)
     
-    def add_furniture(self, furniture_type):
-        mapping = {
-            "sofa": ("assets/sofa.png", (200, 150)),
-            "mesa": ("assets/mesa.png", (150, 150)),
-            "lampara": ("assets/lampara.png", (100, 150))
-        }
+    # Tipo de mueble: (imagen original, tamaño base en el área AR)
+    FURNITURE = {
+        "sofa": ("assets/sofa.png", (200, 150)),
+        "mesa": ("assets/mesa.png", (150, 150)),
+        "lampara": ("assets/lampara.png", (100, 150))
+    }
+    DEFAULT_IMAGE = "assets/default.png"
+    # Atlas generado con tools/build_atlas.py
+    SPRITE_ATLAS = "assets/muebles"
+    # Tiempo por frame dedicado a crear piezas al cargar una escena
+    SCENE_FRAME_BUDGET = 1 / 120
+    # A partir de estas piezas la escena se dibuja con SceneCanvas
+    DENSE_SCENE_THRESHOLD = 150
+    # Límites del historial de deshacer: comandos y memoria estimada
+    HISTORY_DEPTH = 100
+    HISTORY_BYTES = 1024 * 1024
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Fuente de imagen de cada tipo, resuelta una sola vez
+        self.sprite_sources = {}
+        self._atlas_sprites = None
+        self.scene_build_event = None
+        self.last_scene_stats = None
+        self.dense_mode = False
+        # Estado de la escena; los widgets solo la dibujan
+        self.scene = SceneModel()
+        # Ids de pieza: el registro de autoguardado se refiere a ellas por id
+        self.piece_ids = itertools.count(1)
+        self.pieces_by_id = {}
+        self.autosave = SceneAutosave(self.scene.items, self.scene.transform,
+                                      lambda: self.ids.ar_area.pos)
+        self.autosave_restored = False
+        self.history = CommandHistory(self.HISTORY_DEPTH, self.HISTORY_BYTES,
+                                      on_change=self.on_history_change)
+        # Gestos en curso: pieza -> [transformación inicial, toques], toque -> pieza
+        self._gestos = {}
+        self._toques_gesto = {}
+    
+    @profiled("ar.on_enter")
+    def on_enter(self):
+        self.restore_autosave()
+    
+    def restore_autosave(self, *args):
+        """Recupera una sola vez la copia de trabajo de la última sesión"""
+        if self.autosave_restored:
+            return
+        app = App.get_running_app()
+        if not app.user_loaded:
+            # El autoguardado es por usuario: hasta on_db_ready username
+            # es el valor por defecto y se leería la copia de otro
+            app.fbind("user_loaded", self.restore_autosave)
+            return
+        app.funbind("user_loaded", self.restore_autosave)
+        self.autosave_restored = True
+        if not len(self.scene):
+            self.autosave.restore(self.on_autosave_read)
+    
+    def on_autosave_read(self, items):
+        if not items or len(self.scene) or self.busy:
+            return
+        self.busy = True
+        self.loading_scene = True
+        self.build_scene(items, on_complete=self.on_autosave_restored)
+    
+    def on_autosave_restored(self, stats):
+        self.busy = False
+        self.loading_scene = False
+        # Las piezas reciben ids nuevos: la instantánea sustituye al registro anterior
+        self.autosave.compact()
+    
+    def atlas_sprites(self):
+        """Nombres de los sprites disponibles en el atlas de muebles"""
+        if self._atlas_sprites is None:
+            try:
+                with open(self.SPRITE_ATLAS + ".atlas") as f:
+                    paginas = json.load(f)
+                self._atlas_sprites = {nombre for pagina in paginas.values() for nombre in pagina}
+            except (OSError, ValueError):
+                self._atlas_sprites = set()
+        return self._atlas_sprites
+    
+    def resolve_sprite(self, furniture_type):
+        """Fuente de imagen de un mueble: sprite del atlas o, si falta, la imagen suelta"""
+        if furniture_type in self.sprite_sources:
+            return self.sprite_sources[furniture_type]
+        
+        path, size = self.FURNITURE[furniture_type]
+        sprites = self.atlas_sprites()
+        
+        if furniture_type in sprites:
+            fuente = f"atlas://{self.SPRITE_ATLAS}/{furniture_type}"
+        elif os.path.exists(path):
+            # Miniatura al doble del tamaño base para que el zoom no pixele
+            app = App.get_running_app()
+            fuente = app.thumbnails.get(path, size[0] * 2, size[1] * 2)
+        elif "default" in sprites:
+            fuente = f"atlas://{self.SPRITE_ATLAS}/default"
+        elif os.path.exists(self.DEFAULT_IMAGE):
+            fuente = self.DEFAULT_IMAGE
+        else:
+            fuente = None
         
-        if furniture_type not in mapping:
+        self.sprite_sources[furniture_type] = fuente
+        return fuente
+    
+    def add_furniture(self, furniture_type, position=None, rotation=0, scale=1):
+        """Agrega una pieza; sin position aparece en el centro del área"""
+        if furniture_type not in self.FURNITURE:
             return
         
-        path, size = mapping[furniture_type]
+        source = self.resolve_sprite(furniture_type)
+        if not source:
+            return
         
-        if not os.path.exists(path):
-            path = "assets/default.png"
-            if not os.path.exists(path):
-                return
+        x, y = position or self.ids.ar_area.center
+        pieza = (next(self.piece_ids), furniture_type, x, y, rotation, scale)
+        if self.insert_piece(*pieza):
+            self.history.push(AddPieceCommand(pieza))
+    
+    def insert_piece(self, piece_id, furniture_type, x, y, rotation, scale, index=None):
+        """Agrega una pieza con id conocido a la escena y al autoguardado.
         
-        area = self.ids.ar_area
+        Sin index queda encima de todas; con index, en esa posición del
+        orden de dibujo (0 es la de más abajo).
+        """
+        source = self.resolve_sprite(furniture_type)
+        if not source:
+            return False
+        
+        self.place_piece(furniture_type, source, (x, y), rotation, scale, piece_id, index)
+        self.scene.add(piece_id, furniture_type, x, y, rotation, scale, index)
+        self.autosave.record(("add", piece_id, furniture_type, x, y, rotation, scale, index))
+        return True
+    
+    def place_piece(self, furniture_type, source, position, rotation, scale, piece_id,
+                    index=None):
+        """Agrega la pieza al renderizador activo: Scatter o, en escenas densas, SceneCanvas"""
+        if self.dense_mode:
+            pieza = self.ids.ar_canvas.add_piece(furniture_type, source,
+                                                 self.FURNITURE[furniture_type][1],
+                                                 position, rotation, scale, piece_id, index)
+        else:
+            pieza = self.make_piece(furniture_type, source, position, rotation, scale)
+            pieza.piece_id = piece_id
+            pieza.bind(on_transform_with_touch=self.on_scatter_transform)
+            capa = self.ids.ar_pieces
+            # add_widget cuenta desde arriba: index 0 es la pieza dibujada la última
+            capa.add_widget(pieza, 0 if index is None else max(0, len(capa.children) - index))
+        self.pieces_by_id[piece_id] = pieza
+    
+    def on_scatter_transform(self, scatter, touch):
+        # Centro, escala y giro leídos de la matriz: las propiedades de
+        # Scatter invierten la transformación en cada lectura
+        m = scatter.transform.get()
+        ancho, alto = scatter.size
+        self.scene.move(
+            scatter.piece_id,
+            m[0] * ancho / 2 + m[4] * alto / 2 + m[12],
+            m[1] * ancho / 2 + m[5] * alto / 2 + m[13],
+            math.degrees(math.atan2(m[1], m[0])) % 360,
+            math.hypot(m[0], m[1])
+        )
+        self.on_piece_moved(scatter.piece_id)
+    
+    def on_canvas_piece_transform(self, pieza):
+        self.scene.move(pieza.id, pieza.x, pieza.y, pieza.rotation, pieza.scale)
+        self.on_piece_moved(pieza.id)
+    
+    def on_piece_moved(self, piece_id):
+        self.autosave.record(("move", piece_id))
+    
+    def piece_id_at(self, x, y):
+        """Id de la pieza visible más arriba en el punto (None si no hay)"""
+        pieza = self.ids.ar_canvas.piece_at(x, y)
+        if pieza is not None:
+            return pieza.id
+        for pieza in self.ids.ar_pieces.pieces_at(x, y):
+            if pieza.collide_point(x, y):
+                return pieza.piece_id
+        return None
+    
+    def set_piece_transform(self, piece_id, x, y, rotation, scale):
+        pieza = self.pieces_by_id.get(piece_id)
+        if pieza is None:
+            return
+        if isinstance(pieza, CanvasPiece):
+            self.ids.ar_canvas.move_piece(pieza, x, y, rotation, scale)
+        else:
+            pieza.transform = self.piece_matrix(pieza.size, (x, y), rotation, scale)
+        self.scene.move(piece_id, x, y, rotation, scale)
+        self.on_piece_moved(piece_id)
+    
+    def remove_piece(self, piece_id):
+        index = self.scene.index(piece_id)
+        pieza = self.delete_piece(piece_id)
+        if pieza is not None:
+            self.history.push(RemovePieceCommand(pieza, index))
+    
+    def delete_piece(self, piece_id):
+        """Quita la pieza de la escena; devuelve su tupla (id, tipo, x, y, rot, escala)"""
+        pieza = self.pieces_by_id.pop(piece_id, None)
+        if pieza is None:
+            return None
+        if isinstance(pieza, CanvasPiece):
+            self.ids.ar_canvas.remove_piece(pieza)
+        else:
+            for img in pieza.children:
+                if isinstance(img, CachedImage):
+                    img.release_texture()
+            self.ids.ar_pieces.remove_widget(pieza)
+        self.autosave.record(("remove", piece_id))
+        return self.scene.remove(piece_id)
+    
+    @profiled("ar.on_touch_down")
+    def on_touch_down(self, touch):
+        if self.ids.ar_area.collide_point(*touch.pos):
+            piece_id = self.piece_id_at(*touch.pos)
+            if piece_id is not None:
+                if touch.is_double_tap:
+                    self.remove_piece(piece_id)
+                    return True
+                self.begin_gesture(touch, piece_id)
+        return super().on_touch_down(touch)
+    
+    @profiled("ar.on_touch_up")
+    def on_touch_up(self, touch):
+        resultado = super().on_touch_up(touch)
+        self.end_gesture(touch)
+        return resultado
+    
+    def begin_gesture(self, touch, piece_id):
+        """Recuerda la transformación de la pieza al empezar a tocarla"""
+        # Las dos capas suben la pieza tocada
+        self.scene.bring_to_front(piece_id)
+        self.autosave.record(("front", piece_id))
+        gesto = self._gestos.get(piece_id)
+        if gesto is None:
+            gesto = self._gestos[piece_id] = [self.scene.transform(piece_id), 0]
+        gesto[1] += 1
+        self._toques_gesto[touch.uid] = piece_id
+    
+    def end_gesture(self, touch):
+        """Al levantar el último dedo, el gesto completo es un solo comando"""
+        piece_id = self._toques_gesto.pop(touch.uid, None)
+        if piece_id is None:
+            return
+        gesto = self._gestos[piece_id]
+        gesto[1] -= 1
+        if gesto[1]:
+            return
+        del self._gestos[piece_id]
+        despues = self.scene.transform(piece_id)
+        if despues is not None and despues != gesto[0]:
+            self.history.push(MovePieceCommand(piece_id, gesto[0], despues))
+    
+    def undo(self):
+        if not self.busy:
+            self.history.undo(self)
+    
+    def redo(self):
+        if not self.busy:
+            self.history.redo(self)
+    
+    def on_history_change(self):
+        self.can_undo = self.history.can_undo
+        self.can_redo = self.history.can_redo
+    
+    def make_piece(self, furniture_type, source, position, rotation, scale):
+        """Scatter de una pieza, todavía sin agregar al área"""
+        size = self.FURNITURE[furniture_type][1]
         
         scatter = Scatter(
             size_hint=(None, None), 
@@ -771,50 +4602,179 @@ class ARScreen(Screen):
             do_rotation=True,
             do_scale=True,
             do_translation=True,
-            auto_bring_to_front=True
+            # PieceLayer la sube al tocarla sin rehacer su entrada del índice
+            auto_bring_to_front=False
         )
+        scatter.furniture_type = furniture_type
         
-        img = Image(
-            source=path,
+        img = CachedImage(
+            cached_source=source,
             size=scatter.size,
             allow_stretch=True,
             keep_ratio=True
         )
         
         scatter.add_widget(img)
-        scatter.center = area.center
-        area.add_widget(scatter)
-        
-        # Guardar en la escena actual
-        self.current_scene.append({
-            "type": furniture_type,
-            "position": (scatter.center_x, scatter.center_y),
-            "rotation": scatter.rotation,
-            "scale": scatter.scale
-        })
+        scatter.transform = self.piece_matrix(size, position, rotation, scale)
+        return scatter
+    
+    @staticmethod
+    def piece_matrix(size, position, rotation, scale):
+        """Transformación de un Scatter centrado en position.
+        
+        Una sola matriz en lugar de asignar rotation, scale y center: cada
+        asignación recalcula la caja de la pieza varias veces.
+        """
+        ancho, alto = size
+        transform = Matrix().translate(-ancho / 2, -alto / 2, 0)
+        transform = Matrix().scale(scale, scale, scale).multiply(transform)
+        transform = Matrix().rotate(math.radians(rotation), 0, 0, 1).multiply(transform)
+        return Matrix().translate(position[0], position[1], 0).multiply(transform)
+    
+    def build_scene(self, items, on_complete=None, keep_ids=False):
+        """Crea las piezas de items repartidas en varios frames.
+        
+        Las fuentes se resuelven una vez por tipo y en cada frame se crean
+        piezas hasta agotar SCENE_FRAME_BUDGET segundos, así una escena
+        grande no congela la interfaz. on_complete(stats) recibe los tiempos.
+        Con keep_ids las piezas conservan el "id" de items (deshacer).
+        """
+        self.cancel_scene_build()
+        
+        fuentes = {}
+        for tipo in {item["type"] for item in items}:
+            fuente = self.resolve_sprite(tipo) if tipo in self.FURNITURE else None
+            if fuente:
+                fuentes[tipo] = fuente
+        pendientes = [item for item in items if item["type"] in fuentes]
+        if len(pendientes) + len(self.scene) >= self.DENSE_SCENE_THRESHOLD:
+            self.enter_dense_mode()
+        
+        stats = {"piezas": len(pendientes), "frames": 0, "total_ms": 0.0, "frame_max_ms": 0.0}
+        profiler = App.get_running_app().profiler
+        inicio_carga = time.perf_counter()
+        siguiente = 0
+        
+        def construir(dt):
+            nonlocal siguiente
+            inicio = time.perf_counter()
+            escena = self.scene
+            while siguiente < len(pendientes):
+                item = pendientes[siguiente]
+                siguiente += 1
+                piece_id = item["id"] if keep_ids else next(self.piece_ids)
+                self.place_piece(item["type"], fuentes[item["type"]],
+                                 item["position"], item["rotation"], item["scale"], piece_id)
+                escena.add(piece_id, item["type"], *item["position"],
+                           item["rotation"], item["scale"])
+                if time.perf_counter() - inicio >= self.SCENE_FRAME_BUDGET:
+                    break
+            
+            duracion = (time.perf_counter() - inicio) * 1000
+            profiler.record("scene.build_frame", duracion)
+            stats["frames"] += 1
+            stats["frame_max_ms"] = max(stats["frame_max_ms"], duracion)
+            if siguiente < len(pendientes):
+                self.scene_build_event = Clock.schedule_once(construir)
+                return
+            
+            self.scene_build_event = None
+            stats["total_ms"] = (time.perf_counter() - inicio_carga) * 1000
+            profiler.record("scene.build", stats["total_ms"])
+            Logger.info(
+                f"DercoR8: escena de {stats['piezas']} piezas en {stats['frames']} frames, "
+                f"{stats['total_ms']:.1f} ms (frame más largo {stats['frame_max_ms']:.1f} ms)"
+            )
+            self.last_scene_stats = stats
+            if on_complete:
+                on_complete(stats)
+        
+        # El primer lote va en este mismo frame
+        construir(0)
+    
+    def enter_dense_mode(self):
+        """Pasa a SceneCanvas, con las piezas Scatter que ya había.
+        
+        SceneCanvas dibuja encima de PieceLayer: si quedaran piezas en las dos
+        capas el orden de dibujo dejaría de ser el de la columna z.
+        """
+        if self.dense_mode:
+            return
+        self.dense_mode = True
+        capa = self.ids.ar_pieces
+        for piece_id, tipo, x, y, rotacion, escala in self.scene.pieces():
+            pieza = self.pieces_by_id[piece_id]
+            for img in pieza.children:
+                if isinstance(img, CachedImage):
+                    img.release_texture()
+            capa.remove_widget(pieza)
+            self.place_piece(tipo, self.resolve_sprite(tipo), (x, y), rotacion, escala, piece_id)
+    
+    def cancel_scene_build(self):
+        if self.scene_build_event is not None:
+            self.scene_build_event.cancel()
+            self.scene_build_event = None
+            self.loading_scene = False
+            self.busy = False
     
     def clear_scene(self):
-        area = self.ids.ar_area
-        for child in area.children[:]:
-            if isinstance(child, Scatter):
-                area.remove_widget(child)
-        self.current_scene = []
+        piezas = self.scene.pieces()
+        self.reset_scene()
+        if piezas:
+            self.history.push(ClearSceneCommand(piezas))
+    
+    def restore_pieces(self, piezas):
+        """Vuelve a crear piezas quitadas (deshacer Limpiar) con sus ids"""
+        items = [
+            {"id": piece_id, "type": tipo, "position": (x, y), "rotation": rotacion, "scale": escala}
+            for piece_id, tipo, x, y, rotacion, escala in piezas
+        ]
+        self.busy = True
+        self.build_scene(items, on_complete=self.on_pieces_restored, keep_ids=True)
+    
+    def on_pieces_restored(self, stats):
+        self.busy = False
+        self.autosave.compact()
     
+    def reset_scene(self):
+        """Quita todas las piezas (sin pasar por el historial)"""
+        self.cancel_scene_build()
+        capa = self.ids.ar_pieces
+        for child in capa.children[:]:
+            for img in child.children:
+                if isinstance(img, CachedImage):
+                    img.release_texture()
+        capa.clear_widgets()
+        self.ids.ar_canvas.clear()
+        self.dense_mode = False
+        self.scene.clear()
+        self.pieces_by_id = {}
+        self.autosave.record(("clear",))
+    
+    @profiled("scene.save")
     def save_scene(self):
-        if not self.current_scene:
+        if not len(self.scene) or self.busy:
             return
         
         app = App.get_running_app()
-        usuario = app.db.get_usuario(app.username)
+        username = app.username
+        scene_data = SceneCodec.encode(self.scene.items(), self.ids.ar_area.pos)
+        nombre = f"Escena AR {datetime.now().strftime('%d/%m %H:%M')}"
         
-        if usuario:
-            user_id = usuario[0]
-            
-            scene_data = json.dumps(self.current_scene)
-            nombre = f"Escena AR {datetime.now().strftime('%d/%m %H:%M')}"
-            
-            app.db.guardar_proyecto_ar(user_id, nombre, scene_data)
-            
+        def guardar(db):
+            user_id = db.get_usuario_id(username)
+            if user_id:
+                db.guardar_proyecto_ar(user_id, nombre, scene_data)
+            return user_id
+        
+        self.busy = True
+        app.db_worker.submit(guardar, app.db,
+                             on_result=self.on_scene_saved, on_error=self.on_db_error)
+    
+    def on_scene_saved(self, user_id):
+        self.busy = False
+        
+        if user_id:
             popup = Popup(
                 title="Escena Guardada",
                 content=Label(text="La escena se ha guardado en tus proyectos"),
@@ -823,71 +4783,115 @@ class ARScreen(Screen):
             popup.open()
     
     def load_scenes(self):
+        if self.busy:
+            return
+        
         app = App.get_running_app()
-        usuario = app.db.get_usuario(app.username)
+        username = app.username
         
-        if usuario:
-            user_id = usuario[0]
-            proyectos = app.db.get_proyectos_usuario(user_id, "ar")
+        def listar(db):
+            user_id = db.get_usuario_id(username)
+            if not user_id:
+                return None
+            proyectos, _ = db.listar_proyectos(user_id, "ar", limite=5)
+            return proyectos
+        
+        self.busy = True
+        app.db_worker.submit(listar, app.db,
+                             on_result=self.show_scenes, on_error=self.on_db_error)
+    
+    def show_scenes(self, proyectos):
+        self.busy = False
+        
+        if proyectos is None:
+            return
+        
+        if proyectos:
+            content = BoxLayout(orientation='vertical', spacing=10, padding=10)
+            scroll = ScrollView(size_hint=(1, 0.9))
+            grid = GridLayout(cols=1, size_hint_y=None, spacing=10)
+            grid.bind(minimum_height=grid.setter('height'))
             
-            if proyectos:
-                content = BoxLayout(orientation='vertical', spacing=10, padding=10)
-                scroll = ScrollView(size_hint=(1, 0.9))
-                grid = GridLayout(cols=1, size_hint_y=None, spacing=10)
-                grid.bind(minimum_height=grid.setter('height'))
-                
-                for proyecto in proyectos[:5]:  # Últimas 5 escenas
-                    proj_id, user_id, nombre, tipo, datos, fecha = proyecto
-                    
-                    btn = Button(
-                        text=f"{nombre} - {fecha[:10]}",
-                        size_hint_y=None,
-                        height=50,
-                        background_color=(0.2, 0.5, 0.7, 1)
-                    )
-                    btn.bind(on_release=lambda instance, d=datos: self.load_scene_data(d))
-                    grid.add_widget(btn)
-                
-                scroll.add_widget(grid)
-                content.add_widget(scroll)
-                
-                popup = Popup(
-                    title="Seleccionar Escena",
-                    content=content,
-                    size_hint=(0.9, 0.8)
-                )
-                popup.open()
-            else:
-                popup = Popup(
-                    title="Sin Escenas",
-                    content=Label(text="No hay escenas AR guardadas"),
-                    size_hint=(0.6, 0.4)
+            for proyecto in proyectos:  # Últimas 5 escenas
+                btn = Button(
+                    text=f"{proyecto.nombre} - {proyecto.fecha[:10]}",
+                    size_hint_y=None,
+                    height=50,
+                    background_color=(0.2, 0.5, 0.7, 1)
                 )
-                popup.open()
-    
-    def load_scene_data(self, scene_data):
-        try:
-            data = json.loads(scene_data)
-            self.clear_scene()
+                btn.bind(on_release=lambda instance, p=proyecto.id: self.open_scene(p))
+                grid.add_widget(btn)
             
-            for item in data:
-                self.add_furniture(item["type"])
+            scroll.add_widget(grid)
+            content.add_widget(scroll)
             
             popup = Popup(
-                title="Escena Cargada",
-                content=Label(text="Escena cargada correctamente"),
+                title="Seleccionar Escena",
+                content=content,
+                size_hint=(0.9, 0.8)
+            )
+            popup.open()
+        else:
+            popup = Popup(
+                title="Sin Escenas",
+                content=Label(text="No hay escenas AR guardadas"),
                 size_hint=(0.6, 0.4)
             )
             popup.open()
+    
+    def open_scene(self, proyecto_id):
+        # Los datos de la escena solo se leen al abrirla
+        app = App.get_running_app()
+        self.busy = True
+        app.db_worker.submit(app.db.get_datos_proyecto, proyecto_id,
+                             on_result=self.on_scene_data, on_error=self.on_db_error)
+    
+    def on_scene_data(self, scene_data):
+        self.busy = False
+        self.load_scene_data(scene_data)
+    
+    def on_db_error(self, error):
+        self.busy = False
+        show_db_error(error)
+    
+    @profiled("scene.load")
+    def load_scene_data(self, scene_data):
+        try:
+            data = SceneCodec.decode(scene_data, self.ids.ar_area.pos)
+            # Una escena abierta empieza con el historial vacío
+            self.reset_scene()
+            self.history.clear()
+            self.busy = True
+            self.loading_scene = True
+            self.build_scene(data, on_complete=self.on_scene_built)
         except:
+            self.cancel_scene_build()
+            self.busy = False
+            self.loading_scene = False
             popup = Popup(
                 title="Error",
                 content=Label(text="Error al cargar la escena"),
                 size_hint=(0.6, 0.4)
             )
             popup.open()
+    
+    def on_scene_built(self, stats):
+        self.busy = False
+        self.loading_scene = False
+        self.autosave.compact()
+        
+        popup = Popup(
+            title="Escena Cargada",
+            content=Label(text="Escena cargada correctamente"),
+            size_hint=(0.6, 0.4)
+        )
+        popup.open()
 
 class ProfileScreen(Screen):
+    busy = BooleanProperty(False)
+    projects_token = 0
+    
+    @profiled("profile.on_enter")
     def on_enter(self):
         self.load_profile()
     
@@ -896,111 +4900,393 @@ class ProfileScreen(Screen):
         self.ids.username_input.text = app.username
         self.load_projects()
     
+    @profiled("profile.load_projects")
     def load_projects(self):
         app = App.get_running_app()
         grid = self.ids.projects_grid
         grid.clear_widgets()
+        self.projects_cursor = None
         
-        usuario = app.db.get_usuario(app.username)
-        if usuario:
-            user_id = usuario[0]
-            proyectos = app.db.get_proyectos_usuario(user_id)
+        grid.add_widget(Label(
+            text="Cargando proyectos...",
+            color=(0.7,0.7,0.7,1),
+            font_size=14,
+            size_hint_y=None,
+            height=40
+        ))
+        
+        username = app.username
+        
+        def listar(db):
+            user_id = db.get_usuario_id(username)
+            if not user_id:
+                return None, [], None
+            return (user_id,) + db.listar_proyectos(user_id)
+        
+        # Solo se muestra la respuesta de la última carga pedida
+        self.projects_token += 1
+        app.db_worker.submit(listar, app.db,
+                             on_result=partial(self.show_projects, self.projects_token),
+                             on_error=show_db_error)
+    
+    @profiled("profile.show_projects")
+    def show_projects(self, token, resultado):
+        if token != self.projects_token:
+            return
+        
+        grid = self.ids.projects_grid
+        grid.clear_widgets()
+        
+        user_id, proyectos, self.projects_cursor = resultado
+        if user_id is None:
+            return
+        
+        self.projects_user_id = user_id
+        if proyectos:
+            self.add_project_rows(proyectos)
+        else:
+            grid.add_widget(Label(
+                text="No hay proyectos guardados",
+                color=(0.7,0.7,0.7,1),
+                font_size=14,
+                size_hint_y=None,
+                height=40
+            ))
+    
+    def load_more_projects(self, *args):
+        if not self.projects_cursor:
+            return
+        
+        app = App.get_running_app()
+        self.more_button.disabled = True
+        self.more_button.text = "Cargando..."
+        self.projects_token += 1
+        app.db_worker.submit(app.db.listar_proyectos, self.projects_user_id,
+                             despues_de=self.projects_cursor,
+                             on_result=partial(self.show_more_projects, self.projects_token),
+                             on_error=show_db_error)
+    
+    def show_more_projects(self, token, resultado):
+        if token != self.projects_token:
+            return
+        
+        proyectos, self.projects_cursor = resultado
+        self.add_project_rows(proyectos)
+    
+    @profiled("profile.add_project_rows")
+    def add_project_rows(self, proyectos):
+        grid = self.ids.projects_grid
+        
+        # Quitar el botón "Ver más" de la página anterior
+        if getattr(self, "more_button", None) in grid.children:
+            grid.remove_widget(self.more_button)
+        
+        for proyecto in proyectos:  # Página de 10 proyectos
+            project_box = BoxLayout(
+                orientation='horizontal',
+                size_hint_y=None,
+                height=60,
+                spacing=5
+            )
             
-            if proyectos:
-                for proyecto in proyectos[:10]:  # Últimos 10 proyectos
-                    proj_id, user_id, nombre, tipo, datos, fecha = proyecto
-                    
-                    project_box = BoxLayout(
-                        orientation='horizontal',
-                        size_hint_y=None,
-                        height=60,
-                        spacing=5
-                    )
-                    
-                    project_box.add_widget(Label(
-                        text=f"{nombre} ({tipo})",
-                        color=(1,1,1,1),
-                        font_size=14,
-                        size_hint_x=0.7,
-                        halign='left'
-                    ))
-                    
-                    project_box.add_widget(Label(
-                        text=fecha[:10],
-                        color=(0.7,0.7,0.7,1),
-                        font_size=12,
-                        size_hint_x=0.3,
-                        halign='right'
-                    ))
-                    
-                    grid.add_widget(project_box)
-            else:
-                grid.add_widget(Label(
-                    text="No hay proyectos guardados",
-                    color=(0.7,0.7,0.7,1),
-                    font_size=14,
-                    size_hint_y=None,
-                    height=40
-                ))
+            project_box.add_widget(Label(
+                text=f"{proyecto.nombre} ({proyecto.tipo})",
+                color=(1,1,1,1),
+                font_size=14,
+                size_hint_x=0.7,
+                halign='left'
+            ))
+            
+            project_box.add_widget(Label(
+                text=proyecto.fecha[:10],
+                color=(0.7,0.7,0.7,1),
+                font_size=12,
+                size_hint_x=0.3,
+                halign='right'
+            ))
+            
+            grid.add_widget(project_box)
+        
+        if self.projects_cursor:
+            self.more_button = Button(
+                text="Ver más",
+                size_hint_y=None,
+                height=40,
+                background_color=(0.2, 0.5, 0.7, 1)
+            )
+            self.more_button.bind(on_release=self.load_more_projects)
+            grid.add_widget(self.more_button)
     
     def save_profile(self):
         app = App.get_running_app()
         new_username = self.ids.username_input.text.strip()
         
-        if new_username and new_username != app.username:
-            if app.db.update_usuario(app.username, new_username):
-                app.username = new_username
-                popup = Popup(
-                    title="Perfil Actualizado",
-                    content=Label(text="Nombre de usuario actualizado"),
-                    size_hint=(0.6, 0.4)
-                )
-                popup.open()
+        if new_username and new_username != app.username and not self.busy:
+            self.busy = True
+            app.db_worker.submit(app.db.update_usuario, app.username, new_username,
+                                 on_result=lambda ok: self.on_profile_saved(ok, new_username),
+                                 on_error=self.on_db_error)
+    
+    def on_profile_saved(self, actualizado, new_username):
+        self.busy = False
+        
+        if actualizado:
+            app = App.get_running_app()
+            app.username = new_username
+            popup = Popup(
+                title="Perfil Actualizado",
+                content=Label(text="Nombre de usuario actualizado"),
+                size_hint=(0.6, 0.4)
+            )
+            popup.open()
     
     def delete_projects(self):
+        if self.busy:
+            return
+        
         app = App.get_running_app()
-        usuario = app.db.get_usuario(app.username)
+        username = app.username
         
-        if usuario:
-            user_id = usuario[0]
-            proyectos = app.db.get_proyectos_usuario(user_id)
-            
-            if proyectos:
-                # Eliminar todos los proyectos
-                for proyecto in proyectos:
-                    app.db.eliminar_proyecto(proyecto[0])
-                
-                popup = Popup(
-                    title="Proyectos Eliminados",
-                    content=Label(text="Todos los proyectos han sido eliminados"),
-                    size_hint=(0.6, 0.4)
-                )
-                popup.open()
-                self.load_projects()
-            else:
-                popup = Popup(
-                    title="Sin Proyectos",
-                    content=Label(text="No hay proyectos para eliminar"),
-                    size_hint=(0.6, 0.4)
-                )
-                popup.open()
+        def eliminar(db):
+            user_id = db.get_usuario_id(username)
+            if not user_id:
+                return None
+            # Eliminar todos los proyectos en una sola transacción
+            return db.eliminar_proyectos_usuario(user_id)
+        
+        self.busy = True
+        app.db_worker.submit(eliminar, app.db,
+                             on_result=self.on_projects_deleted, on_error=self.on_db_error)
+    
+    def on_projects_deleted(self, eliminados):
+        self.busy = False
+        
+        if eliminados is None:
+            return
+        
+        if eliminados:
+            popup = Popup(
+                title="Proyectos Eliminados",
+                content=Label(text=f"Se eliminaron {eliminados} proyectos"),
+                size_hint=(0.6, 0.4)
+            )
+            popup.open()
+            self.load_projects()
+        else:
+            popup = Popup(
+                title="Sin Proyectos",
+                content=Label(text="No hay proyectos para eliminar"),
+                size_hint=(0.6, 0.4)
+            )
+            popup.open()
+    
+    def on_db_error(self, error):
+        self.busy = False
+        show_db_error(error)
+
+class DebugScreen(Screen):
+    """Pantalla oculta con los tiempos del Profiler, los frames y el informe de arranque"""
+    report = StringProperty("")
+    profiling = BooleanProperty(False)
+    monitoring = BooleanProperty(False)
+    overlay = BooleanProperty(False)
+    
+    def on_enter(self):
+        self.refresh()
+    
+    def toggle_profiling(self):
+        app = App.get_running_app()
+        profiler = app.profiler
+        if profiler.enabled:
+            profiler.disable()
+        else:
+            profiler.enable()
+        # La elección del usuario manda sobre la del monitor de frames
+        app.frame_monitor.release_profiler()
+        self.refresh()
+    
+    def toggle_monitor(self):
+        app = App.get_running_app()
+        if app.frame_monitor.enabled:
+            if app.frame_overlay is not None:
+                app.toggle_frame_overlay()
+            app.frame_monitor.disable()
+        else:
+            app.frame_monitor.enable()
+        self.refresh()
+    
+    def toggle_overlay(self):
+        App.get_running_app().toggle_frame_overlay()
+        self.refresh()
+    
+    def clear_samples(self):
+        app = App.get_running_app()
+        app.profiler.clear()
+        app.frame_monitor.clear()
+        self.refresh()
+    
+    def refresh(self):
+        app = App.get_running_app()
+        self.profiling = app.profiler.enabled
+        self.monitoring = app.frame_monitor.enabled
+        self.overlay = app.frame_overlay is not None
+        lineas = ["Arranque (ms desde el inicio)"]
+        for clave, valor in app.startup_report.items():
+            lineas.append(f"  {clave:<26}{valor:9.1f}")
+        lineas.append("")
+        lineas.append(f"Texturas  {app.textures.stats()}")
+        lineas.append("")
+        # Etiqueta y cifras en líneas separadas: la pantalla es estrecha
+        lineas.append(f"ms  {'n':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>9}")
+        for label, datos in app.profiler.summary().items():
+            lineas.append(label)
+            lineas.append(f"    {datos['n']:>5}{datos['p50']:9.2f}{datos['p95']:9.2f}"
+                          f"{datos['p99']:9.2f}{datos['max']:9.2f}")
+        if not app.profiler.enabled:
+            lineas.append("(perfilado desactivado)")
+        lineas.append("")
+        lineas.extend(self.frame_lines(app.frame_monitor))
+        self.report = "\n".join(lineas)
+    
+    @staticmethod
+    def frame_lines(monitor):
+        resumen = monitor.summary()
+        lineas = [f"Frames (presupuesto {resumen['budget_ms']:.1f} ms)"]
+        if not resumen["frames"]:
+            lineas.append("  sin frames medidos" if monitor.enabled else "  (monitor desactivado)")
+            return lineas
+        lineas.append(f"  {'n':>5}{'fps':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'máx':>8}")
+        lineas.append(f"  {resumen['frames']:>5}{resumen['fps']:7.1f}{resumen['p50']:8.1f}"
+                      f"{resumen['p95']:8.1f}{resumen['p99']:8.1f}{resumen['max']:8.1f}")
+        lineas.append(f"  largos (> {monitor.threshold_ms:.1f} ms): {resumen['long']} "
+                      f"({resumen['long_pct']:.1f} %)")
+        for label, datos in resumen["causes"].items():
+            lineas.append(f"  {label}")
+            lineas.append(f"    {datos['n']:>5} frames  total {datos['total_ms']:8.1f}  "
+                          f"máx {datos['max_ms']:7.1f}")
+        if monitor.long_frames:
+            lineas.append("Últimos frames largos")
+            for frame in reversed(monitor.long_frames):
+                causas = ", ".join(label if ms is None else f"{label} {ms:.1f}"
+                                   for label, ms in frame["causas"])
+                lineas.append(f"  {frame['hora']} {frame['ms']:6.1f} ms  {causas}")
+        return lineas
+    
+    def export_report(self):
+        app = App.get_running_app()
+        ruta = os.path.join(app.user_data_dir,
+                            f"perfil-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        try:
+            app.profiler.export(ruta, {"arranque": app.startup_report,
+                                       "texturas": app.textures.stats(),
+                                       "frames": app.frame_monitor.summary(),
+                                       "frames_largos": list(app.frame_monitor.long_frames)})
+            mensaje = f"Informe guardado en\n{ruta}"
+        except OSError as error:
+            Logger.error(f"DercoR8: no se pudo exportar el perfil: {error!r}")
+            mensaje = "No se pudo guardar el informe"
+        popup = Popup(
+            title="Exportar Rendimiento",
+            content=Label(text=mensaje, text_size=(Window.width * 0.8, None), halign="center"),
+            size_hint=(0.9, 0.4)
+        )
+        popup.open()
 
 # Aplicación principal
 class DercoR8App(App):
     username = StringProperty("Usuario")
+    # True cuando la base de datos está inicializada y username ya es el guardado
+    user_loaded = BooleanProperty(False)
+    # Memoria máxima para texturas sin uso antes de empezar a descartarlas
+    texture_budget = 48 * 1024 * 1024
+    # Segundos tras el primer frame antes de precargar las demás pantallas
+    prewarm_delay = 1.0
     
     def build(self):
+        self.startup_report = {"imports_ms": (time.perf_counter() - ARRANQUE) * 1000}
         self.title = "DercoR8 - Diseño de Interiores"
+        self.setup_profiler()
+        self.thumbnails = ThumbnailCache(os.path.join(self.user_data_dir, "miniaturas"))
+        self.textures = TextureCache(self.texture_budget)
+        self.image_loader = AsyncImageLoader(self.textures, self.thumbnails)
+        # Importación de catálogo en curso (CatalogScreen la inicia)
+        self.catalog_import = None
         
-        # Inicializar base de datos
-        self.db = Database()
+        # La base de datos se inicializa en su hilo: migraciones y datos de
+        # ejemplo no retrasan el primer frame. El hilo es uno solo, así que
+        # toda consulta encolada después corre detrás de la inicialización
+        self.db = Database(initialize=False)
+        self.db_worker = DBWorker()
+        self.db_worker.submit(self.init_db, self.db,
+                              on_result=self.on_db_ready, on_error=show_db_error)
         
+        root = Builder.load_string(KV)
+        self.setup_frame_monitor(root)
+        self.startup_report["build_ms"] = (time.perf_counter() - ARRANQUE) * 1000
+        Window.bind(on_flip=self.on_first_frame)
+        return root
+    
+    def setup_profiler(self):
+        """Profiler apagado salvo con DERCOR8_PROFILE=1 (o desde la pantalla oculta)"""
+        self.profiler = Profiler()
+        self.profiler.register(Database, prefix="db")
+        for cls in (LazyScreenManager, CatalogScreen, AssistantScreen, ARScreen,
+                    ProfileScreen):
+            self.profiler.register(cls)
+        if os.environ.get("DERCOR8_PROFILE") == "1":
+            self.profiler.enable()
+    
+    def setup_frame_monitor(self, root):
+        """Monitor de frames apagado salvo con DERCOR8_FRAMES=1 (=overlay lo muestra en pantalla)"""
+        self.frame_monitor = FrameMonitor(self.profiler)
+        self.frame_monitor.watch(root)
+        self.frame_overlay = None
+        modo = os.environ.get("DERCOR8_FRAMES")
+        if modo in ("1", "overlay"):
+            self.frame_monitor.enable()
+        if modo == "overlay":
+            self.toggle_frame_overlay()
+    
+    def toggle_frame_overlay(self):
+        """Muestra u oculta el overlay; mostrarlo activa el monitor"""
+        if self.frame_overlay is None:
+            self.frame_monitor.enable()
+            self.frame_overlay = FrameOverlay(self.frame_monitor)
+            self.frame_overlay.show()
+        else:
+            self.frame_overlay.hide()
+            self.frame_overlay = None
+    
+    @staticmethod
+    def init_db(db):
+        inicio = time.perf_counter()
+        db.initialize()
         # Obtener usuario actual
-        usuario = self.db.get_usuario()
+        return db.get_usuario(), (time.perf_counter() - inicio) * 1000
+    
+    def on_db_ready(self, resultado):
+        usuario, duracion = resultado
         if usuario:
             self.username = usuario[1]
-        
-        return Builder.load_string(KV)
+        self.user_loaded = True
+        self.startup_report["db_init_ms"] = duracion
+        self.startup_report["db_ready_ms"] = (time.perf_counter() - ARRANQUE) * 1000
+        self.profiler.record("startup.db_init", duracion)
+    
+    def on_first_frame(self, *args):
+        Window.unbind(on_flip=self.on_first_frame)
+        self.startup_report["first_frame_ms"] = (time.perf_counter() - ARRANQUE) * 1000
+        informe = self.startup_report
+        self.profiler.record("startup.first_frame", informe["first_frame_ms"])
+        Logger.info(
+            f"DercoR8: primer frame a los {informe['first_frame_ms']:.0f} ms "
+            f"(imports {informe['imports_ms']:.0f} ms, build {informe['build_ms']:.0f} ms)"
+        )
+        # Primer arranque: la miniatura del logo se genera después del primer frame
+        home = self.root.built_screen("home")
+        if home is not None:
+            home.request_logo()
+        Clock.schedule_once(self.root.prewarm, self.prewarm_delay)
     
     def on_start(self):
         # Crear carpetas necesarias
@@ -1010,6 +5296,36 @@ class DercoR8App(App):
             os.makedirs("data")
         
         print("Aplicación DercoR8 iniciada")
+    
+    def on_pause(self):
+        # Android puede terminar la app en segundo plano sin avisar
+        ar = self.root.built_screen("ar_view") if self.root else None
+        if ar:
+            ar.autosave.flush()
+        return True
+    
+    def on_resume(self):
+        # El tiempo en segundo plano no es un frame largo
+        self.frame_monitor.skip_frame()
+    
+    def on_stop(self):
+        if getattr(self, "image_loader", None):
+            self.image_loader.shutdown()
+        if getattr(self, "catalog_import", None):
+            # Termina el bloque en curso, que queda como punto de control
+            self.catalog_import.cancel()
+            self.catalog_import.join()
+        # Terminar el hilo de consultas antes de cerrar las conexiones
+        if self.root:
+            self.root.cancel_prewarm()
+        if getattr(self, "db_worker", None):
+            self.db_worker.shutdown()
+        if getattr(self, "db", None):
+            # Lo que el hilo de consultas no llegó a escribir del autoguardado
+            ar = self.root.built_screen("ar_view") if self.root else None
+            if ar:
+                ar.autosave.flush_now(self.db)
+            self.db.close()
 
 if __name__ == "__main__":
     DercoR8App().run()
\ No newline at end of file
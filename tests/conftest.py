@@ -0,0 +1,14 @@
+"""Configuración común: main.py importa Kivy y crea la ventana al cargarse.
+
+Las pruebas corren sin pantalla ni GPU (ventana offscreen de SDL y
+backend GL simulado), igual que benchmarks/bench_suite.py.
+"""
+import os
+import sys
+
+os.environ.setdefault("KIVY_GL_BACKEND", "mock")
+os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
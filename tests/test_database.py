@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from main import ConnectionPool, Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(os.path.join(tmp_path, "test.db"))
+    yield database
+    database.close()
+
+
+def test_pool_cerrado_no_presta_conexiones_cerradas(tmp_path):
+    pool = ConnectionPool(os.path.join(tmp_path, "pool.db"), size=2)
+    with pool.connection() as conn:
+        conn.execute("SELECT 1")
+    
+    with pool.connection() as prestada:
+        pool.close()
+        # La conexión prestada sigue siendo usable hasta devolverla
+        prestada.execute("SELECT 1")
+    
+    assert pool._libres.get_nowait() is None
+    assert pool._todas == []
+    with pytest.raises(sqlite3.ProgrammingError):
+        prestada.execute("SELECT 1")
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.connection():
+            pass
+
+
+def test_pool_cerrado_despierta_a_quien_espera(tmp_path):
+    pool = ConnectionPool(os.path.join(tmp_path, "pool.db"), size=1)
+    errores = []
+    
+    def esperar():
+        try:
+            with pool.connection():
+                pass
+        except sqlite3.ProgrammingError as error:
+            errores.append(error)
+    
+    with pool.connection():
+        hilo = threading.Thread(target=esperar)
+        hilo.start()
+        hilo.join(0.2)
+        pool.close()
+    hilo.join(5)
+    
+    assert not hilo.is_alive()
+    assert len(errores) == 1
+
+
+def sembrar_proyectos(db, user_id, cantidad):
+    with db.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO proyectos (user_id, nombre, tipo, datos, fecha) VALUES (?, ?, ?, ?, ?)",
+            [(user_id, f"Proyecto {i}", "ar" if i % 2 else "propuesta", "",
+              f"2024-01-{1 + i % 28:02d} {i % 24:02d}:00:00") for i in range(cantidad)]
+        )
+
+
+@pytest.mark.parametrize("tipo", [None, "ar"])
+def test_pagina_profunda_entra_en_el_indice_por_fecha(db, tipo):
+    user_id = db.get_usuario_id()
+    sembrar_proyectos(db, user_id, 2000)
+    with db.pool.transaction() as conn:
+        conn.execute("ANALYZE")
+    
+    sql, params = db._consulta_pagina("id, nombre, tipo, fecha", user_id, tipo, 10,
+                                      ("2024-01-05 03:00:00", 500))
+    with db.pool.connection() as conn:
+        plan = " ".join(fila[-1] for fila in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    
+    assert "SEARCH" in plan
+    assert "fecha<?" in plan.replace(" ", "")
+
+
+def test_paginas_recorren_todos_los_proyectos_en_orden(db):
+    user_id = db.get_usuario_id()
+    sembrar_proyectos(db, user_id, 95)
+    
+    vistos, cursor = [], None
+    while True:
+        pagina, cursor = db.listar_proyectos(user_id, limite=10, despues_de=cursor)
+        vistos.extend(pagina)
+        if cursor is None:
+            break
+    
+    assert len(vistos) == 95
+    assert len({p.id for p in vistos}) == 95
+    claves = [(p.fecha, p.id) for p in vistos]
+    assert claves == sorted(claves, reverse=True)
+
+
+def sembrar_productos(db, cantidad):
+    with db.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO productos (nombre, categoria, precio, imagen, descripcion, stock) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(f"Mesa {i}", "Mesa" if i % 3 else "Silla", 100 + i, "", "roble", 1)
+             for i in range(cantidad)]
+        )
+
+
+@pytest.mark.parametrize("texto", ["", "mesa"])
+def test_busqueda_paginada_con_cursor(db, texto):
+    sembrar_productos(db, 250)
+    esperados = [fila[0] for fila in db.search_productos(texto, "Mesa", limite=1000)[0]]
+    
+    vistos, cursor = [], None
+    while True:
+        productos, cursor = db.search_productos(texto, "Mesa", limite=40, despues_de=cursor)
+        vistos.extend(fila[0] for fila in productos)
+        if cursor is None:
+            break
+        assert len(productos) == 40
+    
+    assert vistos == esperados
+    facetas = dict(db.get_facetas_categoria(texto))
+    assert len(vistos) == facetas["Mesa"]
@@ -0,0 +1,204 @@
+import os
+
+import pytest
+from kivy.base import EventLoop
+from kivy.uix.screenmanager import NoTransition
+
+from main import DercoR8App, SceneCodec, SceneModel
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def ar(tmp_path_factory):
+    # La app usa rutas relativas (data/, assets/): corre en una carpeta temporal
+    carpeta = tmp_path_factory.mktemp("app")
+    os.symlink(os.path.join(RAIZ, "assets"), os.path.join(carpeta, "assets"))
+    anterior = os.getcwd()
+    os.chdir(carpeta)
+    app = DercoR8App()
+    app._run_prepare()
+    app.root.transition = NoTransition()
+    app.root.current = "ar_view"
+    for _ in range(3):
+        EventLoop.idle()
+    yield app.root.get_screen("ar_view")
+    app.stop()
+    os.chdir(anterior)
+
+
+def ids_en_orden(ar):
+    return [pieza[0] for pieza in ar.scene.pieces()]
+
+
+class Toque:
+    def __init__(self, uid):
+        self.uid = uid
+
+
+def tocar(ar, piece_id, desplazamiento=None):
+    """Gesto de un dedo sobre la pieza, arrastrándola si hay desplazamiento"""
+    toque = Toque(piece_id)
+    ar.begin_gesture(toque, piece_id)
+    if desplazamiento:
+        x, y, rotacion, escala = ar.scene.transform(piece_id)
+        ar.set_piece_transform(piece_id, x + desplazamiento[0], y + desplazamiento[1],
+                               rotacion, escala)
+    ar.end_gesture(toque)
+
+
+def test_modelo_inserta_en_la_posicion_pedida():
+    escena = SceneModel()
+    for piece_id in (1, 2, 3):
+        escena.add(piece_id, "sofa", 0, 0)
+    escena.remove(2)
+    escena.add(2, "sofa", 0, 0, index=1)
+    
+    assert [pieza[0] for pieza in escena.pieces()] == [1, 2, 3]
+    assert [escena.index(piece_id) for piece_id in (1, 2, 3)] == [0, 1, 2]
+    escena.add(4, "mesa", 0, 0)
+    assert escena.index(4) == 3
+
+
+@pytest.mark.parametrize("densa", [False, True])
+def test_deshacer_borrado_devuelve_la_pieza_a_su_sitio(ar, densa):
+    ar.reset_scene()
+    ar.dense_mode = densa
+    for tipo in ("sofa", "mesa", "lampara"):
+        ar.add_furniture(tipo)
+    abajo, medio, arriba = ids_en_orden(ar)
+    
+    ar.remove_piece(medio)
+    ar.undo()
+    
+    assert ids_en_orden(ar) == [abajo, medio, arriba]
+    # Todas en el mismo punto: la de arriba sigue siendo la que recibe el toque
+    assert ar.piece_id_at(*ar.ids.ar_area.center) == arriba
+    if densa:
+        lienzo = ar.ids.ar_canvas
+        grupos = [lienzo.pieces[piece_id].group for piece_id in (abajo, medio, arriba)]
+        assert [lienzo.canvas.indexof(grupo) for grupo in grupos] == sorted(
+            lienzo.canvas.indexof(grupo) for grupo in grupos)
+    else:
+        dibujadas = [pieza.piece_id for pieza in reversed(ar.ids.ar_pieces.children)]
+        assert dibujadas == [abajo, medio, arriba]
+    
+    ar.redo()
+    assert ids_en_orden(ar) == [abajo, arriba]
+
+
+def test_autoguardado_espera_al_usuario_de_la_base_de_datos(ar):
+    app = DercoR8App.get_running_app()
+    ar.reset_scene()
+    ar.autosave_restored = False
+    app.user_loaded = False
+    
+    ar.restore_autosave()
+    ar.autosave.flush()
+    assert not ar.autosave_restored
+    assert ar.autosave.pendientes == [("clear",)]
+    
+    app.user_loaded = True
+    assert ar.autosave_restored
+
+
+def test_registro_de_autoguardado_reproduce_el_orden_de_la_escena(ar):
+    ar.reset_scene()
+    for tipo in ("sofa", "mesa", "lampara", "sofa"):
+        ar.add_furniture(tipo)
+    a, b, c, d = ids_en_orden(ar)
+    
+    tocar(ar, a, (30, 10))
+    tocar(ar, c)
+    # Deshacer el arrastre devuelve la posición sin cambiar el apilado
+    ar.undo()
+    ar.remove_piece(b)
+    ar.undo()
+    assert ids_en_orden(ar) == [b, d, a, c]
+    
+    # Lo que leería restore() tras un cierre inesperado
+    lote = SceneCodec.encode_ops(ar.autosave._resolver())
+    items = SceneCodec.apply_ops([], SceneCodec.decode_ops(lote))
+    
+    assert [(item["id"], item["type"], *item["position"], item["rotation"], item["scale"])
+            for item in items] == ar.scene.pieces()
+
+
+def test_escena_densa_lleva_las_piezas_scatter_a_una_sola_capa(ar, monkeypatch):
+    ar.reset_scene()
+    for tipo in ("sofa", "mesa", "lampara"):
+        ar.add_furniture(tipo)
+    tocar(ar, ids_en_orden(ar)[0])
+    monkeypatch.setattr(ar, "DENSE_SCENE_THRESHOLD", 5)
+    
+    centro = ar.ids.ar_area.center
+    ar.build_scene([{"type": "sofa", "position": centro, "rotation": 0, "scale": 1}] * 3)
+    
+    assert ar.dense_mode
+    assert not ar.ids.ar_pieces.children
+    lienzo = ar.ids.ar_canvas
+    orden = ids_en_orden(ar)
+    assert sorted(lienzo.pieces, key=lambda piece_id: lienzo.pieces[piece_id].z) == orden
+    assert [lienzo.canvas.indexof(lienzo.pieces[piece_id].group) for piece_id in orden] == sorted(
+        lienzo.canvas.indexof(lienzo.pieces[piece_id].group) for piece_id in orden)
+    assert ar.piece_id_at(*centro) == orden[-1]
+
+
+def test_codec_de_escenas_ida_y_vuelta():
+    items = [
+        {"id": 7, "type": "sofa", "position": (110.5, 40.0), "rotation": 90.0, "scale": 1.5},
+        {"id": 3, "type": "mesa", "position": (20.0, 300.25), "rotation": 0.0, "scale": 1.0},
+        {"id": 9, "type": "sofa", "position": (-5.0, 12.0), "rotation": 359.5, "scale": 0.3},
+    ]
+    origen = (100, 200)
+    
+    datos = SceneCodec.encode(items, origen)
+    assert datos.startswith(SceneCodec.MAGIC)
+    assert SceneCodec.decode(datos, origen) == items
+    # Relativa a la esquina del área AR: se lee igual aunque el área se mueva
+    movida = SceneCodec.decode(datos, (0, 0))
+    assert movida[0]["position"] == (10.5, -160.0)
+    # Sin ids en todas las piezas no se guarda la columna
+    sin_ids = [{clave: valor for clave, valor in item.items() if clave != "id"} for item in items]
+    assert SceneCodec.decode(SceneCodec.encode(sin_ids)) == sin_ids
+    assert SceneCodec.decode(SceneCodec.encode([])) == []
+    
+    with pytest.raises(ValueError):
+        SceneCodec.decode(datos[:-4])
+
+
+def test_codec_de_operaciones_ida_y_vuelta():
+    ops = [
+        ("clear",),
+        ("add", 1, "sofa", 150.0, 260.0, 45.0, 1.25, None),
+        ("add", 2, "lámpara", 110.0, 210.0, 0.0, 1.0, 0),
+        ("move", 1, 160.0, 270.0, 90.0, 2.0),
+        ("front", 2),
+        ("remove", 1),
+    ]
+    
+    lote = SceneCodec.encode_ops(ops, (100, 200))
+    assert SceneCodec.decode_ops(lote, (100, 200)) == ops
+    assert SceneCodec.apply_ops([], SceneCodec.decode_ops(lote)) == [
+        {"id": 2, "type": "lámpara", "position": (10.0, 10.0), "rotation": 0.0, "scale": 1.0}]
+    
+    # En los lotes v1 mover traía la pieza al frente
+    v1 = (SceneCodec.OPS_MAGIC + bytes([1, SceneCodec.OP_MOVE]) + (4).to_bytes(4, "little")
+          + SceneCodec.TRANSFORM.pack(1, 2, 3, 4))
+    assert SceneCodec.decode_ops(v1) == [("move", 4, 1, 2, 3, 4), ("front", 4)]
+    
+    with pytest.raises(ValueError):
+        SceneCodec.decode_ops(lote[:-3])
+
+
+def test_codec_lee_escenas_json_antiguas():
+    fila = ('[{"type": "sofa", "position": [120, 80], "rotation": 30, "scale": 2},'
+            ' {"type": "mesa", "position": [5.5, 6]}]')
+    
+    esperado = [
+        {"type": "sofa", "position": (120, 80), "rotation": 30, "scale": 2},
+        {"type": "mesa", "position": (5.5, 6), "rotation": 0, "scale": 1},
+    ]
+    assert SceneCodec.decode(fila) == esperado
+    # Columna BLOB con el texto JSON en bytes
+    assert SceneCodec.decode(fila.encode("utf-8")) == esperado
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from main import CatalogImport, Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(os.path.join(tmp_path, "test.db"))
+    yield database
+    database.close()
+
+
+def escribir(tmp_path, nombre, texto):
+    ruta = os.path.join(tmp_path, nombre)
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(texto)
+    return ruta
+
+
+def importar(db, ruta):
+    importacion = CatalogImport(db, ruta)
+    importacion.run()
+    assert importacion.estado == "completada", importacion.error
+    return importacion
+
+
+def producto(db, sku):
+    with db.pool.connection() as conn:
+        return conn.execute(
+            "SELECT nombre, categoria, precio, imagen, descripcion, stock FROM productos "
+            "WHERE sku = ?", (sku,)
+        ).fetchone()
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("$4,500.00", 4500.0),
+    ("4500,50", 4500.5),
+    ("1.234,50", 1234.5),
+    ("4,500", 4500.0),
+    ("", None),
+    (12, 12),
+])
+def test_numero_entiende_separadores_de_miles_y_coma_decimal(texto, esperado):
+    assert CatalogImport.numero(texto) == esperado
+
+
+def test_csv_con_punto_y_coma_y_coma_decimal(db, tmp_path):
+    ruta = escribir(tmp_path, "catalogo.csv",
+                    "SKU;Nombre;Categoría;Precio;Stock\n"
+                    "A-1;Sofá cama;Sofá;1.234,50;3\n"
+                    "A-2;Mesa;Mesa;899,90;\n"
+                    "A-3;Sin precio;Mesa;;1\n")
+    
+    importacion = importar(db, ruta)
+    
+    assert (importacion.insertados, importacion.errores) == (2, 1)
+    assert producto(db, "A-1") == ("Sofá cama", "Sofá", 1234.5, Database.DEFAULT_IMAGE, "", 3)
+    assert producto(db, "A-2") == ("Mesa", "Mesa", 899.9, Database.DEFAULT_IMAGE, "", 1)
+
+
+def test_actualizar_sin_algunas_columnas_conserva_las_guardadas(db, tmp_path):
+    importar(db, escribir(tmp_path, "completo.csv",
+                          "sku,nombre,categoria,precio,imagen,descripcion,stock\n"
+                          "A-1,Sofá,Sofá,1000,assets/sofa.png,Tres plazas,4\n"))
+    
+    importacion = importar(db, escribir(tmp_path, "precios.csv",
+                                        "sku,nombre,precio\nA-1,Sofá,1200\n"))
+    
+    assert importacion.actualizados == 1
+    assert producto(db, "A-1") == ("Sofá", "Sofá", 1200.0, "assets/sofa.png", "Tres plazas", 4)
+    # Sin cambios reales la fila no se reescribe
+    assert importar(db, escribir(tmp_path, "igual.csv",
+                                 "sku,nombre,precio\nA-1,Sofá,1200\n")).actualizados == 0
+
+
+def test_importacion_interrumpida_sigue_desde_el_punto_de_control(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(CatalogImport, "CHUNK", 2)
+    ruta = escribir(tmp_path, "catalogo.jsonl", "".join(
+        f'{{"sku": "J-{i}", "nombre": "Mueble {i}", "precio": {100 + i}}}\n' for i in range(5)))
+    
+    primera = CatalogImport(db, ruta)
+    primera.cancel()
+    primera.run()
+    assert (primera.estado, primera.filas) == ("cancelada", 2)
+    assert db.get_importacion_pendiente() == (ruta, 2)
+    
+    segunda = importar(db, ruta)
+    
+    assert segunda.importacion_id == primera.importacion_id
+    assert (segunda.filas, segunda.insertados) == (5, 5)
+    with db.pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM productos WHERE sku LIKE 'J-%'").fetchone()[0] == 5
+    assert db.get_importacion_pendiente() is None
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from main import SpatialGrid
+
+
+def cortan(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def caja_al_azar(rnd):
+    x, y = rnd.uniform(-200, 1000), rnd.uniform(-200, 1000)
+    return (x, y, x + rnd.uniform(0, 300), y + rnd.uniform(0, 300))
+
+
+@pytest.fixture
+def cajas():
+    rnd = random.Random(17)
+    return {clave: caja_al_azar(rnd) for clave in range(300)}
+
+
+@pytest.fixture
+def rejilla(cajas):
+    indice = SpatialGrid(64)
+    for clave, caja in cajas.items():
+        indice.insert(clave, caja)
+    return indice
+
+
+def test_consultas_coinciden_con_la_busqueda_lineal(rejilla, cajas):
+    rnd = random.Random(3)
+    for _ in range(200):
+        x, y = rnd.uniform(-250, 1300), rnd.uniform(-250, 1300)
+        assert sorted(rejilla.query_point(x, y)) == sorted(
+            clave for clave, caja in cajas.items() if caja[0] <= x <= caja[2] and caja[1] <= y <= caja[3])
+        
+        rango = caja_al_azar(rnd)
+        assert sorted(rejilla.query_range(*rango)) == sorted(
+            clave for clave, caja in cajas.items() if cortan(caja, rango))
+    
+    # Un rango que cubre todo recorre las cajas en lugar de las celdas
+    assert sorted(rejilla.query_range(-10000, -10000, 10000, 10000)) == sorted(cajas)
+
+
+def test_update_y_remove_mueven_las_claves_de_celda(rejilla, cajas):
+    rnd = random.Random(5)
+    for clave in list(cajas)[:100]:
+        # Unas se quedan en sus celdas y otras cambian
+        x1, y1, x2, y2 = cajas[clave]
+        dx = rnd.choice((1, 500))
+        cajas[clave] = (x1 + dx, y1, x2 + dx, y2)
+        rejilla.update(clave, cajas[clave])
+    for clave in list(cajas)[100:150]:
+        del cajas[clave]
+        rejilla.remove(clave)
+    
+    assert len(rejilla) == len(cajas)
+    for clave, caja in cajas.items():
+        assert rejilla.bbox(clave) == caja
+        assert clave in rejilla.query_point(caja[0], caja[1])
+    rango = (0, 0, 400, 400)
+    assert sorted(rejilla.query_range(*rango)) == sorted(
+        clave for clave, caja in cajas.items() if cortan(caja, rango))
+    # Ninguna clave quitada o movida queda en celdas viejas
+    for celda, claves in rejilla._celdas.items():
+        for clave in claves:
+            assert celda in set(rejilla._rango_celdas(cajas[clave]))
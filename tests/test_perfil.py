@@ -0,0 +1,31 @@
+from main import FrameMonitor, Profiler
+
+
+def test_monitor_solo_apaga_el_profiler_que_encendio():
+    profiler = Profiler()
+    monitor = FrameMonitor(profiler)
+    
+    monitor.enable()
+    assert profiler.enabled
+    monitor.disable()
+    assert not profiler.enabled
+    
+    profiler.enable()
+    monitor.enable()
+    monitor.disable()
+    assert profiler.enabled
+
+
+def test_profiler_encendido_a_mano_sobrevive_al_monitor():
+    profiler = Profiler()
+    monitor = FrameMonitor(profiler)
+    
+    monitor.enable()
+    # Pantalla de depuración: apagar y volver a encender con el monitor activo
+    profiler.disable()
+    profiler.enable()
+    monitor.release_profiler()
+    monitor.disable()
+    
+    assert profiler.enabled
+    assert monitor.note not in profiler.listeners
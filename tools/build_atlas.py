@@ -0,0 +1,129 @@
+"""Empaqueta los sprites de muebles en un atlas de Kivy (assets/muebles.atlas).
+
+Uso:
+    python tools/build_atlas.py [tamaño_máximo]
+
+Requiere Pillow. Cada sprite se reduce a tamaño_máximo píxeles por lado
+(400 por defecto: el doble del mueble más grande del área AR) y todos se
+empaquetan en una sola textura, así ARScreen dibuja cualquier número de
+piezas con un único bind de textura.
+
+La página es la de menor área (lados potencia de dos) en la que caben
+todos los sprites, y si ninguno tiene transparencia se guarda en RGB
+(3 bytes por píxel en GPU en lugar de 4). El .atlas sigue el formato de
+kivy.atlas; el empaquetado es propio porque el de kivy.atlas deja huecos
+que obligan a páginas más grandes y siempre crea páginas RGBA.
+"""
+import glob
+import json
+import os
+import sys
+
+from PIL import Image
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = os.path.join(RAIZ, "assets")
+ATLAS = os.path.join(ASSETS, "muebles")
+
+# Nombres de sprite = tipo de mueble en ARScreen.FURNITURE (+ el respaldo)
+SPRITES = ["sofa", "mesa", "lampara", "default"]
+# Píxeles alrededor de cada sprite (el borde se duplica para el filtrado)
+PADDING = 2
+# Lado máximo de la página (GL ES 2 garantiza texturas de 2048)
+PAGINA_MAXIMA = 2048
+
+
+def tiene_alfa(imagen):
+    return imagen.mode in ("RGBA", "LA", "PA") or "transparency" in imagen.info
+
+
+def paginas_candidatas(imagenes):
+    """Páginas (ancho, alto) en potencias de dos que cubren el área de los sprites, de menor a mayor"""
+    area = sum((im.width + PADDING) * (im.height + PADDING) for im in imagenes.values())
+    ancho_minimo = max(im.width for im in imagenes.values()) + 2 * PADDING
+    alto_minimo = max(im.height for im in imagenes.values()) + 2 * PADDING
+    lados = [2 ** n for n in range(6, PAGINA_MAXIMA.bit_length())]
+    candidatas = [(ancho, alto) for ancho in lados for alto in lados
+                  if ancho * alto >= area and ancho >= ancho_minimo and alto >= alto_minimo]
+    # A igual área, las más cuadradas primero
+    return sorted(candidatas, key=lambda pagina: (pagina[0] * pagina[1], abs(pagina[0] - pagina[1])))
+
+
+def empaquetar(imagenes, ancho, alto):
+    """Filas de sprites de mayor a menor altura; {nombre: (x, y)} desde arriba, o None si no caben"""
+    posiciones = {}
+    x = y = alto_fila = PADDING
+    for nombre, imagen in sorted(imagenes.items(), key=lambda item: item[1].height, reverse=True):
+        if x + imagen.width + PADDING > ancho:
+            x, y = PADDING, y + alto_fila
+            alto_fila = 0
+        if x + imagen.width + PADDING > ancho or y + imagen.height + PADDING > alto:
+            return None
+        posiciones[nombre] = (x, y)
+        x += imagen.width + PADDING
+        alto_fila = max(alto_fila, imagen.height + PADDING)
+    return posiciones
+
+
+def dibujar_pagina(imagenes, posiciones, ancho, alto, modo):
+    pagina = Image.new(modo, (ancho, alto))
+    for nombre, (x, y) in posiciones.items():
+        imagen = imagenes[nombre]
+        w, h = imagen.size
+        pagina.paste(imagen, (x, y))
+        # Borde duplicado en el relleno, como kivy.atlas
+        pagina.paste(imagen.crop((0, 0, w, 1)), (x, y - 1))
+        pagina.paste(imagen.crop((0, h - 1, w, h)), (x, y + h))
+        pagina.paste(imagen.crop((0, 0, 1, h)), (x - 1, y))
+        pagina.paste(imagen.crop((w - 1, 0, w, h)), (x + w, y))
+    return pagina
+
+
+def main():
+    tamano_maximo = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+
+    imagenes = {}
+    for nombre in SPRITES:
+        origen = os.path.join(ASSETS, f"{nombre}.png")
+        try:
+            imagen = Image.open(origen)
+            imagen.load()
+        except (OSError, ValueError) as error:
+            print(f"Omitido {origen}: {error}")
+            continue
+        imagen.thumbnail((tamano_maximo, tamano_maximo))
+        imagenes[nombre] = imagen
+
+    if not imagenes:
+        sys.exit("No hay sprites válidos para empaquetar")
+
+    modo = "RGBA" if any(tiene_alfa(imagen) for imagen in imagenes.values()) else "RGB"
+    imagenes = {nombre: imagen.convert(modo) for nombre, imagen in imagenes.items()}
+
+    for ancho, alto in paginas_candidatas(imagenes):
+        posiciones = empaquetar(imagenes, ancho, alto)
+        if posiciones:
+            break
+    else:
+        sys.exit("Los sprites no caben en una página del atlas")
+
+    for anterior in glob.glob(f"{ATLAS}-*.png"):
+        os.remove(anterior)
+    pagina = f"{os.path.basename(ATLAS)}-0.png"
+    dibujar_pagina(imagenes, posiciones, ancho, alto, modo).save(
+        os.path.join(ASSETS, pagina), optimize=True)
+
+    # Coordenadas de kivy.atlas: y desde abajo
+    meta = {pagina: {nombre: [x, alto - y - imagenes[nombre].height,
+                              imagenes[nombre].width, imagenes[nombre].height]
+                     for nombre, (x, y) in posiciones.items()}}
+    with open(f"{ATLAS}.atlas", "w") as f:
+        json.dump(meta, f)
+
+    bytes_pixel = len(modo)
+    print(f"Atlas creado: {ATLAS}.atlas ({len(imagenes)} sprites, página {ancho}x{alto} {modo}, "
+          f"{ancho * alto * bytes_pixel / 1024:.0f} KB en GPU)")
+
+
+if __name__ == "__main__":
+    main()